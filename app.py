@@ -1,64 +1,177 @@
 from flask import Flask
-from dotenv import load_dotenv
 import os
+import sys
+import atexit
 import logging
+import logging.handlers
+import queue
 import json
-from datetime import datetime, timezone
+import time
+
+try:
+	import orjson
+except ImportError:  # 任意依存: 無ければ標準の json を使う
+	orjson = None
+
+# (LogRecord の属性名, JSON のキー)
+_EXTRA_FIELDS = (
+	('event', 'event'),
+	('session_id', 'session_id'),
+	('session_type', 'type'),
+	('duration', 'duration'),
+	('status', 'status'),
+)
+
+def _dumps(data):
+	if orjson is not None:
+		try:
+			return orjson.dumps(data).decode()
+		except TypeError:
+			pass
+	return json.dumps(data, default=str)
 
 class JsonFormatter(logging.Formatter):
 	"""Custom JSON formatter for structured logging."""
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self._last_second = None
+		self._second_prefix = ''
+
+	def _timestamp(self, created):
+		# record.created を使う (秒単位の接頭辞はキャッシュ)
+		second = int(created)
+		if second != self._last_second:
+			self._second_prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+			self._last_second = second
+		return '%s.%06dZ' % (self._second_prefix, int((created - second) * 1e6))
+
 	def format(self, record):
 		log_data = {
-			'timestamp': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+			'timestamp': self._timestamp(record.created),
 			'level': record.levelname,
 			'message': record.getMessage(),
 		}
 		
 		# Add extra fields if present
-		if hasattr(record, 'event'):
-			log_data['event'] = record.event
-		if hasattr(record, 'session_id'):
-			log_data['session_id'] = record.session_id
-		if hasattr(record, 'session_type'):
-			log_data['type'] = record.session_type
-		if hasattr(record, 'duration'):
-			log_data['duration'] = record.duration
-		if hasattr(record, 'status'):
-			log_data['status'] = record.status
+		attributes = record.__dict__
+		for attribute, key in _EXTRA_FIELDS:
+			if attribute in attributes:
+				log_data[key] = attributes[attribute]
 		
-		return json.dumps(log_data)
+		return _dumps(log_data)
 
-def create_app():
-	# .env読み込み (存在しない場合は無視)
-	load_dotenv()
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+	"""QueueHandler for a bounded queue: drop (and count) or block when it is full."""
+	def __init__(self, log_queue, policy='drop'):
+		super().__init__(log_queue)
+		self.block = policy == 'block'
+		self.dropped = 0
 
-	app = Flask(__name__)
-	app.config.from_object('config.Config')
+	def enqueue(self, record):
+		if self.block:
+			self.queue.put(record)
+			return
+		try:
+			self.queue.put_nowait(record)
+		except queue.Full:
+			self.dropped += 1
 
-	# Configure JSON logging
+_log_listener = None
+# 直近に作成したハンドラと (LOG_ASYNC, LOG_QUEUE_SIZE, LOG_QUEUE_POLICY, 出力先)
+_log_handler = None
+_log_settings = None
+
+def _stop_log_listener():
+	global _log_listener, _log_handler
+	if _log_listener is not None:
+		_log_listener.stop()
+		_log_listener = None
+	_log_handler = None
+
+atexit.register(_stop_log_listener)
+
+def configure_logging(app):
+	"""
+	Attach JSON logging to the app logger and the root logger.
+
+	With LOG_ASYNC the request thread only enqueues records; a listener
+	thread formats and writes them, so stdout/pipe backpressure never reaches
+	request latency.
+	"""
+	global _log_listener, _log_handler, _log_settings
 	log_level = getattr(logging, app.config.get('LOG_LEVEL', 'INFO').upper())
+	async_logging = app.config.get('LOG_ASYNC', True)
+	settings = (async_logging, app.config.get('LOG_QUEUE_SIZE', 10000),
+		app.config.get('LOG_QUEUE_POLICY', 'drop'), sys.stderr)
+	
+	# 同じ設定で作成済みならハンドラとリスナースレッドを使い回す (アプリ毎に作り直さない)
+	reusable = (_log_handler is not None and settings == _log_settings
+		and (_log_listener is not None or not async_logging))
+	if not reusable:
+		_stop_log_listener()
+		stream_handler = logging.StreamHandler()
+		stream_handler.setFormatter(JsonFormatter())
+		if async_logging:
+			log_queue = queue.Queue(maxsize=settings[1])
+			_log_handler = BoundedQueueHandler(log_queue, policy=settings[2])
+			_log_listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+			_log_listener.start()
+		else:
+			_log_handler = stream_handler
+		_log_settings = settings
+	handler = _log_handler
+	app.extensions['log_handler'] = handler
 	
 	# Remove existing handlers and add JSON handler
 	app.logger.handlers.clear()
-	handler = logging.StreamHandler()
-	handler.setFormatter(JsonFormatter())
 	app.logger.addHandler(handler)
 	app.logger.setLevel(log_level)
 	
 	# Configure root logger for services
 	root_logger = logging.getLogger()
 	root_logger.handlers.clear()
-	root_handler = logging.StreamHandler()
-	root_handler.setFormatter(JsonFormatter())
-	root_logger.addHandler(root_handler)
+	root_logger.addHandler(handler)
 	root_logger.setLevel(log_level)
 
-	# SQLAlchemy初期化
+_dotenv_loaded = False
+
+def create_app(config_overrides=None):
+	global _dotenv_loaded
+	started = time.perf_counter()
+	# .env読み込み (存在しない場合は無視)。プロセス内で一度だけ
+	if not _dotenv_loaded:
+		from dotenv import load_dotenv
+		load_dotenv()
+		_dotenv_loaded = True
+
+	app = Flask(__name__)
+	app.config.from_object('config.Config')
+	# ベンチマーク等から設定を上書き (DB初期化より前に反映する)
+	if config_overrides:
+		app.config.update(config_overrides)
+
+	# Configure JSON logging
+	configure_logging(app)
+
+	# SQLAlchemy初期化 (SQLiteファイルDBでは WAL 等のプロファイルを適用)
 	from pomodoro.models import db
+	from pomodoro.sql import init_sqlite_profile, sqlite_engine_options
+	sqlite_engine_options(app)
 	db.init_app(app)
+	init_sqlite_profile(app)
 	
+	# 保存済みのスキーマ版数が一致する通常起動ではスキーマ検査を省略
+	from pomodoro.schema import ensure_schema
 	with app.app_context():
-		db.create_all()
+		ensure_schema()
+
+	# 再起動後も active セッションの完了を予約し直す
+	from pomodoro.scheduler import init_scheduler
+	init_scheduler(app)
+
+	# flask CLI コマンド (rebuild-stats など)
+	from pomodoro.cli import init_cli
+	init_cli(app)
 
 	# Blueprint登録 (後で詳細実装)
 	try:
@@ -68,16 +181,37 @@ def create_app():
 		# 初期段階では雛形なので失敗しても警告のみ
 		app.logger.warning(f"Pomodoro blueprint not registered yet: {e}")
 
+	# 静的ファイルのハッシュ付きURLと、事前描画・圧縮済みのトップページ
+	from pomodoro.assets import index_response, init_assets
+	init_assets(app)
+
 	# トップページ
 	@app.route('/')
 	def index():
-		from flask import render_template
-		return render_template('pomodoro/index.html')
+		return index_response()
+
+	# Service Worker のスコープを / にするためルートから配信する (更新がすぐ反映されるよう no-cache)
+	@app.route('/sw.js')
+	def service_worker():
+		response = app.send_static_file('sw.js')
+		response.headers['Cache-Control'] = 'no-cache'
+		return response
 
 	@app.route('/health')
 	def health():
 		return {'status': 'ok'}
 
+	# Prometheus形式の /metrics
+	if app.config.get('METRICS_ENABLED', True):
+		from pomodoro.metrics import init_metrics
+		init_metrics(app)
+
+	startup_seconds = time.perf_counter() - started
+	app.extensions['startup_seconds'] = startup_seconds
+	budget_ms = app.config.get('STARTUP_BUDGET_MS')
+	if budget_ms and startup_seconds * 1000 > budget_ms:
+		app.logger.warning('create_app took %.1f ms (budget %s ms)', startup_seconds * 1000, budget_ms,
+			extra={'event': 'startup_over_budget', 'duration': round(startup_seconds, 4)})
 	return app
 
 if __name__ == '__main__':
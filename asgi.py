@@ -0,0 +1,21 @@
+"""
+ASGI entry point: the same app as ``app.py``, with /events served asynchronously.
+
+    uvicorn --factory asgi:create_asgi_app --port 5000
+    python asgi.py
+"""
+import os
+from app import create_app
+from pomodoro.asgi import PomodoroASGI
+
+
+def create_asgi_app(config_overrides=None):
+	return PomodoroASGI(create_app(config_overrides))
+
+
+if __name__ == '__main__':
+	try:
+		import uvicorn
+	except ImportError:  # 任意依存
+		raise SystemExit('uvicorn is required to serve the ASGI app: pip install uvicorn')
+	uvicorn.run(create_asgi_app(), host=os.environ.get('HOST', '127.0.0.1'), port=int(os.environ.get('PORT', '5000')))
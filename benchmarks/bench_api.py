@@ -0,0 +1,168 @@
+"""
+Load test / micro-benchmark for the pomodoro API.
+
+Drives /state, /start, /stop and the full focus -> complete cycle at a
+configurable concurrency against a fresh SQLite file database, then prints
+p50/p95/p99 latency and requests per second and stores the results as JSON.
+
+    python -m benchmarks.bench_api --concurrency 8 --iterations 200
+    python -m benchmarks.bench_api --transport http --scenarios state
+    python -m benchmarks.compare benchmarks/results/api-<old>.json benchmarks/results/api-<new>.json
+
+Scenarios that need an idle/active precondition alternate the measured call
+with an untimed setup call (e.g. ``start`` is timed, the following ``stop``
+is not). With concurrency > 1 and a single user the single-active-session
+rule makes some starts return 409; those show up in ``statuses``. Use
+``--users`` to give workers their own users.
+"""
+import argparse
+import http.client
+import json
+import logging
+import tempfile
+import threading
+from typing import Callable, Optional, Tuple
+
+from benchmarks.common import print_table, run_concurrent, temp_sqlite_uri, write_results
+
+SCENARIOS = ('state', 'start', 'stop', 'cycle')
+USER_HEADER = 'X-Bench-User'
+
+
+class TestClientTransport:
+    """In-process requests through Flask's test client (no socket overhead)."""
+
+    def __init__(self, app, headers: Optional[dict] = None):
+        self._client = app.test_client()
+        self._headers = headers or {}
+
+    def request(self, method: str, path: str, body: Optional[dict] = None) -> Tuple[int, dict]:
+        response = self._client.open(path, method=method, json=body, headers=self._headers)
+        return response.status_code, response.get_json(silent=True) or {}
+
+
+class HttpTransport:
+    """Real HTTP requests to a local threaded WSGI server."""
+
+    def __init__(self, host: str, port: int, headers: Optional[dict] = None):
+        self._host, self._port = host, port
+        self._headers = headers or {}
+
+    def request(self, method: str, path: str, body: Optional[dict] = None) -> Tuple[int, dict]:
+        connection = http.client.HTTPConnection(self._host, self._port)
+        try:
+            payload = json.dumps(body) if body is not None else None
+            headers = dict(self._headers)
+            if body is not None:
+                headers['Content-Type'] = 'application/json'
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+            return response.status, json.loads(data) if data else {}
+        finally:
+            connection.close()
+
+
+def make_operation(scenario: str, app, transport, duration_minutes: int) -> Callable[[], Optional[int]]:
+    """Return the per-iteration operation of ``scenario``; None results are untimed."""
+    from pomodoro.services import complete_session
+    start_body = {'duration_minutes': duration_minutes}
+
+    if scenario == 'state':
+        return lambda: transport.request('GET', '/api/pomodoro/state')[0]
+
+    if scenario in ('start', 'stop'):
+        timed_step = 0 if scenario == 'start' else 1
+        step = [0]
+
+        def alternate():
+            current, step[0] = step[0], 1 - step[0]
+            if current == 0:
+                status = transport.request('POST', '/api/pomodoro/start', start_body)[0]
+            else:
+                status = transport.request('POST', '/api/pomodoro/stop')[0]
+            return status if current == timed_step else None
+        return alternate
+
+    if scenario == 'cycle':
+        def cycle():
+            status, data = transport.request('POST', '/api/pomodoro/start', start_body)
+            if status == 201:
+                # 完了スケジューラの代わりに直接完了させる
+                with app.app_context():
+                    complete_session(data['id'])
+            return transport.request('GET', '/api/pomodoro/state')[0]
+        return cycle
+
+    raise ValueError(f'Unknown scenario {scenario!r}')
+
+
+def run(args) -> dict:
+    from app import create_app
+    from pomodoro.services import stop_active_session
+
+    workdir = tempfile.TemporaryDirectory(prefix='pomodoro-bench-')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': args.database or temp_sqlite_uri(workdir.name),
+        'LOG_LEVEL': args.log_level,
+        'TRUSTED_USER_HEADER': USER_HEADER,
+        **(args.config_overrides or {}),
+    })
+    # ワーカー i はユーザー (i % users) + 1 として動く
+    user_ids = [index % args.users + 1 for index in range(args.concurrency)]
+
+    server = None
+    if args.transport == 'http':
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        new_transport = lambda user_id: HttpTransport('127.0.0.1', server.server_port, {USER_HEADER: str(user_id)})
+    else:
+        new_transport = lambda user_id: TestClientTransport(app, {USER_HEADER: str(user_id)})
+
+    results = {}
+    try:
+        for scenario in args.scenarios:
+            with app.app_context():
+                for user_id in set(user_ids):
+                    stop_active_session(user_id)
+            results[scenario] = run_concurrent(
+                lambda index: make_operation(scenario, app, new_transport(user_ids[index]), args.duration_minutes),
+                args.concurrency,
+                args.iterations,
+            )
+    finally:
+        if server is not None:
+            server.shutdown()
+        workdir.cleanup()
+    return results
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--iterations', type=int, default=200, help='operations per worker thread')
+    parser.add_argument('--transport', choices=('client', 'http'), default='client')
+    parser.add_argument('--duration-minutes', type=int, default=25)
+    parser.add_argument('--users', type=int, default=1,
+                        help='spread workers over this many users (1 = every worker shares one user)')
+    parser.add_argument('--log-level', default='CRITICAL',
+                        help='app LOG_LEVEL (default hides the 409 tracebacks of colliding starts)')
+    parser.add_argument('--database', help='SQLAlchemy URI (default: a fresh temporary SQLite file)')
+    parser.add_argument('--output', help='JSON result path (default: benchmarks/results/api-<commit>.json)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.config_overrides = None
+    results = run(args)
+    print_table(results)
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'config_overrides')}
+    print(f"results: {write_results('api', config, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+Connection-capacity benchmark: idle SSE clients held by the WSGI and ASGI servers.
+
+Starts each server in its own process on a fresh SQLite file database, then
+opens ``/api/pomodoro/events`` streams in steps (spread over ``--users``
+users) and, after every step, records the server's RSS and thread count and
+the ``/state`` latency seen by a new client while the streams stay open.
+
+- ``wsgi``: the threaded werkzeug server of ``app.run`` (one thread per stream)
+- ``asgi``: ``asgi.create_asgi_app`` under uvicorn (needs ``pip install uvicorn``)
+
+    python -m benchmarks.bench_connections --connections 10000 --step 1000
+    python -m benchmarks.bench_connections --servers asgi --connections 30000
+
+A step that cannot open all of its streams within ``--timeout`` ends the run
+for that server; ``max_connections`` is the last step that completed. The
+client and the servers need file-descriptor limits above the target (the
+benchmark raises its soft limit to the hard limit; check ``ulimit -Hn``).
+"""
+import argparse
+import http.client
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from benchmarks.common import percentile, temp_sqlite_uri, write_results
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SERVERS = ('wsgi', 'asgi')
+USER_HEADER = 'X-Bench-User'
+
+_SERVER_SCRIPT = '''
+import logging, sys
+overrides = {'SQLALCHEMY_DATABASE_URI': sys.argv[2], 'LOG_LEVEL': 'CRITICAL',
+             'TRUSTED_USER_HEADER': sys.argv[3], 'METRICS_ENABLED': False}
+if sys.argv[1] == 'wsgi':
+    from werkzeug.serving import make_server
+    from app import create_app
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', int(sys.argv[4]), create_app(overrides), threaded=True)
+    server.serve_forever()
+else:
+    import uvicorn
+    from asgi import create_asgi_app
+    uvicorn.run(create_asgi_app(overrides), host='127.0.0.1', port=int(sys.argv[4]),
+                log_level='warning', backlog=4096)
+'''
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def raise_fd_limit() -> int:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def server_usage(pid: int) -> dict:
+    """RSS (MiB) and thread count of a server process, from /proc (Linux only)."""
+    usage = {'rss_mib': None, 'threads': None}
+    try:
+        for line in Path(f'/proc/{pid}/status').read_text().splitlines():
+            if line.startswith('VmRSS:'):
+                usage['rss_mib'] = round(int(line.split()[1]) / 1024, 1)
+            elif line.startswith('Threads:'):
+                usage['threads'] = int(line.split()[1])
+    except OSError:
+        pass
+    return usage
+
+
+def start_server(kind: str, uri: str, port: int, timeout: float) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, '-c', _SERVER_SCRIPT, kind, uri, USER_HEADER, str(port)],
+                               cwd=REPO_ROOT, stderr=subprocess.PIPE, text=True)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{kind} server exited: {process.stderr.read().strip().splitlines()[-1:]}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{kind} server did not start within {timeout}s')
+
+
+def open_stream(port: int, user_id: int, timeout: float) -> socket.socket:
+    """Open one SSE stream and wait for its initial ``state`` event."""
+    sock = socket.create_connection(('127.0.0.1', port), timeout=timeout)
+    try:
+        sock.sendall((f'GET /api/pomodoro/events HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+                      f'{USER_HEADER}: {user_id}\r\nAccept: text/event-stream\r\n\r\n').encode())
+        received = b''
+        while b'event: state' not in received:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ConnectionError('stream closed before the initial state')
+            received += chunk
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def probe_state(port: int, requests: int, timeout: float) -> dict:
+    """Latency (ms) of ``requests`` sequential /state calls on one new connection."""
+    latencies: List[float] = []
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        for _ in range(requests):
+            started = time.perf_counter()
+            connection.request('GET', '/api/pomodoro/state', headers={USER_HEADER: '1'})
+            connection.getresponse().read()
+            latencies.append(time.perf_counter() - started)
+    except OSError:
+        return {'state_p50_ms': None, 'state_p95_ms': None}
+    finally:
+        connection.close()
+    latencies.sort()
+    return {
+        'state_p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'state_p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+    }
+
+
+def run_server(kind: str, args) -> dict:
+    workdir = tempfile.TemporaryDirectory(prefix='pomodoro-bench-')
+    port = free_port()
+    streams: List[socket.socket] = []
+    steps = []
+    failure: Optional[str] = None
+    process = start_server(kind, temp_sqlite_uri(workdir.name), port, args.timeout)
+    try:
+        steps.append({'connections': 0, **server_usage(process.pid), **probe_state(port, args.probe_requests, args.timeout)})
+        while len(streams) < args.connections and failure is None:
+            target = min(args.connections, len(streams) + args.step)
+            started = time.perf_counter()
+            try:
+                while len(streams) < target:
+                    streams.append(open_stream(port, len(streams) % args.users + 1, args.timeout))
+            except OSError as e:
+                failure = f'{type(e).__name__}: {e} at {len(streams)} connections'
+                break
+            steps.append({
+                'connections': len(streams),
+                'open_seconds': round(time.perf_counter() - started, 3),
+                **server_usage(process.pid),
+                **probe_state(port, args.probe_requests, args.timeout),
+            })
+    finally:
+        for stream in streams:
+            stream.close()
+        process.kill()
+        process.wait()
+        workdir.cleanup()
+    completed = steps[-1]
+    return {
+        'max_connections': completed['connections'],
+        'rss_mib': completed['rss_mib'],
+        'threads': completed['threads'],
+        'state_p95_ms': completed['state_p95_ms'],
+        'failure': failure,
+        'steps': steps,
+    }
+
+
+def run(args) -> dict:
+    limit = raise_fd_limit()
+    if limit < args.connections + 64:
+        print(f'warning: file-descriptor limit {limit} is below --connections {args.connections}')
+    results = {}
+    for kind in args.servers:
+        if kind == 'asgi':
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                print('skipping asgi: uvicorn is not installed (pip install uvicorn)')
+                continue
+        print(f'{kind}: opening up to {args.connections} streams ...')
+        results[kind] = run_server(kind, args)
+    return results
+
+
+def print_results(results: dict) -> None:
+    print(f"{'server':<8}{'connections':>13}{'RSS MiB':>10}{'threads':>9}{'state p50 ms':>14}{'state p95 ms':>14}")
+    for kind, result in results.items():
+        for step in result['steps']:
+            print(f"{kind:<8}{step['connections']:>13}{str(step['rss_mib']):>10}{str(step['threads']):>9}"
+                  f"{str(step['state_p50_ms']):>14}{str(step['state_p95_ms']):>14}")
+        if result['failure']:
+            print(f"{kind:<8}stopped: {result['failure']}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--servers', nargs='+', choices=SERVERS, default=list(SERVERS))
+    parser.add_argument('--connections', type=int, default=5000, help='idle SSE streams to open')
+    parser.add_argument('--step', type=int, default=500, help='streams opened between measurements')
+    parser.add_argument('--users', type=int, default=100, help='spread the streams over this many users')
+    parser.add_argument('--probe-requests', type=int, default=50, help='/state calls per measurement')
+    parser.add_argument('--timeout', type=float, default=10.0, help='seconds per connect / initial event')
+    parser.add_argument('--output', help='JSON result path (default: benchmarks/results/connections-<commit>.json)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = run(args)
+    print_results(results)
+    config = {key: value for key, value in vars(args).items() if key != 'output'}
+    print(f"results: {write_results('connections', config, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark of DeliveryManager.deliver_recipe with thousands of waiting orders.
+
+Fills a manager with ``--waiting`` orders drawn from ``--recipes`` random
+recipes, then times ``--deliveries`` plates (``--hit-ratio`` of them match a
+waiting order, the rest match none). A spawned order replaces each delivered
+one so the queue length stays constant. The nested-loop matcher that
+``deliver_recipe`` used before the multiset index runs on the same plates
+for comparison.
+
+    python -m benchmarks.bench_delivery --waiting 100 1000 10000
+"""
+import argparse
+import random
+import time
+from typing import List
+
+from benchmarks.common import percentile, write_results
+
+
+def make_recipes(count: int, ingredient_kinds: int, rng: random.Random):
+    from deliverManager import KitchenObjectSO, RecipeListSO, RecipeSO
+
+    ingredients = [KitchenObjectSO(f'Ingredient{index}', index) for index in range(ingredient_kinds)]
+    recipes = [
+        RecipeSO(f'Recipe{index}', [rng.choice(ingredients) for _ in range(rng.randint(2, 8))])
+        for index in range(count)
+    ]
+    return ingredients, RecipeListSO(recipes)
+
+
+def legacy_deliver(waiting: list, plate) -> bool:
+    """The former deliver_recipe: compare the plate with every waiting recipe in nested loops."""
+    for i, waiting_recipe_so in enumerate(waiting):
+        plate_ingredients = plate.get_kitchen_object_so_list()
+        if len(waiting_recipe_so.kitchen_object_so_list) == len(plate_ingredients):
+            matches = True
+            for recipe_kitchen_object_so in waiting_recipe_so.kitchen_object_so_list:
+                found = False
+                for plate_kitchen_object_so in plate_ingredients:
+                    if plate_kitchen_object_so == recipe_kitchen_object_so:
+                        found = True
+                        break
+                if not found:
+                    matches = False
+                    break
+            if matches:
+                waiting.pop(i)
+                return True
+    return False
+
+
+def summarize(latencies: List[float], successes: int) -> dict:
+    ordered = sorted(latencies)
+    return {
+        'deliveries': len(ordered),
+        'successes': successes,
+        'mean_us': round(sum(ordered) / len(ordered) * 1e6, 2),
+        'p50_us': round(percentile(ordered, 0.50) * 1e6, 2),
+        'p99_us': round(percentile(ordered, 0.99) * 1e6, 2),
+    }
+
+
+def run_waiting(waiting_count: int, args) -> dict:
+    from deliverManager import DeliveryManager, KitchenGameManager, PlateKitchenObject
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    ingredients, recipe_list = make_recipes(args.recipes, args.ingredients, rng)
+    KitchenGameManager.get_instance().start_game()
+    manager = DeliveryManager(recipe_list)
+    # update() 毎に1件生成して待機数を一定に保つ
+    manager._spawn_recipe_timer_max = 0.0
+    manager._waiting_recipes_max = waiting_count
+    while len(manager.get_waiting_recipe_so_list()) < waiting_count:
+        manager.update()
+
+    plates = []
+    waiting_snapshot = manager.get_waiting_recipe_so_list()
+    for _ in range(args.deliveries):
+        plate = PlateKitchenObject()
+        if rng.random() < args.hit_ratio:
+            kitchen_object_so_list = list(rng.choice(waiting_snapshot).kitchen_object_so_list)
+            rng.shuffle(kitchen_object_so_list)
+        else:
+            kitchen_object_so_list = [rng.choice(ingredients) for _ in range(9)]  # どのレシピより多い
+        for kitchen_object_so in kitchen_object_so_list:
+            plate.add_kitchen_object(kitchen_object_so)
+        plates.append(plate)
+
+    results = {}
+    legacy_waiting = list(waiting_snapshot)
+    for name, deliver in (('indexed', None), ('legacy', legacy_deliver)):
+        latencies, successes = [], 0
+        for plate in plates:
+            if deliver is None:
+                before = manager.get_successful_recipes_amount()
+                started = time.perf_counter()
+                manager.deliver_recipe(plate)
+                latencies.append(time.perf_counter() - started)
+                if manager.get_successful_recipes_amount() > before:
+                    successes += 1
+                    manager.update()
+            else:
+                started = time.perf_counter()
+                delivered = deliver(legacy_waiting, plate)
+                latencies.append(time.perf_counter() - started)
+                if delivered:
+                    successes += 1
+                    legacy_waiting.append(rng.choice(recipe_list.recipe_so_list))
+        results[name] = summarize(latencies, successes)
+    KitchenGameManager.get_instance().stop_game()
+    return results
+
+
+def run(args) -> dict:
+    results = {}
+    for waiting_count in args.waiting:
+        for name, result in run_waiting(waiting_count, args).items():
+            results[f'{name}-{waiting_count}'] = {'waiting': waiting_count, **result}
+    return results
+
+
+def print_results(results: dict) -> None:
+    print(f"{'scenario':<18}{'waiting':>9}{'deliveries':>12}{'hits':>7}{'mean us':>11}{'p50 us':>11}{'p99 us':>11}")
+    for scenario, result in results.items():
+        print(f"{scenario:<18}{result['waiting']:>9}{result['deliveries']:>12}{result['successes']:>7}"
+              f"{result['mean_us']:>11}{result['p50_us']:>11}{result['p99_us']:>11}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--waiting', type=int, nargs='+', default=[100, 1000, 5000], help='waiting orders to compare')
+    parser.add_argument('--recipes', type=int, default=50, help='distinct recipes in the RecipeListSO')
+    parser.add_argument('--ingredients', type=int, default=30, help='distinct ingredients')
+    parser.add_argument('--deliveries', type=int, default=1000)
+    parser.add_argument('--hit-ratio', type=float, default=0.9, help='share of plates matching a waiting order')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='JSON result path (default: benchmarks/results/delivery-<commit>.json)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = run(args)
+    print_results(results)
+    config = {key: value for key, value in vars(args).items() if key != 'output'}
+    print(f"results: {write_results('delivery', config, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Micro-benchmark of deliverManager.Event: invoke and add/remove_handler.
+
+Times ``invoke`` with 0, 1 and 10 handlers, and an add/remove pair with
+``--handlers`` handlers already registered. The list-based Event that
+deliverManager used before (a new EventArgs per handler call, O(n)
+membership checks) runs the same operations for comparison.
+
+    python -m benchmarks.bench_events --handlers 10 1000
+"""
+import argparse
+import timeit
+from typing import Callable, List
+
+from benchmarks.common import write_results
+from deliverManager import Event, EventArgs
+
+
+class LegacyEvent:
+    """The former Event: handlers in a list, EventArgs created on every call."""
+
+    def __init__(self):
+        self._handlers: List[Callable] = []
+
+    def add_handler(self, handler: Callable):
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+
+    def remove_handler(self, handler: Callable):
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    def invoke(self, sender, args=None):
+        for handler in self._handlers:
+            handler(sender, args or EventArgs())
+
+
+def make_handlers(count: int) -> List[Callable]:
+    return [lambda sender, args: None for _ in range(count)]
+
+
+def time_ns(statement: Callable, number: int, repeat: int) -> float:
+    return round(min(timeit.repeat(statement, number=number, repeat=repeat)) / number * 1e9, 1)
+
+
+def run_event(event_class, args) -> dict:
+    result = {}
+    for count in (0, 1, 10):
+        event = event_class()
+        for handler in make_handlers(count):
+            event.add_handler(handler)
+        result[f'invoke_{count}_ns'] = time_ns(lambda: event.invoke(None), args.number, args.repeat)
+    for count in args.handlers:
+        event = event_class()
+        handlers = make_handlers(count)
+        for handler in handlers[:-1]:
+            event.add_handler(handler)
+        last = handlers[-1]
+
+        def add_remove():
+            event.add_handler(last)
+            event.remove_handler(last)
+        result[f'add_remove_{count}_ns'] = time_ns(add_remove, max(1, args.number // 10), args.repeat)
+    return result
+
+
+def run(args) -> dict:
+    return {'event': run_event(Event, args), 'legacy': run_event(LegacyEvent, args)}
+
+
+def print_results(results: dict) -> None:
+    columns = list(next(iter(results.values())))
+    print(f"{'scenario':<10}" + ''.join(f'{column:>20}' for column in columns))
+    for scenario, result in results.items():
+        print(f'{scenario:<10}' + ''.join(f'{result[column]:>20}' for column in columns))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--handlers', type=int, nargs='+', default=[10, 1000], help='registered handlers for add/remove')
+    parser.add_argument('--number', type=int, default=200000, help='calls per timing')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='JSON result path (default: benchmarks/results/events-<commit>.json)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = run(args)
+    print_results(results)
+    config = {key: value for key, value in vars(args).items() if key != 'output'}
+    print(f"results: {write_results('events', config, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
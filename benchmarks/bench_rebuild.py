@@ -0,0 +1,121 @@
+"""
+Benchmark of rebuilding daily_stats from session history.
+
+Seeds a fresh SQLite file database with synthetic completed/aborted
+sessions spread over users and days, then times ``rebuild_history`` (the
+``flask rebuild-stats`` command) for each chunk size.
+
+    python -m benchmarks.bench_rebuild --sessions 10000000 --users 1000 --days 730
+    python -m benchmarks.bench_rebuild --sessions 200000 --chunk-days 7 31 365
+
+Seeding dominates the run time for large histories; only the rebuild is timed.
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import temp_sqlite_uri, write_results
+
+SEED_CHUNK_ROWS = 50000
+
+
+def seed_sessions(sessions: int, users: int, days: int, seed: int) -> None:
+    """Insert ``sessions`` rows in end_at order (as a live database would have them)."""
+    from sqlalchemy import insert
+    from pomodoro.models import db, PomodoroSession
+
+    rng = random.Random(seed)
+    first_day = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    step = days * 86400 / sessions
+    chunk = []
+    for index in range(sessions):
+        end_at = first_day + timedelta(seconds=int(index * step))
+        duration = rng.choice((900, 1500, 1500, 3000))
+        chunk.append({
+            'user_id': rng.randint(1, users),
+            'type': 'focus' if rng.random() < 0.6 else 'break',
+            'planned_duration_sec': duration,
+            'start_at': end_at - timedelta(seconds=duration),
+            'planned_end_at': end_at,
+            'end_at': end_at,
+            'status': 'completed' if rng.random() < 0.9 else 'aborted',
+        })
+        if len(chunk) == SEED_CHUNK_ROWS:
+            db.session.execute(insert(PomodoroSession), chunk)
+            db.session.commit()
+            chunk = []
+    if chunk:
+        db.session.execute(insert(PomodoroSession), chunk)
+        db.session.commit()
+
+
+def run(args) -> dict:
+    from app import create_app
+    from pomodoro.models import db, DailyStat
+    from pomodoro.stats import rebuild_history
+
+    workdir = tempfile.TemporaryDirectory(prefix='pomodoro-bench-')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': args.database or temp_sqlite_uri(workdir.name),
+        'LOG_LEVEL': 'CRITICAL',
+        'METRICS_ENABLED': False,
+    })
+    results = {}
+    try:
+        with app.app_context():
+            started = time.perf_counter()
+            seed_sessions(args.sessions, args.users, args.days, args.seed)
+            print(f'seeded {args.sessions} sessions in {time.perf_counter() - started:.1f}s')
+
+            for chunk_days in args.chunk_days:
+                db.session.execute(DailyStat.__table__.delete())
+                db.session.commit()
+                started = time.perf_counter()
+                chunks = rows = 0
+                for _, _, written in rebuild_history(chunk_days=chunk_days):
+                    chunks += 1
+                    rows += written
+                elapsed = time.perf_counter() - started
+                results[f'chunk-{chunk_days}d'] = {
+                    'sessions': args.sessions,
+                    'chunks': chunks,
+                    'daily_rows': rows,
+                    'elapsed_seconds': round(elapsed, 3),
+                    'sessions_per_second': round(args.sessions / elapsed) if elapsed else 0,
+                }
+    finally:
+        workdir.cleanup()
+    return results
+
+
+def print_results(results: dict) -> None:
+    print(f"{'scenario':<16}{'sessions':>12}{'chunks':>8}{'daily rows':>12}{'seconds':>10}{'sessions/s':>14}")
+    for scenario, result in results.items():
+        print(f"{scenario:<16}{result['sessions']:>12}{result['chunks']:>8}{result['daily_rows']:>12}"
+              f"{result['elapsed_seconds']:>10}{result['sessions_per_second']:>14}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--days', type=int, default=730, help='days the history is spread over')
+    parser.add_argument('--chunk-days', type=int, nargs='+', default=[31], help='chunk sizes to compare')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database', help='SQLAlchemy URI (default: a fresh temporary SQLite file)')
+    parser.add_argument('--output', help='JSON result path (default: benchmarks/results/rebuild-<commit>.json)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = run(args)
+    print_results(results)
+    config = {key: value for key, value in vars(args).items() if key != 'output'}
+    print(f"results: {write_results('rebuild', config, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
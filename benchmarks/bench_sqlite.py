@@ -0,0 +1,36 @@
+"""
+Compare API throughput with the SQLite profile (WAL, pragmas, pool sizing) on and off.
+
+Runs the bench_api scenarios twice against fresh SQLite file databases,
+once with ``SQLITE_TUNING=True`` and once with ``False``.
+
+    python -m benchmarks.bench_sqlite --concurrency 8 --users 8 --iterations 200
+    python -m benchmarks.bench_sqlite --transport http --scenarios start cycle
+"""
+from benchmarks import bench_api
+from benchmarks.common import print_table, write_results
+
+PROFILES = {'tuned': True, 'default': False}
+
+
+def build_parser():
+    parser = bench_api.build_parser()
+    parser.description = __doc__.strip().splitlines()[0]
+    parser.set_defaults(scenarios=['state', 'start', 'cycle'], concurrency=8, users=8)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = {}
+    for profile, enabled in PROFILES.items():
+        args.config_overrides = {'SQLITE_TUNING': enabled}
+        for scenario, result in bench_api.run(args).items():
+            results[f'{scenario}/{profile}'] = result
+    print_table(results)
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'config_overrides')}
+    print(f"results: {write_results('sqlite', config, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Startup-time benchmark: cold ``import app`` and ``create_app()``.
+
+Each cold scenario runs in a fresh interpreter, as a newly spawned worker
+would:
+
+- ``import``: ``import app`` only
+- ``first_boot``: import + ``create_app()`` on an empty database (schema created)
+- ``worker_boot``: import + ``create_app()`` on an up-to-date database
+- ``warm_create_app``: repeated ``create_app()`` in one process (e.g. one per test)
+
+    python -m benchmarks.bench_startup --runs 20
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from benchmarks.common import percentile, temp_sqlite_uri, write_results
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+_COLD_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+if sys.argv[1] != 'import':
+    app.create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[2], 'LOG_LEVEL': 'CRITICAL'})
+print(json.dumps({'import': imported - started, 'total': time.perf_counter() - started}))
+'''
+
+
+def summarize_runs(seconds: List[float]) -> dict:
+    ordered = sorted(seconds)
+    return {
+        'runs': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+
+def cold_run(mode: str, uri: str) -> float:
+    output = subprocess.run([sys.executable, '-c', _COLD_SCRIPT, mode, uri], cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])['total']
+
+
+def run(args) -> dict:
+    workdir = tempfile.TemporaryDirectory(prefix='pomodoro-bench-')
+    results = {}
+    try:
+        results['import'] = summarize_runs([cold_run('import', '') for _ in range(args.runs)])
+
+        first = []
+        for index in range(args.runs):
+            first.append(cold_run('boot', temp_sqlite_uri(tempfile.mkdtemp(dir=workdir.name))))
+        results['first_boot'] = summarize_runs(first)
+
+        uri = temp_sqlite_uri(workdir.name)
+        cold_run('boot', uri)
+        results['worker_boot'] = summarize_runs([cold_run('boot', uri) for _ in range(args.runs)])
+
+        sys.path.insert(0, str(REPO_ROOT))
+        from app import create_app
+        create_app({'SQLALCHEMY_DATABASE_URI': uri, 'LOG_LEVEL': 'CRITICAL'})
+        warm = []
+        for _ in range(args.warm_runs):
+            started = time.perf_counter()
+            create_app({'SQLALCHEMY_DATABASE_URI': uri, 'LOG_LEVEL': 'CRITICAL'})
+            warm.append(time.perf_counter() - started)
+        results['warm_create_app'] = summarize_runs(warm)
+    finally:
+        workdir.cleanup()
+    return results
+
+
+def print_results(results: dict) -> None:
+    print(f"{'scenario':<18}{'runs':>6}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for scenario, result in results.items():
+        print(f"{scenario:<18}{result['runs']:>6}{result['mean_ms']:>10}{result['p50_ms']:>10}"
+              f"{result['p95_ms']:>10}{result['max_ms']:>10}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters per cold scenario')
+    parser.add_argument('--warm-runs', type=int, default=50, help='create_app() calls in one process')
+    parser.add_argument('--output', help='JSON result path (default: benchmarks/results/startup-<commit>.json)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = run(args)
+    print_results(results)
+    config = {key: value for key, value in vars(args).items() if key != 'output'}
+    print(f"results: {write_results('startup', config, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark of ticking many kitchens: KitchenWorld.tick vs the NumPy BatchTickEngine.
+
+Creates ``--kitchens`` playing kitchens, then advances them ``--ticks`` times
+by ``--delta`` seconds each, once with the per-kitchen ``update()`` loop of
+``KitchenWorld.tick`` and once with ``deliverBatch.BatchTickEngine`` (needs
+``pip install numpy``). Waiting queues fill up over the run, so later ticks
+spawn fewer recipes.
+
+    python -m benchmarks.bench_tick --kitchens 1000 10000 100000
+"""
+import argparse
+import random
+import time
+from typing import List
+
+from benchmarks.common import percentile, write_results
+
+
+def make_world(kitchens: int, seed: int):
+    from deliverManager import KitchenObjectSO, KitchenWorld, RecipeListSO, RecipeSO
+
+    ingredients = [KitchenObjectSO(f'Ingredient{index}', index) for index in range(10)]
+    rng = random.Random(seed)
+    recipes = RecipeListSO([
+        RecipeSO(f'Recipe{index}', rng.sample(ingredients, rng.randint(2, 5))) for index in range(20)
+    ])
+    world = KitchenWorld(recipes)
+    for _ in range(kitchens):
+        world.create_kitchen()
+    # キッチン毎に生成のタイミングをずらす
+    for kitchen_id in world.kitchen_ids():
+        world.get_delivery_manager(kitchen_id).set_spawn_recipe_timer(rng.uniform(0.0, 4.0))
+    return world
+
+
+def summarize(tick_seconds: List[float], spawned: int, kitchens: int) -> dict:
+    ordered = sorted(tick_seconds)
+    total = sum(ordered)
+    return {
+        'kitchens': kitchens,
+        'ticks': len(ordered),
+        'spawned': spawned,
+        'mean_ms': round(total / len(ordered) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'kitchen_updates_per_second': round(kitchens * len(ordered) / total) if total else 0,
+    }
+
+
+def run_engine(name: str, kitchens: int, args) -> dict:
+    world = make_world(kitchens, args.seed)
+    spawned = 0
+
+    def count(sender, event_args):
+        nonlocal spawned
+        spawned += 1
+
+    for kitchen_id in world.kitchen_ids():
+        world.get_delivery_manager(kitchen_id).on_recipe_spawned.add_handler(count)
+
+    if name == 'batch':
+        from deliverBatch import BatchTickEngine
+        tick = BatchTickEngine.from_world(world, seed=args.seed).tick
+    else:
+        random.seed(args.seed)
+        tick = world.tick
+
+    tick_seconds = []
+    for _ in range(args.ticks):
+        started = time.perf_counter()
+        tick(args.delta)
+        tick_seconds.append(time.perf_counter() - started)
+    return summarize(tick_seconds, spawned, kitchens)
+
+
+def run(args) -> dict:
+    engines = ['world']
+    try:
+        import numpy  # noqa: F401
+        engines.append('batch')
+    except ImportError:
+        print('skipping batch: numpy is not installed (pip install numpy)')
+    results = {}
+    for kitchens in args.kitchens:
+        for name in engines:
+            results[f'{name}-{kitchens}'] = run_engine(name, kitchens, args)
+    return results
+
+
+def print_results(results: dict) -> None:
+    print(f"{'scenario':<16}{'kitchens':>10}{'ticks':>7}{'spawned':>10}{'mean ms':>10}{'p95 ms':>10}{'updates/s':>14}")
+    for scenario, result in results.items():
+        print(f"{scenario:<16}{result['kitchens']:>10}{result['ticks']:>7}{result['spawned']:>10}"
+              f"{result['mean_ms']:>10}{result['p95_ms']:>10}{result['kitchen_updates_per_second']:>14}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--kitchens', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--ticks', type=int, default=100)
+    parser.add_argument('--delta', type=float, default=0.1, help='seconds per tick')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='JSON result path (default: benchmarks/results/tick-<commit>.json)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = run(args)
+    print_results(results)
+    config = {key: value for key, value in vars(args).items() if key != 'output'}
+    print(f"results: {write_results('tick', config, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Shared helpers for the benchmark scripts: timing, percentiles and JSON results."""
+import json
+import math
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values), max(1, math.ceil(fraction * len(sorted_values)))) - 1
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], elapsed: float, statuses: Counter) -> dict:
+    """Latency percentiles (ms) and throughput for one scenario."""
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'elapsed_seconds': round(elapsed, 4),
+        'requests_per_second': round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def run_concurrent(make_worker: Callable[[int], Callable[[], Optional[int]]],
+                   concurrency: int, iterations: int) -> dict:
+    """
+    Run ``iterations`` operations on each of ``concurrency`` threads.
+
+    ``make_worker(i)`` is called on the worker thread and returns the
+    operation. An operation returns the HTTP status to record, or None to
+    leave it out of the timings (e.g. untimed setup steps).
+    """
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency + 1)
+
+    def worker(index):
+        operation = make_worker(index)
+        local_latencies, local_statuses = [], Counter()
+        barrier.wait()
+        for _ in range(iterations):
+            start = time.perf_counter()
+            status = operation()
+            if status is not None:
+                local_latencies.append(time.perf_counter() - start)
+                local_statuses[status] += 1
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, time.perf_counter() - start, statuses)
+
+
+def temp_sqlite_uri(directory: Optional[str] = None) -> str:
+    """URI of a fresh SQLite file database (benchmarks never touch pomodoro.db)."""
+    directory = directory or tempfile.mkdtemp(prefix='pomodoro-bench-')
+    return 'sqlite:///' + os.path.join(directory, 'bench.db')
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True, cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(name: str, config: dict, results: Dict[str, dict], output: Optional[str] = None) -> Path:
+    """Store results as JSON (default: benchmarks/results/<name>-<commit>.json) and return the path."""
+    commit = git_commit()
+    payload = {
+        'benchmark': name,
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': config,
+        'results': results,
+    }
+    path = Path(output) if output else RESULTS_DIR / f'{name}-{commit or "unknown"}.json'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, indent=2) + '\n')
+    return path
+
+
+def print_table(results: Dict[str, dict]) -> None:
+    print(f"{'scenario':<24}{'req':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  statuses")
+    for scenario, result in results.items():
+        print(f"{scenario:<24}{result['requests']:>8}{result['requests_per_second']:>10}"
+              f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}  {result['statuses']}")
@@ -0,0 +1,40 @@
+"""
+Compare two benchmark result files, e.g. from two commits.
+
+    python -m benchmarks.compare benchmarks/results/api-abc123.json benchmarks/results/api-def456.json
+"""
+import argparse
+import json
+
+METRICS = ('requests_per_second', 'p50_ms', 'p95_ms', 'p99_ms')
+
+
+def compare(base: dict, head: dict) -> None:
+    print(f"{base.get('commit')} -> {head.get('commit')}")
+    print(f"{'scenario':<24}" + ''.join(f'{metric:>22}' for metric in METRICS))
+    for scenario, head_result in head['results'].items():
+        base_result = base['results'].get(scenario)
+        if base_result is None:
+            continue
+        cells = []
+        for metric in METRICS:
+            before, after = base_result.get(metric), head_result.get(metric)
+            if not isinstance(before, (int, float)) or not isinstance(after, (int, float)):
+                cells.append(f"{'-':>22}")
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            cells.append(f'{before:>9}->{after:<9}{change:+.0f}%'.rjust(22))
+        print(f'{scenario:<24}' + ''.join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark JSON result files.')
+    parser.add_argument('base')
+    parser.add_argument('head')
+    args = parser.parse_args(argv)
+    with open(args.base) as base, open(args.head) as head:
+        compare(json.load(base), json.load(head))
+
+
+if __name__ == '__main__':
+    main()
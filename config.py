@@ -8,3 +8,24 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     TIMEZONE = os.getenv('TIMEZONE', 'UTC')
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    # 非同期ログ: キューが満杯の時は 'drop' (破棄して件数を数える) か 'block'
+    LOG_ASYNC = os.getenv('LOG_ASYNC', 'True').lower() == 'true'
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+    LOG_QUEUE_POLICY = os.getenv('LOG_QUEUE_POLICY', 'drop')
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    SSE_KEEPALIVE_SECONDS = int(os.getenv('SSE_KEEPALIVE_SECONDS', '15'))
+    # asgi.py: /state と /events 以外のリクエストを処理するスレッド数
+    ASGI_THREADS = int(os.getenv('ASGI_THREADS', '16'))
+    # Idempotency-Key 付き操作の応答を保持する時間 (オフライン操作の再送用)
+    IDEMPOTENCY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_TTL_HOURS', '24'))
+    # 認証済みリバースプロキシがユーザーIDを渡すヘッダー名 (未設定なら session['user_id'])
+    TRUSTED_USER_HEADER = os.getenv('TRUSTED_USER_HEADER') or None
+    # SQLiteファイルDB用プロファイル: WAL + synchronous=NORMAL で読み書きを並行させる
+    SQLITE_TUNING = os.getenv('SQLITE_TUNING', 'True').lower() == 'true'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_CACHE_SIZE_KIB = int(os.getenv('SQLITE_CACHE_SIZE_KIB', '16384'))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', '8'))
+    SQLITE_MAX_OVERFLOW = int(os.getenv('SQLITE_MAX_OVERFLOW', '8'))
+    # create_app() がこの時間 (ms) を超えたら警告ログを出す (0で無効)
+    STARTUP_BUDGET_MS = int(os.getenv('STARTUP_BUDGET_MS', '500'))
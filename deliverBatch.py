@@ -0,0 +1,161 @@
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from deliverManager import DeliveryManager, KitchenGameManager, KitchenWorld
+
+try:
+    import numpy as np
+except ImportError:  # 任意依存: 無ければ KitchenWorld.tick で1キッチンずつ更新する
+    np = None
+
+
+class BatchTickEngine:
+    """多数の DeliveryManager のレシピ生成タイマーを NumPy 配列でまとめて進めるバッチ更新エンジン
+
+    生成タイマー・待機数・上限・ゲーム進行中フラグを配列で持ち、1回の tick で
+    全キッチンのタイマーをベクトル演算で進める。Python のループと
+    on_recipe_spawned の発火は実際に生成したキッチンだけで行う。
+
+    fixed_step を持つマネージャーは DeliveryManager.update() と同じく経過時間を
+    キッチン毎の配列に貯め、fixed_step 秒ずつ進める (1回の tick で複数ステップ
+    進むキッチンはステップ毎にまとめて処理する)。生成するレシピは、seed を省略
+    すると各マネージャーの乱数 (KitchenWorld の seed から作ったもの) で選ぶので
+    KitchenWorld.tick と同じ注文になる。seed を指定するとシード付きの
+    numpy.random.Generator からまとめて引く (速いが注文は KitchenWorld.tick と異なる)。
+
+    エンジンに登録したキッチンは DeliveryManager.update() ではなく tick() で進める
+    (タイマーと持ち越し時間はエンジンが持つ。update() に戻す前に sync_timers() で
+    書き戻す)。待機数は on_recipe_completed、進行中フラグは
+    KitchenGameManager.on_state_changed で追従する。これらのハンドラーは弱参照で
+    登録するので、使わなくなったエンジンは回収されてイベントから外れる。すぐに
+    外す場合は close() を呼ぶか with 文で使う。
+    """
+
+    def __init__(self, delivery_managers: Iterable[DeliveryManager], seed: Optional[int] = None,
+                 clock: Callable[[], float] = time.time):
+        if np is None:
+            raise ImportError("BatchTickEngine には numpy が必要です (pip install numpy)。"
+                              "numpy が無い環境では KitchenWorld.tick を使ってください")
+        self._delivery_managers: List[DeliveryManager] = list(delivery_managers)
+        self._rng = np.random.default_rng(seed) if seed is not None else None
+        self._clock = clock
+        self._last_tick_time: Optional[float] = None
+
+        managers = self._delivery_managers
+        self.spawn_timers = np.array([m.get_spawn_recipe_timer() for m in managers], dtype=np.float64)
+        self.spawn_timer_max = np.array([m.get_spawn_recipe_timer_max() for m in managers], dtype=np.float64)
+        self.waiting_counts = np.array([m.get_waiting_recipes_amount() for m in managers], dtype=np.int64)
+        self.waiting_max = np.array([m.get_waiting_recipes_max() for m in managers], dtype=np.int64)
+        self.recipe_counts = np.array([len(m.get_recipe_list_so().recipe_so_list) for m in managers], dtype=np.int64)
+        self.playing = np.array([m.get_kitchen_game_manager().is_game_playing() for m in managers], dtype=bool)
+        # 固定ステップ (無いキッチンは 0.0) と、ステップに満たず持ち越している秒数
+        self.fixed_steps = np.array([m.get_fixed_step() or 0.0 for m in managers], dtype=np.float64)
+        self.accumulated_times = np.array([m.get_accumulated_time() for m in managers], dtype=np.float64)
+        self._fixed = self.fixed_steps > 0.0
+        self._any_fixed = bool(self._fixed.any())
+
+        # 送信元 -> 配列の番号 (共有の KitchenGameManager は複数のキッチンに対応する)
+        self._index_by_manager: Dict[int, int] = {}
+        game_indices: Dict[int, List[int]] = {}
+        self._game_managers: List[KitchenGameManager] = []
+        for index, manager in enumerate(managers):
+            self._index_by_manager[id(manager)] = index
+            manager.on_recipe_completed.add_handler(self._on_recipe_completed, weak=True)
+            game_manager = manager.get_kitchen_game_manager()
+            if id(game_manager) not in game_indices:
+                game_indices[id(game_manager)] = []
+                self._game_managers.append(game_manager)
+                game_manager.on_state_changed.add_handler(self._on_state_changed, weak=True)
+            game_indices[id(game_manager)].append(index)
+        self._indices_by_game_manager = {key: np.array(indices, dtype=np.intp) for key, indices in game_indices.items()}
+
+    @classmethod
+    def from_world(cls, world: KitchenWorld, seed: Optional[int] = None) -> 'BatchTickEngine':
+        """KitchenWorld の現在のキッチンをまとめて登録 (後から追加したキッチンは含まれない)"""
+        managers = (world.get_delivery_manager(kitchen_id) for kitchen_id in world.kitchen_ids())
+        return cls(managers, seed, world.get_clock())
+
+    def _on_recipe_completed(self, sender: DeliveryManager, args):
+        self.waiting_counts[self._index_by_manager[id(sender)]] -= 1
+
+    def _on_state_changed(self, sender: KitchenGameManager, args):
+        self.playing[self._indices_by_game_manager[id(sender)]] = sender.is_game_playing()
+
+    def close(self):
+        """登録したハンドラーを外す (以後は待機数・進行中フラグを追従しない)"""
+        for manager in self._delivery_managers:
+            manager.on_recipe_completed.remove_handler(self._on_recipe_completed)
+        for game_manager in self._game_managers:
+            game_manager.on_state_changed.remove_handler(self._on_state_changed)
+
+    def __enter__(self) -> 'BatchTickEngine':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._delivery_managers)
+
+    def tick(self, delta_time: Optional[float] = None):
+        """全キッチンを delta_time 秒進め、レシピを生成したキッチンの番号を返す
+
+        番号はステップ毎に登録順で並び、複数ステップで生成したキッチンは生成した
+        回数だけ含まれる。delta_time を省略すると前回の tick からの経過時間を clock で測る。
+        """
+        if delta_time is None:
+            current_time = self._clock()
+            delta_time = 0.0 if self._last_tick_time is None else current_time - self._last_tick_time
+            self._last_tick_time = current_time
+
+        if not self._any_fixed:
+            return self._step(delta_time)
+
+        # DeliveryManager.update() と同じ式でステップ数と持ち越しを求める
+        fixed = self._fixed
+        accumulated = self.accumulated_times
+        accumulated[fixed] += delta_time
+        step_counts = np.ones(len(self), dtype=np.int64)
+        step_counts[fixed] = ((accumulated[fixed] + 1e-9) // self.fixed_steps[fixed]).astype(np.int64)
+        accumulated[fixed] = np.maximum(0.0, accumulated[fixed] - step_counts[fixed] * self.fixed_steps[fixed])
+        step_sizes = np.where(fixed, self.fixed_steps, delta_time)
+
+        spawned = []
+        for step in range(int(step_counts.max(initial=0))):
+            stepping = step_counts > step
+            spawned.append(self._step(step_sizes, stepping))
+        return np.concatenate(spawned) if spawned else np.empty(0, dtype=np.intp)
+
+    def _step(self, step_sizes, stepping=None):
+        """stepping のキッチン (省略時は全キッチン) のタイマーを1ステップ進めて生成する"""
+        timers = self.spawn_timers
+        if stepping is None:
+            timers -= step_sizes
+            due = timers <= 0.0
+        else:
+            timers[stepping] -= step_sizes[stepping]
+            due = stepping & (timers <= 0.0)
+        # DeliveryManager.update() と同じく、進行中かどうかに関わらず期限が来たらタイマーを戻す
+        timers[due] = self.spawn_timer_max[due]
+        spawning = np.flatnonzero(due & self.playing & (self.waiting_counts < self.waiting_max))
+        if spawning.size == 0:
+            return spawning
+
+        # ハンドラー内で配達されても数が合うよう、発火前に待機数を増やす
+        self.waiting_counts[spawning] += 1
+        managers = self._delivery_managers
+        if self._rng is None:
+            for index in spawning.tolist():
+                managers[index].spawn_random_recipe()
+        else:
+            choices = self._rng.integers(0, self.recipe_counts[spawning])
+            for index, choice in zip(spawning.tolist(), choices.tolist()):
+                managers[index].spawn_recipe(choice)
+        return spawning
+
+    def sync_timers(self):
+        """エンジンのタイマー値と持ち越し時間を各 DeliveryManager に書き戻す (update() で進める前に呼ぶ)"""
+        for manager, timer, accumulated in zip(self._delivery_managers, self.spawn_timers.tolist(),
+                                               self.accumulated_times.tolist()):
+            manager.set_spawn_recipe_timer(timer)
+            manager.set_accumulated_time(accumulated)
@@ -1,35 +1,120 @@
 import time
 import random
-from typing import List, Callable, Optional
+import types
+import weakref
+from collections import deque
+from typing import Deque, Dict, Hashable, Iterable, List, Callable, Optional, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 
+# 材料の多重集合を表すキー: (object_id, name) をソートしたタプル
+RecipeKey = Tuple[Tuple[int, str], ...]
+
+
+def recipe_key(kitchen_object_so_list: Iterable['KitchenObjectSO']) -> RecipeKey:
+    """材料リストの並び順に依存しない多重集合キーを作る (同じ材料の個数も区別する)"""
+    return tuple(sorted((kitchen_object_so.object_id, kitchen_object_so.name)
+                        for kitchen_object_so in kitchen_object_so_list))
+
+
+class SimulationClock:
+    """手動で進める時計 (clock に渡すと time.time() の代わりに使われ、実時間に依存しない)"""
+    
+    def __init__(self, start: float = 0.0):
+        self._now = start
+    
+    def __call__(self) -> float:
+        return self._now
+    
+    def advance(self, seconds: float):
+        """時計を seconds 秒進める"""
+        self._now += seconds
+
 
 class EventArgs:
-    """イベント引数の基底クラス"""
-    pass
+    """イベント引数の基底クラス (引数なしの発火には共有の EventArgs.EMPTY を渡す)"""
+    __slots__ = ()
+    
+    EMPTY: 'EventArgs'
+
+
+# 属性を持てない不変インスタンスなので全イベントで使い回せる (C# の EventArgs.Empty)
+EventArgs.EMPTY = EventArgs()
+
+
+def _handler_key(handler: Callable) -> Hashable:
+    """ハンドラーの登録キー: バウンドメソッドは (インスタンス, 関数) の組、それ以外は本体
+    
+    obj.method は参照する度に別のオブジェクトになるので、同じ組を同じハンドラーとみなす。
+    弱参照で登録したハンドラーを保持しないよう、キーには id を使う。
+    """
+    if isinstance(handler, types.MethodType):
+        return id(handler.__self__), id(handler.__func__)
+    return id(handler)
 
 
 class Event:
-    """C#のeventに相当するクラス"""
+    """C#のeventに相当するクラス
+    
+    ハンドラーは登録順の dict に持つので追加・削除は O(1)。発火時は登録内容の
+    タプル (スナップショット) を回し、スナップショットは登録内容が変わった後の
+    最初の発火で作り直す。ハンドラー内で追加・削除しても実行中の発火には影響せず
+    (C# と同じく次の発火から反映される)、登録が変わらない間は発火毎の確保もない。
+    
+    weak=True で登録したハンドラーは弱参照で持ち、登録元が破棄されると自動で外れる。
+    """
+    __slots__ = ('_handlers', '_snapshot')
     
     def __init__(self):
-        self._handlers: List[Callable] = []
+        # キー -> (ハンドラー または その弱参照, 弱参照かどうか)
+        self._handlers: Dict[Hashable, Tuple[Callable, bool]] = {}
+        self._snapshot: Optional[Tuple[Tuple[Callable, bool], ...]] = ()
     
-    def add_handler(self, handler: Callable):
-        """イベントハンドラーを追加"""
-        if handler not in self._handlers:
-            self._handlers.append(handler)
+    def add_handler(self, handler: Callable, weak: bool = False):
+        """イベントハンドラーを追加 (登録済みなら何もしない)
+        
+        weak=True ならハンドラーを弱参照で持つ。バウンドメソッドはインスタンスが、
+        関数は関数自体が破棄されると外れる。
+        """
+        key = _handler_key(handler)
+        if key in self._handlers:
+            return
+        if weak:
+            def on_collected(_ref, key=key):
+                self._handlers.pop(key, None)
+                self._snapshot = None
+            if isinstance(handler, types.MethodType):
+                entry = (weakref.WeakMethod(handler, on_collected), True)
+            else:
+                entry = (weakref.ref(handler, on_collected), True)
+        else:
+            entry = (handler, False)
+        self._handlers[key] = entry
+        self._snapshot = None
     
     def remove_handler(self, handler: Callable):
         """イベントハンドラーを削除"""
-        if handler in self._handlers:
-            self._handlers.remove(handler)
+        if self._handlers.pop(_handler_key(handler), None) is not None:
+            self._snapshot = None
+    
+    def __len__(self) -> int:
+        return len(self._handlers)
     
     def invoke(self, sender, args: EventArgs = None):
         """イベントを発火"""
-        for handler in self._handlers:
-            handler(sender, args or EventArgs())
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._snapshot = tuple(self._handlers.values())
+        if not snapshot:
+            return
+        if args is None:
+            args = EventArgs.EMPTY
+        for handler, weak in snapshot:
+            if weak:
+                handler = handler()
+                if handler is None:
+                    continue
+            handler(sender, args)
 
 
 @dataclass
@@ -68,12 +153,14 @@ class PlateKitchenObject:
 
 
 class KitchenGameManager:
-    """キッチンゲームマネージャー（Singleton）"""
+    """キッチンゲームマネージャー（get_instance で共有インスタンス、KitchenWorld ではキッチン毎に生成）"""
     
     _instance: Optional['KitchenGameManager'] = None
     
     def __init__(self):
         self._is_game_playing = False
+        # ゲームの開始・停止を通知 (BatchTickEngine が進行中フラグの配列を更新する)
+        self.on_state_changed = Event()
     
     @classmethod
     def get_instance(cls) -> 'KitchenGameManager':
@@ -89,10 +176,12 @@ class KitchenGameManager:
     def start_game(self):
         """ゲーム開始"""
         self._is_game_playing = True
+        self.on_state_changed.invoke(self)
     
     def stop_game(self):
         """ゲーム停止"""
         self._is_game_playing = False
+        self.on_state_changed.invoke(self)
 
 
 class DeliveryManager:
@@ -105,7 +194,16 @@ class DeliveryManager:
     
     _instance: Optional['DeliveryManager'] = None
     
-    def __init__(self, recipe_list_so: RecipeListSO):
+    def __init__(self, recipe_list_so: RecipeListSO,
+                 kitchen_game_manager: Optional[KitchenGameManager] = None,
+                 clock: Callable[[], float] = time.time,
+                 rng: Optional[random.Random] = None,
+                 fixed_step: Optional[float] = None):
+        """clock は update() の経過時間の計測に使う時計、rng はレシピ選択の乱数
+        (省略時は random モジュール)。fixed_step を指定すると固定ステップで進める。
+        """
+        if fixed_step is not None and fixed_step <= 0.0:
+            raise ValueError("fixed_step は正の秒数を指定してください")
         # イベント定義
         self.on_recipe_spawned = Event()
         self.on_recipe_completed = Event()
@@ -114,12 +212,26 @@ class DeliveryManager:
         
         # プライベート変数
         self._recipe_list_so = recipe_list_so
-        self._waiting_recipe_so_list: List[RecipeSO] = []
+        # 省略時は共有の KitchenGameManager (1プロセス1キッチンの従来の使い方)
+        self._kitchen_game_manager = kitchen_game_manager or KitchenGameManager.get_instance()
+        # レシピ毎の多重集合キーは生成時に一度だけ計算する
+        self._recipe_keys: List[RecipeKey] = [
+            recipe_key(recipe_so.kitchen_object_so_list) for recipe_so in recipe_list_so.recipe_so_list
+        ]
+        # 待機中のレシピ: 受付番号 -> (レシピ, キー) (挿入順 = 注文順)
+        self._waiting_recipes: Dict[int, Tuple[RecipeSO, RecipeKey]] = {}
+        # キー -> そのキーの待機中レシピの受付番号 (古い順)
+        self._waiting_tickets_by_key: Dict[RecipeKey, Deque[int]] = {}
+        self._next_ticket = 0
         self._spawn_recipe_timer = 0.0
         self._spawn_recipe_timer_max = 4.0
         self._waiting_recipes_max = 4
         self._successful_recipes_amount = 0
-        self._last_update_time = time.time()
+        self._clock = clock
+        self._rng = rng or random
+        self._fixed_step = fixed_step
+        self._accumulated_time = 0.0
+        self._last_update_time = clock()
     
     @classmethod
     def get_instance(cls, recipe_list_so: RecipeListSO = None) -> 'DeliveryManager':
@@ -130,72 +242,206 @@ class DeliveryManager:
             cls._instance = cls(recipe_list_so)
         return cls._instance
     
-    def update(self):
-        """フレーム更新処理（UnityのUpdate相当）"""
-        current_time = time.time()
-        delta_time = current_time - self._last_update_time
-        self._last_update_time = current_time
+    def update(self, delta_time: Optional[float] = None):
+        """フレーム更新処理（UnityのUpdate相当）
+        
+        delta_time を省略すると前回の呼び出しからの経過時間を clock で測る。
+        KitchenWorld のように呼び出し側がまとめて時間を進める場合は経過秒数を渡す。
         
+        fixed_step を指定したマネージャーは経過時間を貯めて fixed_step 秒ずつ進める
+        (端数は次回に持ち越す)。フレームの長さに関わらず同じシードなら同じ結果になり、
+        update(300.0) で5分間のセッションを実時間を待たずにシミュレーションできる。
+        """
+        if delta_time is None:
+            current_time = self._clock()
+            delta_time = current_time - self._last_update_time
+            self._last_update_time = current_time
+        
+        if self._fixed_step is None:
+            self._step(delta_time)
+            return
+        
+        # 0.1 を足し引きした誤差でステップが欠けないよう、回数をまとめて求める
+        self._accumulated_time += delta_time
+        steps = int((self._accumulated_time + 1e-9) // self._fixed_step)
+        self._accumulated_time = max(0.0, self._accumulated_time - steps * self._fixed_step)
+        for _ in range(steps):
+            self._step(self._fixed_step)
+    
+    def _step(self, delta_time: float):
+        """生成タイマーを delta_time 秒進め、期限が来たらレシピを生成"""
         self._spawn_recipe_timer -= delta_time
         
         if self._spawn_recipe_timer <= 0.0:
             self._spawn_recipe_timer = self._spawn_recipe_timer_max
             
-            kitchen_game_manager = KitchenGameManager.get_instance()
-            if (kitchen_game_manager.is_game_playing() and 
-                len(self._waiting_recipe_so_list) < self._waiting_recipes_max):
-                
-                # ランダムにレシピを選択
-                waiting_recipe_so = random.choice(self._recipe_list_so.recipe_so_list)
-                self._waiting_recipe_so_list.append(waiting_recipe_so)
+            if (self._kitchen_game_manager.is_game_playing() and 
+                len(self._waiting_recipes) < self._waiting_recipes_max):
                 
-                # イベント発火
-                self.on_recipe_spawned.invoke(self)
+                self.spawn_random_recipe()
+    
+    def spawn_random_recipe(self):
+        """このマネージャーの乱数でレシピを選んで生成 (random.choice と同じ乱数列)"""
+        self.spawn_recipe(self._rng.randrange(len(self._recipe_list_so.recipe_so_list)))
+    
+    def spawn_recipe(self, index: int):
+        """RecipeListSO の index 番目のレシピを待機中に追加して on_recipe_spawned を発火"""
+        self._add_waiting_recipe(self._recipe_list_so.recipe_so_list[index], self._recipe_keys[index])
+        
+        # イベント発火
+        self.on_recipe_spawned.invoke(self)
+    
+    def _add_waiting_recipe(self, recipe_so: RecipeSO, key: RecipeKey):
+        """待機中のレシピに受付番号を付けて追加"""
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        self._waiting_recipes[ticket] = (recipe_so, key)
+        self._waiting_tickets_by_key.setdefault(key, deque()).append(ticket)
     
     def deliver_recipe(self, plate_kitchen_object: PlateKitchenObject):
-        """レシピの材料と皿の材料が一致しているかどうかを確認する"""
+        """皿の材料と多重集合として一致する待機中のレシピのうち、最も古い注文を完了する
         
-        for i, waiting_recipe_so in enumerate(self._waiting_recipe_so_list):
-            plate_ingredients = plate_kitchen_object.get_kitchen_object_so_list()
-            
-            # 材料数が一致するかチェック
-            if len(waiting_recipe_so.kitchen_object_so_list) == len(plate_ingredients):
-                plate_contents_matches_recipe = True
-                
-                # レシピの各材料をチェック
-                for recipe_kitchen_object_so in waiting_recipe_so.kitchen_object_so_list:
-                    ingredient_found = False
-                    
-                    # 皿の材料と照合
-                    for plate_kitchen_object_so in plate_ingredients:
-                        if plate_kitchen_object_so == recipe_kitchen_object_so:
-                            ingredient_found = True
-                            break
-                    
-                    if not ingredient_found:
-                        plate_contents_matches_recipe = False
-                        break
-                
-                # 材料が完全に一致した場合
-                if plate_contents_matches_recipe:
-                    self._successful_recipes_amount += 1
-                    self._waiting_recipe_so_list.pop(i)
-                    
-                    # 成功イベント発火
-                    self.on_recipe_completed.invoke(self)
-                    self.on_recipe_success.invoke(self)
-                    return
+        皿の材料からキーを作り、キー毎の受付番号の索引を一度引くだけなので、
+        待機中のレシピ数に依存せず材料数 k に対して O(k log k) で照合できる。
+        """
+        key = recipe_key(plate_kitchen_object.get_kitchen_object_so_list())
+        tickets = self._waiting_tickets_by_key.get(key)
         
         # 一致するレシピが見つからなかった場合
-        self.on_recipe_failed.invoke(self)
+        if not tickets:
+            self.on_recipe_failed.invoke(self)
+            return
+        
+        del self._waiting_recipes[tickets.popleft()]
+        if not tickets:
+            del self._waiting_tickets_by_key[key]
+        self._successful_recipes_amount += 1
+        
+        # 成功イベント発火
+        self.on_recipe_completed.invoke(self)
+        self.on_recipe_success.invoke(self)
     
     def get_waiting_recipe_so_list(self) -> List[RecipeSO]:
-        """待機中のレシピリストを取得"""
-        return self._waiting_recipe_so_list.copy()
+        """待機中のレシピリストを取得 (注文順)"""
+        return [recipe_so for recipe_so, _ in self._waiting_recipes.values()]
     
     def get_successful_recipes_amount(self) -> int:
         """成功したレシピ数を取得"""
         return self._successful_recipes_amount
+    
+    def get_kitchen_game_manager(self) -> KitchenGameManager:
+        """このキッチンのゲームマネージャーを取得"""
+        return self._kitchen_game_manager
+    
+    def get_recipe_list_so(self) -> RecipeListSO:
+        """生成するレシピの一覧を取得"""
+        return self._recipe_list_so
+    
+    def get_waiting_recipes_amount(self) -> int:
+        """待機中のレシピ数を取得"""
+        return len(self._waiting_recipes)
+    
+    def get_waiting_recipes_max(self) -> int:
+        """待機できるレシピ数の上限を取得"""
+        return self._waiting_recipes_max
+    
+    def set_waiting_recipes_max(self, amount: int):
+        """待機できるレシピ数の上限を設定"""
+        self._waiting_recipes_max = amount
+    
+    def get_spawn_recipe_timer(self) -> float:
+        """次のレシピ生成までの残り秒数を取得"""
+        return self._spawn_recipe_timer
+    
+    def set_spawn_recipe_timer(self, seconds: float):
+        """次のレシピ生成までの残り秒数を設定 (キッチン毎に生成のタイミングをずらす場合など)"""
+        self._spawn_recipe_timer = seconds
+    
+    def get_spawn_recipe_timer_max(self) -> float:
+        """レシピ生成の間隔 (秒) を取得"""
+        return self._spawn_recipe_timer_max
+    
+    def get_fixed_step(self) -> Optional[float]:
+        """固定ステップの秒数を取得 (固定ステップでなければ None)"""
+        return self._fixed_step
+    
+    def get_accumulated_time(self) -> float:
+        """固定ステップに満たず次回に持ち越している秒数を取得"""
+        return self._accumulated_time
+    
+    def set_accumulated_time(self, seconds: float):
+        """固定ステップに満たず次回に持ち越す秒数を設定"""
+        self._accumulated_time = seconds
+
+
+class KitchenWorld:
+    """独立した多数のキッチンを1プロセスで保持し、1つのループでまとめて更新するレジストリ
+    
+    キッチン毎に KitchenGameManager と DeliveryManager を持つので、シングルトンに
+    依存せずサーバー側のシミュレーションやボットを並べて動かせる。tick() は
+    clock を1回だけ読み、同じ経過時間で全キッチンを更新する。
+    
+    seed を指定するとキッチン毎の乱数をそこから作るので、作成順と tick の列が
+    同じなら何度実行しても同じ注文が出る。clock と fixed_step は各キッチンの
+    DeliveryManager に渡す。
+    """
+    
+    def __init__(self, recipe_list_so: RecipeListSO, clock: Callable[[], float] = time.time,
+                 seed: Optional[int] = None, fixed_step: Optional[float] = None):
+        self._recipe_list_so = recipe_list_so
+        self._clock = clock
+        self._rng = random.Random(seed) if seed is not None else None
+        self._fixed_step = fixed_step
+        self._kitchens: Dict[int, DeliveryManager] = {}
+        self._next_kitchen_id = 0
+        self._last_tick_time: Optional[float] = None
+    
+    def create_kitchen(self, recipe_list_so: Optional[RecipeListSO] = None, start: bool = True) -> int:
+        """キッチンを追加してIDを返す (start=True ならゲームを開始した状態で作る)"""
+        kitchen_game_manager = KitchenGameManager()
+        if start:
+            kitchen_game_manager.start_game()
+        kitchen_id = self._next_kitchen_id
+        self._next_kitchen_id += 1
+        rng = random.Random(self._rng.getrandbits(64)) if self._rng is not None else None
+        self._kitchens[kitchen_id] = DeliveryManager(
+            recipe_list_so or self._recipe_list_so, kitchen_game_manager,
+            clock=self._clock, rng=rng, fixed_step=self._fixed_step,
+        )
+        return kitchen_id
+    
+    def remove_kitchen(self, kitchen_id: int):
+        """キッチンを削除"""
+        del self._kitchens[kitchen_id]
+    
+    def get_delivery_manager(self, kitchen_id: int) -> DeliveryManager:
+        """キッチンの DeliveryManager を取得"""
+        return self._kitchens[kitchen_id]
+    
+    def get_kitchen_game_manager(self, kitchen_id: int) -> KitchenGameManager:
+        """キッチンの KitchenGameManager を取得"""
+        return self._kitchens[kitchen_id].get_kitchen_game_manager()
+    
+    def get_clock(self) -> Callable[[], float]:
+        """各キッチンに渡している時計を取得"""
+        return self._clock
+    
+    def kitchen_ids(self) -> List[int]:
+        """キッチンIDの一覧 (作成順)"""
+        return list(self._kitchens)
+    
+    def __len__(self) -> int:
+        return len(self._kitchens)
+    
+    def tick(self, delta_time: Optional[float] = None):
+        """全キッチンを同じ経過時間だけ進める (省略時は前回の tick からの実時間)"""
+        if delta_time is None:
+            current_time = self._clock()
+            delta_time = 0.0 if self._last_tick_time is None else current_time - self._last_tick_time
+            self._last_tick_time = current_time
+        # ハンドラー内でキッチンが追加・削除されても安全なようにコピーを回す
+        for delivery_manager in list(self._kitchens.values()):
+            delivery_manager.update(delta_time)
 
 
 # 使用例
@@ -215,7 +461,8 @@ if __name__ == "__main__":
     game_manager = KitchenGameManager.get_instance()
     game_manager.start_game()
     
-    delivery_manager = DeliveryManager.get_instance(recipe_list)
+    # シード付きの乱数と固定ステップ (0.1秒) で、毎回同じ注文を実時間を待たずに生成する
+    delivery_manager = DeliveryManager(recipe_list, game_manager, rng=random.Random(1), fixed_step=0.1)
     
     # イベントハンドラーの設定
     def on_recipe_spawned(sender, args):
@@ -234,11 +481,8 @@ if __name__ == "__main__":
     # サンプル実行
     print("ゲーム開始...")
     
-    # 5秒間更新処理を実行
-    start_time = time.time()
-    while time.time() - start_time < 5:
-        delivery_manager.update()
-        time.sleep(0.1)  # 100ms間隔で更新
+    # 5秒分を 0.1秒 x 50ステップで即座に進める
+    delivery_manager.update(5.0)
     
     print(f"待機中のレシピ数: {len(delivery_manager.get_waiting_recipe_so_list())}")
     
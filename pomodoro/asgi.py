@@ -0,0 +1,228 @@
+"""
+ASGI front end for the Flask app.
+
+``GET /events`` streams from the event loop: an SSE stream is an
+``AsyncSubscription`` instead of a worker thread blocked on a queue, so
+idle streams cost a few objects each (only the initial state read uses a
+pool thread). Every other request runs the Flask app unchanged on a
+bounded thread pool; reading the state checks the user's state version in
+the database, so it is never done on the event loop. Request bodies are
+not buffered: ``wsgi.input`` pulls ``http.request`` chunks from the event
+loop as the app reads them, so ``POST /import`` streams like it does
+under WSGI.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+from flask import Flask
+from .events import AsyncSubscription, format_sse, get_event_broker
+from .services import get_state
+from .users import current_user_id
+
+API_PREFIX = '/api/pomodoro'
+EVENTS_PATH = API_PREFIX + '/events'
+
+SSE_HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+
+def build_environ(scope: dict, wsgi_input) -> dict:
+    """WSGI environ (PEP 3333) for an ASGI HTTP scope; ``wsgi_input`` is the body as a binary file."""
+    script_name = scope.get('root_path', '').encode('utf-8').decode('latin-1')
+    path_info = scope['path'].encode('utf-8').decode('latin-1')
+    if script_name and path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': wsgi_input,
+        # 本文は http.request の more_body で終端する: Content-Length の無い chunked 送信も読める
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    client = scope.get('client')
+    if client:
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = client[0], str(client[1])
+    for raw_name, raw_value in scope.get('headers', ()):
+        name = raw_name.decode('latin-1').lower()
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+
+def _encode_headers(headers) -> List[Tuple[bytes, bytes]]:
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+class _ReceiveStream(io.RawIOBase):
+    """
+    Request body for a pool thread, read from the ASGI ``receive`` callable.
+
+    Each read that runs out of buffered bytes waits for the next
+    ``http.request`` message on the event loop, so at most one chunk is held
+    in memory. A disconnect ends the body early; the app then sees a short
+    read, as it would on a dropped WSGI connection.
+    """
+
+    def __init__(self, receive, loop: asyncio.AbstractEventLoop):
+        self._receive = receive
+        self._loop = loop
+        self._chunk = memoryview(b'')
+        self._more_body = True
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._chunk and self._more_body:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message['type'] == 'http.disconnect':
+                self._more_body = False
+            else:
+                self._chunk = memoryview(message.get('body', b''))
+                self._more_body = message.get('more_body', False)
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+
+async def _wait_for_disconnect(receive) -> None:
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+class PomodoroASGI:
+    """
+    ASGI application wrapping a Flask app created by ``create_app``.
+
+    The Flask app keeps its config, extensions, scheduler and database; this
+    class only decides where each request runs. Anything that touches the
+    database runs on the thread pool, so the event loop never waits on SQLite.
+    """
+
+    def __init__(self, flask_app: Flask, threads: Optional[int] = None):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads or flask_app.config.get('ASGI_THREADS', 16),
+            thread_name_prefix='pomodoro-asgi',
+        )
+        with flask_app.app_context():
+            self.broker = get_event_broker()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return  # WebSocket は未対応 (サーバーが接続を閉じる)
+
+        loop = asyncio.get_running_loop()
+        environ = build_environ(scope, io.BufferedReader(_ReceiveStream(receive, loop)))
+        if scope['method'] == 'GET' and environ['PATH_INFO'] == EVENTS_PATH:
+            # 本文は読まない: _wait_for_disconnect が http.request を読み飛ばす
+            await self._events(environ, receive, send)
+        else:
+            send_from_thread = lambda message: asyncio.run_coroutine_threadsafe(send(message), loop).result()
+            await loop.run_in_executor(self.executor, self._run_wsgi, environ, send_from_thread)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _run_in_context(self, environ: dict, func: Callable):
+        with self.flask_app.request_context(environ):
+            return func()
+
+    async def _call(self, environ: dict, func: Callable):
+        """Run ``func`` in a request context on the thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._run_in_context, environ, func)
+
+    def _open_stream(self, subscription: AsyncSubscription) -> Tuple[int, str]:
+        # 取りこぼしを防ぐため、初期状態を読む前に購読する
+        user_id = current_user_id()
+        self.broker.subscribe(user_id, subscription)
+        return user_id, format_sse('state', get_state(user_id))
+
+    async def _events(self, environ: dict, receive, send):
+        """SSE stream: current state first, then one event per state change, until the client leaves."""
+        subscription = AsyncSubscription(asyncio.get_running_loop())
+        user_id, initial = await self._call(environ, lambda: self._open_stream(subscription))
+        keepalive = self.flask_app.config.get('SSE_KEEPALIVE_SECONDS', 15)
+        disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+        next_message = None
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+            await send({'type': 'http.response.body', 'body': initial.encode(), 'more_body': True})
+            while True:
+                if next_message is None:
+                    next_message = asyncio.ensure_future(subscription.get())
+                done, _ = await asyncio.wait((next_message, disconnect), timeout=keepalive,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if disconnect in done:
+                    break
+                if next_message in done:
+                    chunk, next_message = next_message.result(), None
+                else:
+                    chunk = ': keepalive\n\n'
+                await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+        finally:
+            self.broker.unsubscribe(user_id, subscription)
+            disconnect.cancel()
+            if next_message is not None:
+                next_message.cancel()
+
+    def _run_wsgi(self, environ: dict, send: Callable[[dict], None]) -> None:
+        """Run the Flask app on a pool thread, streaming its body to the ASGI server."""
+        response_start = {}
+
+        def start_response(status, headers, exc_info=None):
+            response_start.update(type='http.response.start', status=int(status.split(' ', 1)[0]),
+                                  headers=_encode_headers(headers))
+
+        def send_start():
+            if response_start.get('type'):
+                send(dict(response_start))
+                response_start['type'] = None
+
+        body = self.flask_app(environ, start_response)
+        try:
+            for chunk in body:
+                if chunk:
+                    send_start()
+                    send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        send_start()
+        send({'type': 'http.response.body', 'body': b''})
@@ -0,0 +1,108 @@
+"""Content-hashed static URLs and the pre-rendered, pre-compressed index page."""
+import gzip
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+from flask import Flask, Response, current_app, render_template, request
+
+try:
+    import brotli
+except ImportError:  # 任意依存: 無ければ gzip のみ
+    brotli = None
+
+ASSETS_EXTENSION = 'pomodoro_assets'
+HASH_LENGTH = 12
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def hash_static_files(static_folder: str) -> Dict[str, str]:
+    """Map every file under ``static_folder`` (as url_for filename) to a short content hash."""
+    hashes = {}
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:HASH_LENGTH]
+            hashes[os.path.relpath(path, static_folder).replace(os.sep, '/')] = digest
+    return hashes
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    """A rendered page with its ETag and one body per content coding."""
+    etag: str
+    bodies: Dict[str, bytes]
+
+    @classmethod
+    def build(cls, html: str) -> 'CachedPage':
+        body = html.encode('utf-8')
+        bodies = {'identity': body, 'gzip': gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            bodies['br'] = brotli.compress(body, quality=11)
+        return cls(etag=hashlib.sha256(body).hexdigest()[:HASH_LENGTH * 2], bodies=bodies)
+
+    def choose_encoding(self, accept_encodings) -> str:
+        for encoding in ('br', 'gzip'):
+            if encoding in self.bodies and accept_encodings[encoding]:
+                return encoding
+        return 'identity'
+
+
+class Assets:
+    """Per-app static hashes and the cached index page (rendered on first request)."""
+
+    def __init__(self, hashes: Dict[str, str]):
+        self.hashes = hashes
+        self.index_page: Optional[CachedPage] = None
+
+
+def init_assets(app: Flask) -> Assets:
+    """
+    Hash static files once at startup and add ``?v=<hash>`` to ``url_for('static')``.
+
+    Requests for the current hash are served with an immutable, year-long
+    Cache-Control, so browsers never revalidate them. In debug mode nothing
+    is hashed or cached, so edited files show up on reload.
+    """
+    assets = Assets({} if app.debug else hash_static_files(app.static_folder))
+    app.extensions[ASSETS_EXTENSION] = assets
+
+    @app.url_defaults
+    def _hashed_static_url(endpoint, values):
+        if endpoint == 'static' and 'v' not in values:
+            digest = assets.hashes.get(values.get('filename'))
+            if digest:
+                values['v'] = digest
+
+    @app.after_request
+    def _static_cache_headers(response):
+        if request.endpoint == 'static' and response.status_code in (200, 304):
+            digest = assets.hashes.get((request.view_args or {}).get('filename'))
+            if digest and request.args.get('v') == digest:
+                response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    return assets
+
+
+def index_response() -> Response:
+    """Serve the index page from the cache: 304 on a matching ETag, else the pre-compressed body."""
+    assets: Assets = current_app.extensions[ASSETS_EXTENSION]
+    page = assets.index_page
+    if page is None or current_app.debug:
+        # 同時に複数回描画されても内容は同じなので排他しない
+        page = CachedPage.build(render_template('pomodoro/index.html'))
+        if not current_app.debug:
+            assets.index_page = page
+
+    headers = {'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    if request.if_none_match.contains_weak(page.etag):
+        response = Response(status=304, headers=headers)
+    else:
+        encoding = page.choose_encoding(request.accept_encodings)
+        response = Response(page.bodies[encoding], mimetype='text/html', headers=headers)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(page.etag, weak=True)
+    return response
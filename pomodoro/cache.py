@@ -0,0 +1,145 @@
+"""In-process write-through cache for the Pomodoro state, validated against a per-user version."""
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+
+def as_utc(value: datetime) -> datetime:
+    """DBから取得したdatetimeはnaiveなのでUTCとして扱う"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+@dataclass(frozen=True)
+class ActiveSnapshot:
+    """Immutable copy of the fields of the active session needed by get_state()."""
+    id: int
+    user_id: int
+    type: str
+    planned_duration_sec: int
+    planned_end_at: datetime
+
+    @classmethod
+    def from_session(cls, session) -> 'ActiveSnapshot':
+        return cls(
+            id=session.id,
+            user_id=session.user_id,
+            type=session.type,
+            planned_duration_sec=session.planned_duration_sec,
+            planned_end_at=as_utc(session.planned_end_at),
+        )
+
+
+@dataclass(frozen=True)
+class StatSnapshot:
+    """Immutable copy of a DailyStat row."""
+    user_id: int
+    date: date
+    total_focus_seconds: int
+    completed_focus_count: int
+    cycle_count: int
+
+    @classmethod
+    def from_stat(cls, stat) -> 'StatSnapshot':
+        return cls(
+            user_id=stat.user_id,
+            date=stat.date,
+            total_focus_seconds=stat.total_focus_seconds,
+            completed_focus_count=stat.completed_focus_count,
+            cycle_count=stat.cycle_count,
+        )
+
+
+# apply() で変更しない項目の既定値
+UNCHANGED = object()
+
+
+class UserState:
+    """
+    Holds one user's active session and today's stats, and the state version they were loaded at.
+
+    The version and the ``(active, stat)`` pair live in one tuple that is
+    replaced with a single assignment, so a lock-free reader never sees a
+    new version together with the old state (or the reverse). Writers must
+    hold ``lock`` for the whole commit-then-apply sequence so that the
+    cache is updated in the same order as the database. The cache is only
+    trusted while ``is_current`` holds for the user's version in the
+    database (see ``StateVersion``), so changes committed by other
+    processes are picked up on the next read.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # (version, active, stat)、未読み込みなら None
+        self._snapshot: Optional[Tuple[int, Optional[ActiveSnapshot], Optional[StatSnapshot]]] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def is_current(self, version: int) -> bool:
+        """True if the cache was loaded (or last applied) at ``version``."""
+        snapshot = self._snapshot
+        return snapshot is not None and snapshot[0] == version
+
+    def snapshot(self) -> Tuple[Optional[ActiveSnapshot], Optional[StatSnapshot]]:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None, None
+        _, active, stat = snapshot
+        return active, stat
+
+    def load(self, active: Optional[ActiveSnapshot], stat: Optional[StatSnapshot], version: int) -> None:
+        self._snapshot = (version, active, stat)
+
+    def apply(self, version: int, active=UNCHANGED, stat=UNCHANGED) -> None:
+        """
+        Publish this process's committed write that produced ``version``.
+
+        If the cache was at the version right before it, the new version and
+        the changed ``active``/``stat`` replace the snapshot in one
+        assignment. Otherwise another process wrote in between, so the cache
+        is dropped and reloaded on the next read.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or snapshot[0] != version - 1:
+            self._snapshot = None
+            return
+        _, old_active, old_stat = snapshot
+        self._snapshot = (
+            version,
+            old_active if active is UNCHANGED else active,
+            old_stat if stat is UNCHANGED else stat,
+        )
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self._snapshot = None
+
+
+class StateCache:
+    """
+    Per-user ``UserState`` entries.
+
+    Each user has its own lock, so writes of different users never wait on
+    each other and a user's reads never look at other users' rows.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users: Dict[int, UserState] = {}
+
+    def for_user(self, user_id: int) -> UserState:
+        state = self._users.get(user_id)
+        if state is None:
+            with self._lock:
+                state = self._users.setdefault(user_id, UserState())
+        return state
+
+    def snapshots(self) -> List[Tuple[Optional[ActiveSnapshot], Optional[StatSnapshot]]]:
+        """Snapshots of every loaded user (for gauges)."""
+        return [state.snapshot() for state in list(self._users.values()) if state.loaded]
+
+    def invalidate(self) -> None:
+        for state in list(self._users.values()):
+            state.invalidate()
@@ -0,0 +1,35 @@
+"""Flask CLI commands (``flask --app app <command>``)."""
+from datetime import date
+import time
+import click
+from flask import Flask
+from .stats import REBUILD_CHUNK_DAYS, rebuild_history
+
+
+def _parse_date(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise click.BadParameter('expected YYYY-MM-DD')
+
+
+@click.command('rebuild-stats')
+@click.option('--start', callback=_parse_date, help='First day to rebuild (YYYY-MM-DD, default: oldest session).')
+@click.option('--end', callback=_parse_date, help='Last day to rebuild (YYYY-MM-DD, default: newest session).')
+@click.option('--chunk-days', default=REBUILD_CHUNK_DAYS, show_default=True, type=click.IntRange(min=1),
+              help='Days aggregated and committed per step.')
+@click.option('--user-id', type=int, help='Only rebuild this user (default: all users).')
+def rebuild_stats_command(start, end, chunk_days, user_id):
+    """Rebuild daily_stats and the week/month rollups from pomodoro_sessions."""
+    started = time.perf_counter()
+    total = 0
+    for chunk_start, chunk_end, written in rebuild_history(start, end, chunk_days, user_id):
+        total += written
+        click.echo(f'{chunk_start} .. {chunk_end}: {written} daily rows')
+    click.echo(f'Rebuilt {total} daily rows in {time.perf_counter() - started:.2f}s')
+
+
+def init_cli(app: Flask) -> None:
+    app.cli.add_command(rebuild_stats_command)
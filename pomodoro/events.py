@@ -0,0 +1,92 @@
+"""Server-Sent Events fan-out for Pomodoro state changes."""
+import asyncio
+import json
+import queue
+import threading
+from typing import Dict, Optional, Set, Union
+from flask import current_app
+
+EVENT_BROKER_EXTENSION = 'pomodoro_event_broker'
+
+# 遅いクライアントのキューが溢れた場合はイベントを捨てる (次のイベントで最新状態に追いつく)
+SUBSCRIBER_QUEUE_SIZE = 32
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Encode one SSE message."""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+class AsyncSubscription:
+    """Subscriber queue drained by an asyncio task; ``put_nowait`` may be called from any thread."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self._loop = loop
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def put_nowait(self, message: str) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, message)
+        except RuntimeError:
+            pass  # イベントループ終了後の publish は捨てる
+
+    def _deliver(self, message: str) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self) -> str:
+        return await self._queue.get()
+
+
+Subscription = Union[queue.Queue, AsyncSubscription]
+
+
+class EventBroker:
+    """
+    Thread-safe fan-out of pre-encoded SSE messages to one user's subscriber queues.
+
+    A subscription is anything with ``put_nowait``: a ``queue.Queue`` for WSGI
+    streams or an ``AsyncSubscription`` for the ASGI app.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+
+    def has_subscribers(self, user_id: int) -> bool:
+        return bool(self._subscribers.get(user_id))
+
+    def subscribe(self, user_id: int, subscription: Optional[Subscription] = None) -> Subscription:
+        if subscription is None:
+            subscription = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id: int, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id: int, event: str, data: dict) -> None:
+        message = format_sse(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(message)
+            except queue.Full:
+                pass
+
+
+def get_event_broker() -> EventBroker:
+    """Return the event broker of the current app."""
+    broker = current_app.extensions.get(EVENT_BROKER_EXTENSION)
+    if broker is None:
+        broker = current_app.extensions.setdefault(EVENT_BROKER_EXTENSION, EventBroker())
+    return broker
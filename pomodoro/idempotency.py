@@ -0,0 +1,160 @@
+"""Idempotency-Key support for the action endpoints (safe replay of queued offline actions)."""
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from typing import Optional
+from flask import Response, current_app, jsonify, request
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from .models import db, IdempotencyKey
+from .services import get_state, get_state_cache
+from .users import current_user_id
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 128
+# 予約済みで応答がまだ保存されていない行の status_code
+PENDING_STATUS = 0
+# オフラインの送信キューが再送の度に計算し直すため、同一リクエストの判定から除く
+ELAPSED_FIELD = 'started_seconds_ago'
+
+
+def idempotent(view):
+    """
+    Run an action view at most once per (user, ``Idempotency-Key`` header).
+
+    The key is reserved with an insert before the action runs, and the
+    unique index on (user, key) lets only one request, in any process, win
+    the reservation. The JSON response is then stored in the reserved row
+    and a retry with the same key gets it back without running the action
+    again; its ``state`` is replaced by the current one. A retry that comes
+    while the first request is still running gets 409, and a key reused
+    for a different method, path or body gets 422. 5xx responses and
+    exceptions release the key, so those retries run again. Within a
+    process, retries wait on the user's state lock and get the replay
+    instead of the 409. Requests without the header are not affected.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({
+                'error': f'{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters',
+                'field': IDEMPOTENCY_HEADER,
+            }), 400
+        user_id = current_user_id()
+        body_hash = _body_hash()
+        with get_state_cache(user_id).lock:
+            stored = _reserve(user_id, key, body_hash)
+            if stored is not None:
+                return _reject_or_replay(stored, body_hash, user_id)
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except Exception:
+                db.session.rollback()
+                _release(user_id, key)
+                raise
+            if response.status_code < 500 and response.is_json:
+                _store(user_id, key, response)
+            else:
+                _release(user_id, key)
+        return response
+    return wrapper
+
+
+def _without_elapsed(value):
+    if isinstance(value, dict):
+        return {name: _without_elapsed(item) for name, item in value.items() if name != ELAPSED_FIELD}
+    if isinstance(value, list):
+        return [_without_elapsed(item) for item in value]
+    return value
+
+
+def _body_hash() -> str:
+    """SHA-256 of the request body, with ``started_seconds_ago`` left out of JSON bodies."""
+    body = request.get_data(cache=True)
+    data = request.get_json(silent=True)
+    if data is not None:
+        body = json.dumps(_without_elapsed(data), sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.sha256(body).hexdigest()
+
+
+def _reserve(user_id: int, key: str, body_hash: str) -> Optional[IdempotencyKey]:
+    """Insert a pending row for the key; the existing row when another request already holds it."""
+    # 期限切れのキーは予約のついでに削除する (created_at のインデックスで範囲削除)
+    ttl = timedelta(hours=current_app.config.get('IDEMPOTENCY_TTL_HOURS', 24))
+    while True:
+        db.session.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.created_at < datetime.now(timezone.utc) - ttl)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.add(IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            request_method=request.method,
+            request_path=request.path,
+            request_hash=body_hash,
+            status_code=PENDING_STATUS,
+            response='',
+            created_at=datetime.now(timezone.utc),
+        ))
+        try:
+            db.session.commit()
+            return None
+        except IntegrityError:
+            db.session.rollback()
+        stored = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+        if stored is not None:
+            return stored
+        # 先に予約した行が直後に削除された: もう一度予約する
+
+
+def _reject_or_replay(stored: IdempotencyKey, body_hash: str, user_id: int) -> Response:
+    # 導入前に保存された行には記録が無いので照合しない
+    if stored.request_hash is not None and (stored.request_method, stored.request_path, stored.request_hash) != (
+            request.method, request.path, body_hash):
+        response = jsonify({
+            'error': f'{IDEMPOTENCY_HEADER} was already used for a different request',
+            'field': IDEMPOTENCY_HEADER,
+        })
+        response.status_code = 422
+        return response
+    if stored.status_code == PENDING_STATUS:
+        response = jsonify({
+            'error': f'A request with this {IDEMPOTENCY_HEADER} is still in progress',
+            'field': IDEMPOTENCY_HEADER,
+        })
+        response.status_code = 409
+        return response
+    return _replay(stored, user_id)
+
+
+def _replay(stored: IdempotencyKey, user_id: int) -> Response:
+    body = json.loads(stored.response)
+    if 'state' in body:
+        body['state'] = get_state(user_id)
+    response = jsonify(body)
+    response.status_code = stored.status_code
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _store(user_id: int, key: str, response: Response) -> None:
+    db.session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(status_code=response.status_code, response=response.get_data(as_text=True))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def _release(user_id: int, key: str) -> None:
+    db.session.execute(delete(IdempotencyKey).where(
+        IdempotencyKey.user_id == user_id, IdempotencyKey.key == key, IdempotencyKey.status_code == PENDING_STATUS,
+    ).execution_options(synchronize_session=False))
+    db.session.commit()
@@ -0,0 +1,250 @@
+"""Prometheus text-format metrics: request latency, SQL per request and state gauges."""
+import bisect
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from flask import Flask, Response, g, request
+from sqlalchemy import event
+
+METRICS_EXTENSION = 'pomodoro_metrics'
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+# SQLがリクエスト外 (スケジューラ等) で実行された場合のラベル
+BACKGROUND_ROUTE = 'background'
+
+
+class _Histogram:
+    """Per-bucket counts plus sum and count; owned and mutated by a single thread."""
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def add(self, other: '_Histogram') -> None:
+        for i, value in enumerate(other.counts):
+            self.counts[i] += value
+        self.total += other.total
+        self.count += other.count
+
+
+class _Shard:
+    """Counters of one thread. Only the owning thread writes, so no lock is needed."""
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[str, _Histogram] = {}
+        self.sql_queries: Dict[str, _Histogram] = {}
+        self.sql_duration: Dict[str, _Histogram] = {}
+
+    def histogram(self, family: Dict[str, _Histogram], route: str, bounds) -> _Histogram:
+        histogram = family.get(route)
+        if histogram is None:
+            histogram = family[route] = _Histogram(bounds)
+        return histogram
+
+    def absorb(self, other: '_Shard') -> None:
+        """Add the counts of a finished thread's shard to this one."""
+        for key, value in other.requests.items():
+            self.requests[key] = self.requests.get(key, 0) + value
+        for family_name in ('latency', 'sql_queries', 'sql_duration'):
+            family = getattr(self, family_name)
+            for route, histogram in getattr(other, family_name).items():
+                self.histogram(family, route, histogram.bounds).add(histogram)
+
+
+class _ThreadToken:
+    """Held only by a thread's ``threading.local``; collected when the thread exits."""
+    __slots__ = ('__weakref__',)
+
+
+class Metrics:
+    """
+    Registry of per-thread shards.
+
+    Hot paths only touch the calling thread's shard; a scrape sums all shards.
+    Copies of shard dicts are taken with ``dict()``, which runs without
+    releasing the GIL, so a scrape never sees a dict resized mid-iteration.
+    When a thread exits, its shard is folded into a shared retired shard,
+    so servers that start a thread per request (werkzeug's threaded
+    server) keep one shard per live thread, not one per request served.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._retired = _Shard()
+        self._shards: List[_Shard] = [self._retired]
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            # スレッド終了時に threading.local が破棄されるとトークンも回収され、集計を引き継ぐ
+            token = self._local.token = _ThreadToken()
+            finalizer = weakref.finalize(token, self._retire, shard)
+            finalizer.atexit = False
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _retire(self, shard: _Shard) -> None:
+        with self._shards_lock:
+            self._retired.absorb(shard)
+            self._shards.remove(shard)
+
+    def observe_request(self, route: str, method: str, status: int, seconds: float,
+                        queries: int, query_seconds: float) -> None:
+        shard = self._shard()
+        key = (route, method, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        shard.histogram(shard.latency, route, LATENCY_BUCKETS).observe(seconds)
+        shard.histogram(shard.sql_queries, route, QUERY_COUNT_BUCKETS).observe(queries)
+        shard.histogram(shard.sql_duration, route, LATENCY_BUCKETS).observe(query_seconds)
+
+    def observe_background_query(self, seconds: float) -> None:
+        shard = self._shard()
+        shard.histogram(shard.sql_duration, BACKGROUND_ROUTE, LATENCY_BUCKETS).observe(seconds)
+
+    def _merge(self, family_name: str) -> Dict[str, _Histogram]:
+        merged: Dict[str, _Histogram] = {}
+        # 終了したスレッドの引き継ぎと重ならないようロック中に集計する (ホットパスはロックしない)
+        with self._shards_lock:
+            for shard in self._shards:
+                for route, histogram in dict(getattr(shard, family_name)).items():
+                    target = merged.get(route)
+                    if target is None:
+                        target = merged[route] = _Histogram(histogram.bounds)
+                    target.add(histogram)
+        return merged
+
+    def _merged_requests(self) -> Dict[Tuple[str, str, int], int]:
+        merged: Dict[Tuple[str, str, int], int] = {}
+        with self._shards_lock:
+            for shard in self._shards:
+                for key, value in dict(shard.requests).items():
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def render(self, gauges: Dict[str, Tuple[str, float]]) -> str:
+        lines = [
+            '# HELP pomodoro_http_requests_total HTTP requests by route, method and status.',
+            '# TYPE pomodoro_http_requests_total counter',
+        ]
+        for (route, method, status), value in sorted(self._merged_requests().items()):
+            lines.append(f'pomodoro_http_requests_total{{route="{route}",method="{method}",status="{status}"}} {value}')
+        for name, family, help_text in (
+            ('pomodoro_http_request_duration_seconds', 'latency', 'Request latency by route.'),
+            ('pomodoro_sql_queries_per_request', 'sql_queries', 'SQL statements executed per request.'),
+            ('pomodoro_sql_duration_seconds', 'sql_duration', 'SQL time per request (or per background statement).'),
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for route, histogram in sorted(self._merge(family).items()):
+                cumulative = 0
+                for bound, value in zip(histogram.bounds + ('+Inf',), histogram.counts):
+                    cumulative += value
+                    lines.append(f'{name}_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{route="{route}"}} {histogram.total}')
+                lines.append(f'{name}_count{{route="{route}"}} {histogram.count}')
+        for name, (help_text, value) in gauges.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _collect_gauges(app: Flask) -> Dict[str, Tuple[str, float]]:
+    from .services import get_state_cache, get_state_cache_registry
+    get_state_cache()  # シングルユーザー構成でも既定ユーザーを読み込んでおく
+    today = datetime.now(timezone.utc).date()
+    active_count = completed = seconds = cycles = 0
+    # 読み込み済みユーザーの合計 (ゲージのためにDBを走査しない)
+    for active, stat in get_state_cache_registry().snapshots():
+        active_count += 1 if active else 0
+        if stat and stat.date == today:
+            completed += stat.completed_focus_count
+            seconds += stat.total_focus_seconds
+            cycles += stat.cycle_count
+    gauges = {
+        'pomodoro_active_sessions': ('Sessions currently active (users with a loaded state).', active_count),
+        'pomodoro_today_completed_focus_count': ("Sum of today's DailyStat.completed_focus_count.", completed),
+        'pomodoro_today_total_focus_seconds': ("Sum of today's DailyStat.total_focus_seconds.", seconds),
+        'pomodoro_today_cycle_count': ("Sum of today's DailyStat.cycle_count.", cycles),
+    }
+    if 'startup_seconds' in app.extensions:
+        gauges['pomodoro_startup_seconds'] = ('Time create_app() took for this app.', app.extensions['startup_seconds'])
+    log_handler = app.extensions.get('log_handler')
+    if hasattr(log_handler, 'dropped'):
+        gauges['pomodoro_log_records_dropped'] = ('Log records dropped by the bounded log queue.', log_handler.dropped)
+    return gauges
+
+
+def init_metrics(app: Flask) -> Metrics:
+    """Install request hooks, SQLAlchemy cursor hooks and the /metrics route."""
+    from .models import db
+
+    metrics = Metrics()
+    app.extensions[METRICS_EXTENSION] = metrics
+    local = threading.local()
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+        local.sql = [0, 0.0]
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('_metrics_start', None)
+        sql: Optional[list] = getattr(local, 'sql', None)
+        local.sql = None
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            queries, query_seconds = sql if sql else (0, 0.0)
+            metrics.observe_request(route, request.method, response.status_code,
+                                    time.perf_counter() - start, queries, query_seconds)
+        return response
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_metrics_query_start', []).append(time.perf_counter())
+
+    def _end_query(conn) -> None:
+        elapsed = time.perf_counter() - conn.info['_metrics_query_start'].pop()
+        sql = getattr(local, 'sql', None)
+        if sql is None:
+            metrics.observe_background_query(elapsed)
+        else:
+            sql[0] += 1
+            sql[1] += elapsed
+
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        _end_query(conn)
+
+    def _handle_error(exception_context):
+        # 失敗した文 (一意制約違反の start など) では after_cursor_execute が呼ばれないので、ここで取り出す
+        conn = exception_context.connection
+        if conn is not None and exception_context.execution_context is not None and conn.info.get('_metrics_query_start'):
+            _end_query(conn)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(db.engine, 'handle_error', _handle_error)
+
+    @app.route('/metrics')
+    def metrics_route():
+        body = metrics.render(_collect_gauges(app))
+        return Response(body, mimetype='text/plain; version=0.0.4')
+
+    return metrics
@@ -3,10 +3,16 @@ from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
 
+ACTIVE_STATUS = 'active'
+
+# 認証導入前のシングルユーザー環境・既存データの所有者
+DEFAULT_USER_ID = 1
+
 class PomodoroSession(db.Model):
     __tablename__ = 'pomodoro_sessions'
     
     id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, default=DEFAULT_USER_ID, server_default=str(DEFAULT_USER_ID))
     type = db.Column(db.String(10), nullable=False)  # 'focus' or 'break'
     planned_duration_sec = db.Column(db.Integer, nullable=False)
     start_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -14,9 +20,31 @@ class PomodoroSession(db.Model):
     end_at = db.Column(db.DateTime, nullable=True)
     status = db.Column(db.String(20), nullable=False, default='active')  # 'active','completed','aborted'
     
+    # activeな行だけを持つユーザー毎の一意部分インデックス: 履歴やユーザー数が増えても
+    # 検索コストは一定で、1ユーザーにactiveセッションが同時に2つ存在しないことをDBが保証する
+    # (SQLiteはバインド変数では部分インデックスを使わないため、述語はリテラルで記述する)
+    __table_args__ = (
+        db.Index(
+            'uq_pomodoro_sessions_user_active',
+            'user_id',
+            unique=True,
+            sqlite_where=db.text(f"status = '{ACTIVE_STATUS}'"),
+            postgresql_where=db.text(f"status = '{ACTIVE_STATUS}'"),
+        ),
+        db.Index('ix_pomodoro_sessions_user_status', 'user_id', 'status'),
+        # 履歴からの再集計 (日付範囲ごとのGROUP BY) 用
+        db.Index('ix_pomodoro_sessions_end_at', 'end_at'),
+    )
+    
+    @classmethod
+    def active_filter(cls):
+        """WHERE clause matching the partial index predicate literally."""
+        return cls.status == db.literal_column(f"'{ACTIVE_STATUS}'")
+    
     def to_dict(self):
         return {
             'id': self.id,
+            'user_id': self.user_id,
             'type': self.type,
             'planned_duration_sec': self.planned_duration_sec,
             'start_at': self.start_at.isoformat(),
@@ -29,11 +57,16 @@ class DailyStat(db.Model):
     __tablename__ = 'daily_stats'
     
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.Date, nullable=False, unique=True, index=True)
+    user_id = db.Column(db.Integer, nullable=False, default=DEFAULT_USER_ID, server_default=str(DEFAULT_USER_ID))
+    date = db.Column(db.Date, nullable=False)
     total_focus_seconds = db.Column(db.Integer, nullable=False, default=0)
     completed_focus_count = db.Column(db.Integer, nullable=False, default=0)
     cycle_count = db.Column(db.Integer, nullable=False, default=0)
     
+    __table_args__ = (
+        db.Index('uq_daily_stats_user_date', 'user_id', 'date', unique=True),
+    )
+    
     def to_dict(self):
         return {
             'date': self.date.isoformat(),
@@ -42,3 +75,66 @@ class DailyStat(db.Model):
             'cycle_count': self.cycle_count
         }
 
+
+class PeriodStat(db.Model):
+    """Weekly (Monday start) / monthly rollup of DailyStat, maintained on completion."""
+    __tablename__ = 'period_stats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, default=DEFAULT_USER_ID, server_default=str(DEFAULT_USER_ID))
+    period = db.Column(db.String(5), nullable=False)  # 'week' or 'month'
+    start_date = db.Column(db.Date, nullable=False)
+    total_focus_seconds = db.Column(db.Integer, nullable=False, default=0)
+    completed_focus_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('uq_period_stats_user_period_start_date', 'user_id', 'period', 'start_date', unique=True),
+    )
+    
+    def to_dict(self):
+        return {
+            'period': self.period,
+            'start_date': self.start_date.isoformat(),
+            'total_focus_seconds': self.total_focus_seconds,
+            'completed_focus_count': self.completed_focus_count
+        }
+
+class StateVersion(db.Model):
+    """
+    Per-user counter bumped in the same transaction as every change to the
+    user's sessions or stats. Each process's state cache remembers the
+    version it loaded and reloads when the row has moved on.
+    """
+    __tablename__ = 'state_versions'
+    
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class SchemaVersion(db.Model):
+    """Fingerprint of the schema the database was last upgraded to (single row)."""
+    __tablename__ = 'schema_version'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.String(64), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class IdempotencyKey(db.Model):
+    """Stored response of an action request sent with an Idempotency-Key header."""
+    __tablename__ = 'idempotency_keys'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    key = db.Column(db.String(128), nullable=False)
+    # 同じキーで別のリクエストが送られていないかの照合用 (既存DBに追加する列なので NULL 可)
+    request_method = db.Column(db.String(10))
+    request_path = db.Column(db.String(255))
+    request_hash = db.Column(db.String(64))  # 本文の SHA-256 (started_seconds_ago を除く)
+    status_code = db.Column(db.Integer, nullable=False)  # 0: 予約済みで実行中
+    response = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('uq_idempotency_keys_user_key', 'user_id', 'key', unique=True),
+        # 期限切れキーの削除用
+        db.Index('ix_idempotency_keys_created_at', 'created_at'),
+    )
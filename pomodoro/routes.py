@@ -1,55 +1,240 @@
-from flask import Blueprint, jsonify, request
+import io
+import logging
+import queue
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from . import bp
-from .services import start_focus, start_break, stop_active_session, get_state, start_long_break, decline_long_break
-from .validators import ValidationError
+from .events import format_sse, get_event_broker
+from .stats import get_range_stats
+from .idempotency import idempotent
+from .services import start_focus, start_break, stop_active_session, get_state, state_etag, start_long_break, decline_long_break, complete_active_session
+from .users import current_user_id
+from .validators import ValidationError, validate_started_seconds_ago
 
-@bp.post('/start')
-def start_focus_route():
-    data = request.get_json(silent=True) or {}
+def _session_result(session, **extra) -> dict:
+    return {'id': session.id, 'type': session.type, 'planned_end_at': session.planned_end_at.isoformat(), **extra}
+
+def _started_at(data: dict, duration):
+    """Start time of an action queued offline (``started_seconds_ago``), None for now."""
+    seconds = data.get('started_seconds_ago')
+    if seconds is None:
+        return None
+    validate_started_seconds_ago(seconds, duration)
+    # 端末の時計ではなく経過秒数を受け取るので、時計のずれの影響を受けない
+    return datetime.now(timezone.utc) - timedelta(seconds=seconds)
+
+def _start_focus_action(data: dict, user_id: int):
     duration = data.get('duration_minutes', 25)
     try:
-        session = start_focus(duration)
-        return jsonify({'id': session.id, 'type': session.type, 'planned_end_at': session.planned_end_at.isoformat()}), 201
+        started_at = _started_at(data, duration)
+    except ValidationError as e:
+        return {'error': str(e), 'field': 'started_seconds_ago'}, 400
+    try:
+        return _session_result(start_focus(duration, user_id=user_id, started_at=started_at)), 201
     except ValidationError as e:
-        import logging; logging.exception("Validation error in start_focus_route")
-        return jsonify({'error': 'Invalid value for duration_minutes.', 'field': 'duration_minutes'}), 400
+        logging.exception("Validation error in start_focus_route")
+        return {'error': 'Invalid value for duration_minutes.', 'field': 'duration_minutes'}, 400
     except ValueError as e:
-        import logging; logging.exception("Error in start_focus_route")
-        return jsonify({'error': 'Invalid input provided.'}), 409
+        logging.exception("Error in start_focus_route")
+        return {'error': 'Invalid input provided.'}, 409
 
-@bp.post('/break')
-def start_break_route():
-    data = request.get_json(silent=True) or {}
+def _start_break_action(data: dict, user_id: int):
     duration = data.get('duration_minutes', 5)
     try:
-        session = start_break(duration)
-        return jsonify({'id': session.id, 'type': session.type, 'planned_end_at': session.planned_end_at.isoformat()}), 201
+        started_at = _started_at(data, duration)
     except ValidationError as e:
-        import logging; logging.exception("Validation error in start_break_route")
-        return jsonify({'error': 'Invalid value for duration_minutes.', 'field': 'duration_minutes'}), 400
+        return {'error': str(e), 'field': 'started_seconds_ago'}, 400
+    try:
+        return _session_result(start_break(duration, user_id=user_id, started_at=started_at)), 201
+    except ValidationError as e:
+        logging.exception("Validation error in start_break_route")
+        return {'error': 'Invalid value for duration_minutes.', 'field': 'duration_minutes'}, 400
     except ValueError as e:
-        import logging; logging.exception("Error in start_break_route")
-        return jsonify({'error': 'Invalid input provided.'}), 409
+        logging.exception("Error in start_break_route")
+        return {'error': 'Invalid input provided.'}, 409
+
+def _stop_action(data: dict, user_id: int):
+    stop_active_session(user_id)
+    return {'status': 'stopped'}, 200
+
+def _complete_action(data: dict, user_id: int):
+    try:
+        completed = complete_active_session(user_id)
+    except ValueError as e:
+        return {'error': str(e)}, 409
+    return {'status': 'completed' if completed else 'idle'}, 200
+
+def _start_long_break_action(data: dict, user_id: int):
+    try:
+        return _session_result(start_long_break(user_id), duration_minutes=15), 201
+    except ValueError as e:
+        logging.exception("Error in start_long_break_route")
+        return {'error': 'Invalid input provided.'}, 409
+
+def _decline_long_break_action(data: dict, user_id: int):
+    decline_long_break(user_id)
+    return {'status': 'declined', 'message': 'Long break declined, cycle reset'}, 200
+
+# 操作名 -> (リクエストJSON, ユーザーID) を受け取り (本文, ステータス) を返す関数
+ACTIONS = {
+    'start': _start_focus_action,
+    'break': _start_break_action,
+    'stop': _stop_action,
+    'complete': _complete_action,
+    'long-break': _start_long_break_action,
+    'decline-long-break': _decline_long_break_action,
+}
+BATCH_MAX_OPERATIONS = 20
+
+def _action_response(action: str):
+    """Run one action; a successful result carries the new state so clients need no follow-up GET /state."""
+    user_id = current_user_id()
+    result, status = ACTIONS[action](request.get_json(silent=True) or {}, user_id)
+    if status < 400:
+        result['state'] = get_state(user_id)
+    return jsonify(result), status
+
+@bp.post('/start')
+@idempotent
+def start_focus_route():
+    return _action_response('start')
+
+@bp.post('/break')
+@idempotent
+def start_break_route():
+    return _action_response('break')
 
 @bp.post('/stop')
+@idempotent
 def stop_route():
-    stop_active_session()
-    return jsonify({'status': 'stopped'})
+    return _action_response('stop')
+
+@bp.post('/complete')
+@idempotent
+def complete_route():
+    return _action_response('complete')
+
+@bp.post('/batch')
+@idempotent
+def batch_route():
+    """
+    Run several actions in one request: ``{"operations": [{"op": "stop"}, {"op": "break", "duration_minutes": 5}]}``.
+
+    Operations run in order, each committed on its own, and the batch stops
+    at the first one that fails. The response lists the result of every
+    operation that ran and the state after the last one.
+    """
+    operations = (request.get_json(silent=True) or {}).get('operations')
+    if (not isinstance(operations, list) or not 0 < len(operations) <= BATCH_MAX_OPERATIONS
+            or not all(isinstance(operation, dict) and operation.get('op') in ACTIONS for operation in operations)):
+        return jsonify({
+            'error': f"operations must be a list of 1-{BATCH_MAX_OPERATIONS} objects with op in {', '.join(ACTIONS)}",
+            'field': 'operations',
+        }), 400
+    user_id = current_user_id()
+    results = []
+    for operation in operations:
+        result, status = ACTIONS[operation['op']](operation, user_id)
+        results.append({'op': operation['op'], 'status': status, 'result': result})
+        if status >= 400:
+            break
+    return jsonify({'results': results, 'state': get_state(user_id)})
+
+def _per_user(response: Response) -> Response:
+    """Revalidate on every use and keep the response out of shared caches (it belongs to the requesting user)."""
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    if current_app.config.get('TRUSTED_USER_HEADER'):
+        response.vary.add(current_app.config['TRUSTED_USER_HEADER'])
+    return response
 
 @bp.get('/state')
 def state_route():
-    return jsonify(get_state())
+    """
+    Current state; a matching If-None-Match gets 304.
 
-@bp.post('/long-break')
-def start_long_break_route():
+    The state cache answers, but only after one ``state_versions`` SELECT
+    that detects writes from other workers, so a revalidation is not free
+    of database work (one primary-key query instead of the session rows).
+    """
+    state = get_state(current_user_id())
+    response = jsonify(state)
+    response.set_etag(state_etag(state), weak=True)
+    return _per_user(response).make_conditional(request)
+
+@bp.get('/stats')
+def stats_route():
+    range_key = request.args.get('range', '7d')
     try:
-        session = start_long_break()
-        return jsonify({'id': session.id, 'type': session.type, 'planned_end_at': session.planned_end_at.isoformat(), 'duration_minutes': 15}), 201
+        stats = get_range_stats(range_key, user_id=current_user_id())
     except ValueError as e:
-        import logging; logging.exception("Error in start_long_break_route")
-        return jsonify({'error': 'Invalid input provided.'}), 409
+        return jsonify({'error': str(e), 'field': 'range'}), 400
+    response = jsonify(stats)
+    response.add_etag()
+    return _per_user(response).make_conditional(request)
+
+EXPORT_MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+@bp.get('/export')
+def export_route():
+    """Stream the user's session history as NDJSON (default) or CSV."""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({'error': f"Format must be one of {', '.join(EXPORT_MIMETYPES)}", 'field': 'format'}), 400
+    # 利用頻度が低いため起動時ではなく初回利用時に読み込む
+    from .transfer import export_sessions
+    rows = export_sessions(fmt, user_id=current_user_id())
+    return Response(stream_with_context(rows), mimetype=EXPORT_MIMETYPES[fmt], headers={
+        'Content-Disposition': f'attachment; filename=pomodoro_sessions.{fmt}',
+    })
+
+@bp.post('/import')
+def import_route():
+    """Import an export file sent as the request body (CSV when ?format=csv or Content-Type is text/csv)."""
+    fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({'error': f"Format must be one of {', '.join(EXPORT_MIMETYPES)}", 'field': 'format'}), 400
+    # 本文全体を読み込まずに行単位で処理する
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    from .transfer import import_sessions
+    try:
+        result = import_sessions(lines, fmt, user_id=current_user_id())
+    except (ValidationError, UnicodeDecodeError) as e:
+        return jsonify({'error': str(e), 'field': 'file'}), 400
+    return jsonify(result)
+
+@bp.get('/events')
+def events_route():
+    """SSE stream: current state first, then one event per state change."""
+    user_id = current_user_id()
+    broker = get_event_broker()
+    subscription = broker.subscribe(user_id)
+    initial = format_sse('state', get_state(user_id))
+    keepalive = current_app.config.get('SSE_KEEPALIVE_SECONDS', 15)
+    
+    # ジェネレータ内ではアプリコンテキストを使わない (DB接続を保持しないため)
+    def stream():
+        try:
+            yield initial
+            while True:
+                try:
+                    yield subscription.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        finally:
+            broker.unsubscribe(user_id, subscription)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@bp.post('/long-break')
+@idempotent
+def start_long_break_route():
+    return _action_response('long-break')
 
 @bp.post('/decline-long-break')
+@idempotent
 def decline_long_break_route():
-    decline_long_break()
-    return jsonify({'status': 'declined', 'message': 'Long break declined, cycle reset'})
+    return _action_response('decline-long-break')
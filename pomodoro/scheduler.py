@@ -0,0 +1,93 @@
+"""Background completion of sessions at their planned_end_at."""
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+from flask import Flask, current_app
+from .cache import as_utc
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_EXTENSION = 'pomodoro_scheduler'
+
+
+class CompletionScheduler:
+    """
+    Timer heap served by one daemon thread that calls ``complete_session``.
+
+    Stopped sessions are not removed from the heap: ``complete_session`` is a
+    no-op for sessions that are no longer active, so stale entries simply
+    expire at their due time.
+    """
+
+    def __init__(self, app: Flask):
+        self._app = app
+        self._heap: List[Tuple[float, int, Optional[int]]] = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def schedule(self, session_id: int, due_at: datetime, user_id: Optional[int] = None) -> None:
+        with self._condition:
+            heapq.heappush(self._heap, (as_utc(due_at).timestamp(), session_id, user_id))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='pomodoro-completion', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def rebuild(self) -> None:
+        """Re-schedule every active session (called at app start-up)."""
+        from .models import PomodoroSession
+        for session in PomodoroSession.query.filter(PomodoroSession.active_filter()).all():
+            self.schedule(session.id, session.planned_end_at, session.user_id)
+
+    def pending(self) -> int:
+        return len(self._heap)
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _next_due(self) -> Optional[Tuple[float, int, Optional[int]]]:
+        """Block until the earliest entry is due and pop it; None when stopped."""
+        with self._condition:
+            while not self._stopped:
+                if self._heap:
+                    delay = self._heap[0][0] - time.time()
+                    if delay <= 0:
+                        return heapq.heappop(self._heap)
+                    self._condition.wait(delay)
+                else:
+                    self._condition.wait()
+            return None
+
+    def _run(self) -> None:
+        from .services import complete_session
+        while True:
+            entry = self._next_due()
+            if entry is None:
+                return
+            _, session_id, user_id = entry
+            try:
+                with self._app.app_context():
+                    complete_session(session_id, user_id)
+            except Exception:
+                logger.exception('Scheduled completion failed for session %s', session_id)
+
+
+def init_scheduler(app: Flask) -> CompletionScheduler:
+    """Create the app's scheduler and rebuild its heap from active rows."""
+    scheduler = CompletionScheduler(app)
+    app.extensions[SCHEDULER_EXTENSION] = scheduler
+    with app.app_context():
+        scheduler.rebuild()
+    return scheduler
+
+
+def get_scheduler() -> Optional[CompletionScheduler]:
+    return current_app.extensions.get(SCHEDULER_EXTENSION)
@@ -0,0 +1,150 @@
+"""Schema creation and in-place upgrades for existing databases."""
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+from .models import db, PomodoroSession, PeriodStat, SchemaVersion
+
+logger = logging.getLogger(__name__)
+
+# 置き換え済みのインデックス (テーブル名 -> インデックス名)
+OBSOLETE_INDEXES = {
+    'pomodoro_sessions': ('ix_pomodoro_sessions_active', 'uq_pomodoro_sessions_single_active'),
+    'daily_stats': ('ix_daily_stats_date',),
+}
+
+
+# ダイアレクト名 -> フィンガープリント (モデル定義はプロセス内で変わらない)
+_FINGERPRINTS: Dict[str, str] = {}
+
+
+def schema_fingerprint() -> str:
+    """Hash of the DDL the models compile to, so any model change yields a new version."""
+    dialect = db.engine.dialect
+    fingerprint = _FINGERPRINTS.get(dialect.name)
+    if fingerprint is None:
+        ddl = [repr(sorted(OBSOLETE_INDEXES.items()))]
+        for table in db.metadata.sorted_tables:
+            ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                ddl.append(str(CreateIndex(index).compile(dialect=dialect)))
+        fingerprint = _FINGERPRINTS[dialect.name] = hashlib.sha256('\n'.join(ddl).encode()).hexdigest()[:16]
+    return fingerprint
+
+
+def _stored_version() -> Optional[str]:
+    try:
+        return db.session.execute(db.select(SchemaVersion.version).where(SchemaVersion.id == 1)).scalar()
+    except DBAPIError:
+        # 新規DB、または schema_version 導入前のDB
+        db.session.rollback()
+        return None
+
+
+def ensure_schema() -> bool:
+    """
+    Upgrade the schema only when the stored version differs from the models.
+
+    A warm boot costs one primary-key SELECT instead of reflecting every
+    table. Returns True when an upgrade ran.
+    """
+    fingerprint = schema_fingerprint()
+    if _stored_version() == fingerprint:
+        db.session.rollback()
+        return False
+    upgrade_schema()
+    return True
+
+
+def _store_version(fingerprint: str) -> None:
+    version = db.session.get(SchemaVersion, 1)
+    if version is None:
+        db.session.add(SchemaVersion(id=1, version=fingerprint))
+    else:
+        version.version = fingerprint
+        version.updated_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+
+def upgrade_schema() -> None:
+    """
+    Create missing tables, columns and indexes.
+
+    ``db.create_all()`` only creates tables that do not exist yet, so columns
+    and indexes added to a model later (e.g. ``user_id`` and
+    ``uq_pomodoro_sessions_user_active``) would never reach an existing
+    ``pomodoro.db``. They are created here with an existence check so the call
+    is safe on any database; boots go through ``ensure_schema`` instead.
+    """
+    engine = db.engine
+    inspector = db.inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    period_table = PeriodStat.__tablename__
+    if period_table in existing_tables and 'user_id' not in _column_names(inspector, period_table):
+        # 旧 (period, start_date) 一意制約はテーブル定義の一部で削除できないため、
+        # 派生データであるロールアップはテーブルごと作り直す
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE {period_table}'))
+        existing_tables.discard(period_table)
+        logger.info('Dropped %s to rebuild it per user', period_table)
+    missing_tables = {table.name for table in db.metadata.sorted_tables} - existing_tables
+    db.create_all()
+    inspector = db.inspect(engine)
+    for table in db.metadata.sorted_tables:
+        _add_missing_columns(engine, table, _column_names(inspector, table.name))
+    if period_table in missing_tables:
+        # 既存の daily_stats からロールアップを作成
+        from .stats import rebuild_rollups
+        rebuild_rollups()
+        db.session.commit()
+    inspector = db.inspect(engine)
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for name in OBSOLETE_INDEXES.get(table.name, ()):
+            if name in existing:
+                with engine.begin() as conn:
+                    conn.execute(text(f'DROP INDEX {name}'))
+                logger.info('Dropped obsolete index %s on %s', name, table.name)
+        for index in table.indexes:
+            if index.name not in existing:
+                if index.unique and table.name == PomodoroSession.__tablename__:
+                    _abort_duplicate_active_sessions()
+                index.create(bind=engine)
+                logger.info('Created missing index %s on %s', index.name, table.name)
+    _store_version(schema_fingerprint())
+
+
+def _column_names(inspector, table_name: str) -> set:
+    return {column['name'] for column in inspector.get_columns(table_name)}
+
+
+def _add_missing_columns(engine, table, existing: set) -> None:
+    """Add model columns missing from an existing table (they need a server default)."""
+    for column in table.columns:
+        if column.name not in existing:
+            ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {ddl}'))
+            logger.info('Added missing column %s to %s', column.name, table.name)
+
+
+def _abort_duplicate_active_sessions() -> None:
+    """Keep only each user's newest active session so the single-active index can be built."""
+    active = (
+        PomodoroSession.query
+        .filter(PomodoroSession.active_filter())
+        .order_by(PomodoroSession.user_id, PomodoroSession.start_at.desc(), PomodoroSession.id.desc())
+        .all()
+    )
+    seen = set()
+    for session in active:
+        if session.user_id not in seen:
+            seen.add(session.user_id)
+            continue
+        session.status = 'aborted'
+        session.end_at = datetime.now(timezone.utc)
+        logger.warning('Aborted duplicate active session %s during schema upgrade', session.id)
+    db.session.commit()
@@ -1,7 +1,17 @@
-from datetime import datetime, timedelta, timezone
-from typing import Optional
-from .models import db, PomodoroSession, DailyStat
+import hashlib
+import json
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Tuple
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from .models import db, PomodoroSession, DailyStat, StateVersion, DEFAULT_USER_ID
+from .sql import upsert
+from .stats import record_rollups
 from .validators import validate_duration
+from .cache import StateCache, UserState, ActiveSnapshot, StatSnapshot
+from .events import get_event_broker
+from .scheduler import get_scheduler
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,28 +20,140 @@ FOCUS_DEFAULT_MINUTES = 25
 BREAK_DEFAULT_MINUTES = 5
 LONG_BREAK_MINUTES = 15
 FOCUS_SESSIONS_BEFORE_LONG_BREAK = 4
+# クライアントのローカルタイマーが終了を報告する際に許容する時計のずれ (秒)
+COMPLETE_TOLERANCE_SECONDS = 5
 
+STATE_CACHE_EXTENSION = 'pomodoro_state_cache'
 
-def start_focus(duration_minutes: int = FOCUS_DEFAULT_MINUTES) -> PomodoroSession:
-    # Validate duration
-    validate_duration(duration_minutes)
+# RETURNING で StatSnapshot を組み立てるための列
+_STAT_COLUMNS = (
+    DailyStat.user_id,
+    DailyStat.date,
+    DailyStat.total_focus_seconds,
+    DailyStat.completed_focus_count,
+    DailyStat.cycle_count,
+)
+
+
+def get_state_cache_registry() -> StateCache:
+    """Return the per-user state cache of the current app."""
+    cache = current_app.extensions.get(STATE_CACHE_EXTENSION)
+    if cache is None:
+        cache = current_app.extensions.setdefault(STATE_CACHE_EXTENSION, StateCache())
+    return cache
+
+
+def read_state_version(user_id: int = DEFAULT_USER_ID) -> int:
+    """The user's committed state version (0 before the first write)."""
+    version = db.session.execute(
+        db.select(StateVersion.version).where(StateVersion.user_id == user_id)
+    ).scalar()
+    return version or 0
+
+
+def bump_state_version(user_id: int = DEFAULT_USER_ID) -> int:
+    """
+    Increment the user's state version and return the new value. The caller
+    commits, so the bump lands in the same transaction as the change.
+    """
+    stmt = upsert(StateVersion).values(user_id=user_id, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[StateVersion.user_id],
+        set_={'version': StateVersion.version + 1},
+    ).returning(StateVersion.version)
+    return db.session.execute(stmt).scalar_one()
+
+
+def get_state_cache(user_id: int = DEFAULT_USER_ID) -> UserState:
+    """
+    Return the cached state of ``user_id``, (re)loading it from the DB when stale.
     
-    # アクティブなセッションがあればエラー
-    active = PomodoroSession.query.filter_by(status='active').first()
-    if active:
-        raise ValueError('Active session already exists')
+    Every call reads the user's version (one primary-key SELECT) and the
+    cache is reloaded unless it was loaded at that version, so workers and
+    processes sharing the database see each other's writes. A cache hit is
+    therefore never free of SQL: that one query is the price of staying
+    correct with several workers, in place of the rows it saves. The version is
+    read before the rows: a write landing in between leaves the cache at
+    the older version, and the next call loads it again.
+    """
+    state = get_state_cache_registry().for_user(user_id)
+    version = read_state_version(user_id)
+    if not state.is_current(version):
+        with state.lock:
+            # 待っている間に別スレッドが同じ版数で読み込んでいれば不要
+            if not state.is_current(version):
+                today = datetime.now(timezone.utc).date()
+                # 同じDBセッションで読み込み済みのオブジェクトも最新の値で上書きする
+                active = PomodoroSession.query.filter(
+                    PomodoroSession.user_id == user_id, PomodoroSession.active_filter()
+                ).populate_existing().first()
+                stat = DailyStat.query.filter_by(user_id=user_id, date=today).populate_existing().first()
+                state.load(
+                    ActiveSnapshot.from_session(active) if active else None,
+                    StatSnapshot.from_stat(stat) if stat else None,
+                    version,
+                )
+    return state
+
+
+def _publish(event: str, user_id: int) -> None:
+    """Push the user's new state to their SSE subscribers (no-op without subscribers)."""
+    broker = get_event_broker()
+    if broker.has_subscribers(user_id):
+        broker.publish(user_id, event, get_state(user_id))
+
+
+def _schedule_completion(snapshot: ActiveSnapshot) -> None:
+    scheduler = get_scheduler()
+    if scheduler is not None:
+        scheduler.schedule(snapshot.id, snapshot.planned_end_at, snapshot.user_id)
+
+
+def _insert_active_session(session: PomodoroSession) -> Tuple[ActiveSnapshot, int]:
+    """
+    Insert a new active session and commit it with a state version bump.
     
-    duration_sec = duration_minutes * 60
-    now = datetime.now(timezone.utc)
-    session = PomodoroSession(
-        type='focus',
-        planned_duration_sec=duration_sec,
-        start_at=now,
-        planned_end_at=now + timedelta(seconds=duration_sec),
-        status='active'
-    )
+    The single-active rule is enforced by the unique partial index, so there
+    is no SELECT beforehand: a concurrent start loses on the constraint, in
+    this process or in any other worker on the same database. Those workers
+    reload their cached state on the version bump, so a 409 and ``/state``
+    agree on which session is active. Returns the snapshot and the new
+    state version.
+    """
     db.session.add(session)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # アクティブなセッションがあればエラー
+        db.session.rollback()
+        raise ValueError('Active session already exists')
+    snapshot = ActiveSnapshot.from_session(session)
+    version = bump_state_version(session.user_id)
     db.session.commit()
+    return snapshot, version
+
+
+def start_focus(duration_minutes: int = FOCUS_DEFAULT_MINUTES, user_id: int = DEFAULT_USER_ID,
+                started_at: Optional[datetime] = None) -> PomodoroSession:
+    # Validate duration
+    validate_duration(duration_minutes)
+    
+    cache = get_state_cache(user_id)
+    with cache.lock:
+        duration_sec = duration_minutes * 60
+        # オフライン中に開始した操作は started_at まで遡る (終了済みならスケジューラが即完了させる)
+        now = started_at or datetime.now(timezone.utc)
+        session = PomodoroSession(
+            user_id=user_id,
+            type='focus',
+            planned_duration_sec=duration_sec,
+            start_at=now,
+            planned_end_at=now + timedelta(seconds=duration_sec),
+            status='active'
+        )
+        snapshot, version = _insert_active_session(session)
+        cache.apply(version, active=snapshot)
+    _schedule_completion(snapshot)
     
     # Log session start
     logger.info(
@@ -43,30 +165,32 @@ def start_focus(duration_minutes: int = FOCUS_DEFAULT_MINUTES) -> PomodoroSessio
             'duration': duration_sec
         }
     )
+    _publish('session_start', user_id)
     
     return session
 
 
-def start_break(duration_minutes: int = BREAK_DEFAULT_MINUTES) -> PomodoroSession:
+def start_break(duration_minutes: int = BREAK_DEFAULT_MINUTES, user_id: int = DEFAULT_USER_ID,
+                started_at: Optional[datetime] = None) -> PomodoroSession:
     # Validate duration
     validate_duration(duration_minutes)
     
-    # アクティブなセッションがあればエラー
-    active = PomodoroSession.query.filter_by(status='active').first()
-    if active:
-        raise ValueError('Active session already exists')
-    
-    duration_sec = duration_minutes * 60
-    now = datetime.now(timezone.utc)
-    session = PomodoroSession(
-        type='break',
-        planned_duration_sec=duration_sec,
-        start_at=now,
-        planned_end_at=now + timedelta(seconds=duration_sec),
-        status='active'
-    )
-    db.session.add(session)
-    db.session.commit()
+    cache = get_state_cache(user_id)
+    with cache.lock:
+        duration_sec = duration_minutes * 60
+        # オフライン中に開始した操作は started_at まで遡る (終了済みならスケジューラが即完了させる)
+        now = started_at or datetime.now(timezone.utc)
+        session = PomodoroSession(
+            user_id=user_id,
+            type='break',
+            planned_duration_sec=duration_sec,
+            start_at=now,
+            planned_end_at=now + timedelta(seconds=duration_sec),
+            status='active'
+        )
+        snapshot, version = _insert_active_session(session)
+        cache.apply(version, active=snapshot)
+    _schedule_completion(snapshot)
     
     # Log session start
     logger.info(
@@ -78,72 +202,140 @@ def start_break(duration_minutes: int = BREAK_DEFAULT_MINUTES) -> PomodoroSessio
             'duration': duration_sec
         }
     )
+    _publish('session_start', user_id)
     
     return session
 
 
-def start_long_break() -> PomodoroSession:
+def start_long_break(user_id: int = DEFAULT_USER_ID) -> PomodoroSession:
     """Start a long break (15 minutes) and reset the cycle count."""
-    session = start_break(LONG_BREAK_MINUTES)
+    session = start_break(LONG_BREAK_MINUTES, user_id=user_id)
     
     # Reset cycle count after long break
-    today = datetime.now(timezone.utc).date()
-    stat = DailyStat.query.filter_by(date=today).first()
-    if stat:
-        stat.cycle_count = 0
-        db.session.commit()
+    _reset_cycle_count(user_id)
+    _publish('long_break_start', user_id)
     
     return session
 
 
-def decline_long_break() -> None:
+def decline_long_break(user_id: int = DEFAULT_USER_ID) -> None:
     """Decline the long break suggestion and reset the cycle count."""
-    today = datetime.now(timezone.utc).date()
-    stat = DailyStat.query.filter_by(date=today).first()
-    if stat:
-        stat.cycle_count = 0
-        db.session.commit()
+    _reset_cycle_count(user_id)
+    _publish('long_break_decline', user_id)
 
 
-def stop_active_session() -> None:
-    active = PomodoroSession.query.filter_by(status='active').first()
-    if active:
-        active.status = 'aborted'
-        active.end_at = datetime.now(timezone.utc)
+def _reset_cycle_count(user_id: int) -> None:
+    cache = get_state_cache(user_id)
+    with cache.lock:
+        today = datetime.now(timezone.utc).date()
+        row = db.session.execute(
+            update(DailyStat)
+            .where(DailyStat.user_id == user_id, DailyStat.date == today)
+            .values(cycle_count=0)
+            .returning(*_STAT_COLUMNS)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if not row:
+            db.session.rollback()
+            return
+        version = bump_state_version(user_id)
         db.session.commit()
-        
-        # Log session stop
-        logger.info(
-            'Session stopped',
-            extra={
-                'event': 'session_stop',
-                'session_id': active.id,
-                'session_type': active.type,
-                'status': 'aborted'
-            }
-        )
+        cache.apply(version, stat=StatSnapshot.from_stat(row))
 
 
-def complete_session(session_id: int) -> None:
-    session = PomodoroSession.query.get(session_id)
-    if not session or session.status != 'active':
-        return
-    
-    session.status = 'completed'
-    session.end_at = datetime.now(timezone.utc)
+def stop_active_session(user_id: int = DEFAULT_USER_ID) -> None:
+    cache = get_state_cache(user_id)
+    with cache.lock:
+        # active の場合だけ更新する条件付きUPDATE: 別ワーカーのスケジューラが先に完了させた行を aborted で上書きしない
+        active = db.session.execute(
+            update(PomodoroSession)
+            .where(PomodoroSession.user_id == user_id, PomodoroSession.active_filter())
+            .values(status='aborted', end_at=datetime.now(timezone.utc))
+            .returning(PomodoroSession.id, PomodoroSession.type)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if not active:
+            db.session.rollback()
+            return
+        version = bump_state_version(user_id)
+        db.session.commit()
+        cache.apply(version, active=None)
     
-    # フォーカスセッション完了時、統計を更新
-    if session.type == 'focus':
-        today = datetime.now(timezone.utc).date()
-        stat = DailyStat.query.filter_by(date=today).first()
-        if not stat:
-            stat = DailyStat(date=today, total_focus_seconds=0, completed_focus_count=0, cycle_count=0)
-            db.session.add(stat)
-        stat.completed_focus_count += 1
-        stat.total_focus_seconds += session.planned_duration_sec
-        stat.cycle_count += 1
+    # Log session stop
+    logger.info(
+        'Session stopped',
+        extra={
+            'event': 'session_stop',
+            'session_id': active.id,
+            'session_type': active.type,
+            'status': 'aborted'
+        }
+    )
+    _publish('session_stop', user_id)
+
+
+def record_focus_completion(duration_sec: int, day: Optional[date] = None,
+                            user_id: int = DEFAULT_USER_ID) -> StatSnapshot:
+    """
+    Add one completed focus session to the user's DailyStat of ``day``
+    (default: today) and to its weekly/monthly rollups.
     
-    db.session.commit()
+    Each table gets a single ``INSERT ... ON CONFLICT DO UPDATE`` statement, so
+    concurrent workers never lose increments. The caller commits.
+    """
+    if day is None:
+        day = datetime.now(timezone.utc).date()
+    stmt = upsert(DailyStat).values(
+        user_id=user_id,
+        date=day,
+        total_focus_seconds=duration_sec,
+        completed_focus_count=1,
+        cycle_count=1,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyStat.user_id, DailyStat.date],
+        set_={
+            'total_focus_seconds': DailyStat.total_focus_seconds + stmt.excluded.total_focus_seconds,
+            'completed_focus_count': DailyStat.completed_focus_count + stmt.excluded.completed_focus_count,
+            'cycle_count': DailyStat.cycle_count + stmt.excluded.cycle_count,
+        },
+    ).returning(*_STAT_COLUMNS)
+    snapshot = StatSnapshot.from_stat(db.session.execute(stmt).one())
+    record_rollups(day, duration_sec, user_id=user_id)
+    return snapshot
+
+
+def complete_session(session_id: int, user_id: Optional[int] = None) -> None:
+    if user_id is None:
+        user_id = db.session.query(PomodoroSession.user_id).filter(PomodoroSession.id == session_id).scalar()
+        if user_id is None:
+            return
+    cache = get_state_cache(user_id)
+    with cache.lock:
+        # active の場合だけ更新する条件付きUPDATE: 複数ワーカーから呼ばれても一度だけ集計される
+        session = db.session.execute(
+            update(PomodoroSession)
+            .where(PomodoroSession.id == session_id, PomodoroSession.user_id == user_id,
+                   PomodoroSession.active_filter())
+            .values(status='completed', end_at=datetime.now(timezone.utc))
+            .returning(PomodoroSession.id, PomodoroSession.type, PomodoroSession.planned_duration_sec)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if not session:
+            db.session.rollback()
+            return
+        
+        # フォーカスセッション完了時、統計を更新
+        stat_snapshot = None
+        if session.type == 'focus':
+            stat_snapshot = record_focus_completion(session.planned_duration_sec, user_id=user_id)
+        
+        version = bump_state_version(user_id)
+        db.session.commit()
+        if stat_snapshot:
+            cache.apply(version, active=None, stat=stat_snapshot)
+        else:
+            cache.apply(version, active=None)
     
     # Log session completion
     logger.info(
@@ -156,29 +348,55 @@ def complete_session(session_id: int) -> None:
             'status': 'completed'
         }
     )
+    _publish('session_complete', user_id)
+
+
+def complete_active_session(user_id: int = DEFAULT_USER_ID) -> bool:
+    """
+    Complete the user's active session if its planned end has passed.
+    
+    Clients whose local timer ran out call this so the session is closed even
+    when no scheduler is running. Returns False when there is no active
+    session (already completed or stopped); raises ValueError when the active
+    session has not ended yet.
+    """
+    active, _ = get_state_cache(user_id).snapshot()
+    if active is None:
+        return False
+    now = datetime.now(timezone.utc)
+    if active.planned_end_at > now + timedelta(seconds=COMPLETE_TOLERANCE_SECONDS):
+        raise ValueError('Active session has not ended yet')
+    complete_session(active.id, user_id)
+    return True
 
 
-def get_state() -> dict:
+def get_state(user_id: int = DEFAULT_USER_ID) -> dict:
+    """
+    Return the user's current mode and today's stats, served from the state cache.
+    
+    This is a pure read: sessions are completed by the completion scheduler.
+    A session past its planned_end_at that the scheduler has not processed yet
+    is already reported as idle.
+    """
     now = datetime.now(timezone.utc)
-    active = PomodoroSession.query.filter_by(status='active').first()
+    active, stat = get_state_cache(user_id).snapshot()
     
+    planned_end_at = None
     if active:
-        # DBから取得したdatetimeはnaiveなのでUTCとして扱う
-        planned_end = active.planned_end_at.replace(tzinfo=timezone.utc) if active.planned_end_at.tzinfo is None else active.planned_end_at
-        remaining = int((planned_end - now).total_seconds())
+        remaining = int((active.planned_end_at - now).total_seconds())
         if remaining <= 0:
-            complete_session(active.id)
             remaining = 0
             mode = 'idle'
         else:
             mode = active.type
+            planned_end_at = active.planned_end_at.isoformat()
     else:
         remaining = 0
         mode = 'idle'
     
-    # 今日の統計取得
-    today = datetime.now(timezone.utc).date()
-    stat = DailyStat.query.filter_by(date=today).first()
+    # 今日の統計 (日付が変わっていれば未集計)
+    if stat and stat.date != now.date():
+        stat = None
     
     # Check if long break should be suggested
     cycle_count = stat.cycle_count if stat else 0
@@ -187,9 +405,21 @@ def get_state() -> dict:
     return {
         'mode': mode,
         'remaining_seconds': remaining,
+        'planned_end_at': planned_end_at,
         'completed_focus_count': stat.completed_focus_count if stat else 0,
         'total_focus_seconds': stat.total_focus_seconds if stat else 0,
         'cycle_count': cycle_count,
         'suggest_long_break': suggest_long_break
     }
 
+
+def state_etag(state: dict) -> str:
+    """
+    Version of a get_state() result for conditional GETs.
+
+    ``remaining_seconds`` is left out: it changes every second but is
+    derived from ``planned_end_at``, so the version only changes on real
+    state transitions (start/stop/complete, overdue, new day).
+    """
+    versioned = {key: value for key, value in state.items() if key != 'remaining_seconds'}
+    return hashlib.sha1(json.dumps(versioned, sort_keys=True).encode()).hexdigest()[:16]
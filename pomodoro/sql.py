@@ -0,0 +1,70 @@
+"""Dialect-specific SQL helpers and the SQLite connection profile."""
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from .models import db
+
+
+def upsert(model):
+    """
+    Return an INSERT for ``model`` that supports ``on_conflict_do_update``.
+
+    SQLite (3.24+) and PostgreSQL share the ``ON CONFLICT`` syntax, so the
+    caller builds the same statement for both.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise NotImplementedError(f'Upsert is not supported for dialect {dialect!r}')
+    return insert(model)
+
+
+def _is_sqlite_file(uri: str) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def sqlite_engine_options(app: Flask) -> None:
+    """
+    Apply the pool part of the SQLite profile (call before ``db.init_app``).
+
+    WAL lets readers run next to the single writer, so the pool is sized to
+    the number of worker threads instead of SQLAlchemy's default of 5 + 10.
+    Waiting for a pooled connection is bounded by the same busy timeout as
+    waiting for the write lock.
+    """
+    if not app.config.get('SQLITE_TUNING') or not _is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.setdefault('pool_size', app.config['SQLITE_POOL_SIZE'])
+    options.setdefault('max_overflow', app.config['SQLITE_MAX_OVERFLOW'])
+    options.setdefault('pool_timeout', app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def init_sqlite_profile(app: Flask) -> None:
+    """Set the SQLite pragmas on every new connection (call after ``db.init_app``)."""
+    if not app.config.get('SQLITE_TUNING') or not _is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+    pragmas = (
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        # 負の値はKiB単位
+        f"PRAGMA cache_size=-{int(app.config['SQLITE_CACHE_SIZE_KIB'])}",
+        f"PRAGMA mmap_size={int(app.config['SQLITE_MMAP_SIZE'])}",
+    )
+
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    with app.app_context():
+        event.listen(db.engine, 'connect', _set_pragmas)
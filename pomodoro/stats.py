@@ -0,0 +1,278 @@
+"""Weekly/monthly rollups and range statistics."""
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import Date, cast, func
+from .models import db, DailyStat, PeriodStat, PomodoroSession, DEFAULT_USER_ID
+from .sql import upsert
+
+RANGE_DAYS = {'7d': 7, '30d': 30, '365d': 365}
+REBUILD_CHUNK_DAYS = 31
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month_start(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _upsert_period_rows(rows: List[dict], replace: bool = False) -> None:
+    """Add (or with ``replace`` overwrite) PeriodStat rows with one executemany."""
+    if not rows:
+        return
+    # 行数に依存しない1つの文をexecutemanyで実行する: コンパイル結果がキャッシュされ、
+    # 複数行VALUESのように行数毎の再コンパイルやバインド変数上限を気にしなくてよい
+    stmt = upsert(PeriodStat.__table__)
+    if replace:
+        values = {
+            'total_focus_seconds': stmt.excluded.total_focus_seconds,
+            'completed_focus_count': stmt.excluded.completed_focus_count,
+        }
+    else:
+        values = {
+            'total_focus_seconds': PeriodStat.total_focus_seconds + stmt.excluded.total_focus_seconds,
+            'completed_focus_count': PeriodStat.completed_focus_count + stmt.excluded.completed_focus_count,
+        }
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[PeriodStat.user_id, PeriodStat.period, PeriodStat.start_date],
+        set_=values,
+    ), rows)
+
+
+def record_rollups(day: date, duration_sec: int, count: int = 1, user_id: int = DEFAULT_USER_ID) -> None:
+    """Add a focus completion to the user's week and month rollups of ``day``. The caller commits."""
+    _upsert_period_rows([
+        {'user_id': user_id, 'period': 'week', 'start_date': week_start(day),
+         'total_focus_seconds': duration_sec, 'completed_focus_count': count},
+        {'user_id': user_id, 'period': 'month', 'start_date': month_start(day),
+         'total_focus_seconds': duration_sec, 'completed_focus_count': count},
+    ])
+
+
+def _periods_touching(start: date, end: date) -> List[Tuple[str, date]]:
+    periods = []
+    current = week_start(start)
+    while current <= end:
+        periods.append(('week', current))
+        current += timedelta(days=7)
+    current = month_start(start)
+    while current <= end:
+        periods.append(('month', current))
+        current = _next_month_start(current)
+    return periods
+
+
+def rebuild_rollups(start: Optional[date] = None, end: Optional[date] = None) -> None:
+    """
+    Recompute PeriodStat from DailyStat for every week and month touching [start, end].
+
+    All users are rebuilt: rows of the touched periods are deleted first so
+    users without daily rows in the window do not keep stale totals. Without
+    bounds the whole table is rebuilt. Daily rows are streamed, so memory only
+    grows with the number of (user, period) pairs. The caller commits.
+    """
+    full = start is None and end is None
+    if start is None or end is None:
+        first, last = db.session.query(db.func.min(DailyStat.date), db.func.max(DailyStat.date)).one()
+        start = start or first
+        end = end or last
+    if full:
+        db.session.execute(PeriodStat.__table__.delete())
+    if start is None or end is None:
+        return
+
+    periods = set(_periods_touching(start, end))
+    if not full:
+        for period in ('week', 'month'):
+            starts = [start_date for kind, start_date in periods if kind == period]
+            db.session.execute(PeriodStat.__table__.delete().where(
+                PeriodStat.period == period, PeriodStat.start_date.in_(starts)
+            ))
+    read_start = min(start_date for _, start_date in periods)
+    read_end = max(_next_month_start(end), week_start(end) + timedelta(days=7)) - timedelta(days=1)
+    query = (
+        db.session.query(DailyStat.user_id, DailyStat.date,
+                         DailyStat.total_focus_seconds, DailyStat.completed_focus_count)
+        .filter(DailyStat.date >= read_start, DailyStat.date <= read_end)
+        .order_by(DailyStat.date)
+    )
+    totals: Dict[Tuple[int, str, date], List[int]] = {}
+    for user_id, day, seconds, count in query.yield_per(1000):
+        for period_key in (('week', week_start(day)), ('month', month_start(day))):
+            if period_key in periods:
+                total = totals.setdefault((user_id,) + period_key, [0, 0])
+                total[0] += seconds
+                total[1] += count
+
+    _upsert_period_rows([
+        {'user_id': user_id, 'period': period, 'start_date': start_date,
+         'total_focus_seconds': seconds, 'completed_focus_count': count}
+        for (user_id, period, start_date), (seconds, count) in sorted(totals.items())
+    ], replace=True)
+
+
+def _utc_midnight(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time(), timezone.utc)
+
+
+def _session_day():
+    """SQL expression for the UTC date a session ended on."""
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return func.date(PomodoroSession.end_at)
+    return cast(PomodoroSession.end_at, Date)
+
+
+def rebuild_daily_stats(start: date, end: date, user_id: Optional[int] = None) -> int:
+    """
+    Recompute DailyStat totals for [start, end] from completed focus sessions.
+
+    One GROUP BY per call; only the per-(user, day) result rows reach Python.
+    Totals of days without sessions are reset to zero. Cycle counts are kept
+    (they track the live long-break cycle, not history). Without ``user_id``
+    every user is rebuilt. When the range includes today, the affected users'
+    state versions are bumped so cached states reload. Returns the number of
+    rows written. The caller commits.
+    """
+    reset = DailyStat.__table__.update().where(DailyStat.date >= start, DailyStat.date <= end)
+    if user_id is not None:
+        reset = reset.where(DailyStat.user_id == user_id)
+    db.session.execute(reset.values(total_focus_seconds=0, completed_focus_count=0))
+
+    day = _session_day()
+    query = (
+        db.select(PomodoroSession.user_id, day,
+                  func.sum(PomodoroSession.planned_duration_sec), func.count())
+        .where(
+            PomodoroSession.end_at >= _utc_midnight(start),
+            PomodoroSession.end_at < _utc_midnight(end + timedelta(days=1)),
+            PomodoroSession.type == 'focus',
+            PomodoroSession.status == 'completed',
+        )
+        .group_by(PomodoroSession.user_id, day)
+    )
+    if user_id is not None:
+        query = query.where(PomodoroSession.user_id == user_id)
+    values = [
+        {'user_id': row_user, 'date': row_day if isinstance(row_day, date) else date.fromisoformat(row_day),
+         'total_focus_seconds': seconds, 'completed_focus_count': count, 'cycle_count': 0}
+        for row_user, row_day, seconds, count in db.session.execute(query)
+    ]
+    if values:
+        stmt = upsert(DailyStat.__table__)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[DailyStat.user_id, DailyStat.date],
+            set_={
+                'total_focus_seconds': stmt.excluded.total_focus_seconds,
+                'completed_focus_count': stmt.excluded.completed_focus_count,
+            },
+        ), values)
+    if start <= datetime.now(timezone.utc).date() <= end:
+        # 今日の統計は各プロセスの状態キャッシュにあるので、版数を上げて再読み込みさせる
+        from .services import bump_state_version
+        if user_id is not None:
+            users = [user_id]
+        else:
+            users = db.session.execute(
+                db.select(DailyStat.user_id).where(DailyStat.date >= start, DailyStat.date <= end).distinct()
+            ).scalars().all()
+        for user in users:
+            bump_state_version(user)
+    return len(values)
+
+
+def history_bounds() -> Tuple[Optional[date], Optional[date]]:
+    """First and last UTC day any session ended on (answered from the end_at index)."""
+    first, last = db.session.query(func.min(PomodoroSession.end_at), func.max(PomodoroSession.end_at)).one()
+    if first is None:
+        return None, None
+    return first.date(), last.date()
+
+
+def rebuild_history(start: Optional[date] = None, end: Optional[date] = None,
+                    chunk_days: int = REBUILD_CHUNK_DAYS, user_id: Optional[int] = None
+                    ) -> Iterator[Tuple[date, date, int]]:
+    """
+    Rebuild DailyStat and the rollups from session history, ``chunk_days`` at a time.
+
+    Each chunk is one GROUP BY and one commit, so neither memory nor the
+    write transaction grows with the size of the database. Yields
+    ``(chunk_start, chunk_end, rows_written)`` after each commit.
+    """
+    if start is None or end is None:
+        first, last = history_bounds()
+        start = start or first
+        end = end or last
+    if start is None or end is None:
+        return
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(end, chunk_start + timedelta(days=chunk_days - 1))
+        written = rebuild_daily_stats(chunk_start, chunk_end, user_id=user_id)
+        db.session.commit()
+        yield chunk_start, chunk_end, written
+        chunk_start = chunk_end + timedelta(days=1)
+    rebuild_rollups(start, end)
+    db.session.commit()
+
+
+def split_range(start: date, end: date) -> Tuple[List[date], List[date], List[date]]:
+    """
+    Cover [start, end] with whole months, then whole in-month weeks, then single days.
+
+    Returns the (days, week starts, month starts) to read. A 365-day range needs
+    at most a few dozen rows instead of 365.
+    """
+    days, weeks, months = [], [], []
+    current = start
+    while current <= end:
+        next_month = _next_month_start(current)
+        if current.day == 1 and next_month - timedelta(days=1) <= end:
+            months.append(current)
+            current = next_month
+        elif current.weekday() == 0 and current + timedelta(days=6) <= end and current + timedelta(days=7) <= next_month:
+            weeks.append(current)
+            current += timedelta(days=7)
+        else:
+            days.append(current)
+            current += timedelta(days=1)
+    return days, weeks, months
+
+
+def get_range_stats(range_key: str, today: Optional[date] = None, user_id: int = DEFAULT_USER_ID) -> dict:
+    """Return the user's totals and the rows read for the last ``range_key`` days including today."""
+    if range_key not in RANGE_DAYS:
+        raise ValueError(f"Range must be one of {', '.join(RANGE_DAYS)}")
+    if today is None:
+        today = datetime.now(timezone.utc).date()
+    start = today - timedelta(days=RANGE_DAYS[range_key] - 1)
+    days, weeks, months = split_range(start, today)
+
+    buckets = []
+    if days:
+        for stat in DailyStat.query.filter(DailyStat.user_id == user_id, DailyStat.date.in_(days)):
+            buckets.append({
+                'period': 'day',
+                'start_date': stat.date.isoformat(),
+                'total_focus_seconds': stat.total_focus_seconds,
+                'completed_focus_count': stat.completed_focus_count,
+            })
+    for period, starts in (('week', weeks), ('month', months)):
+        if starts:
+            rows = PeriodStat.query.filter(PeriodStat.user_id == user_id, PeriodStat.period == period,
+                                           PeriodStat.start_date.in_(starts))
+            buckets.extend(row.to_dict() for row in rows)
+    buckets.sort(key=lambda bucket: bucket['start_date'])
+
+    return {
+        'range': range_key,
+        'start_date': start.isoformat(),
+        'end_date': today.isoformat(),
+        'total_focus_seconds': sum(b['total_focus_seconds'] for b in buckets),
+        'completed_focus_count': sum(b['completed_focus_count'] for b in buckets),
+        'buckets': buckets,
+    }
@@ -0,0 +1,165 @@
+"""Streaming export and bulk import of session history."""
+import csv
+import io
+import json
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import insert
+from .models import db, PomodoroSession, DEFAULT_USER_ID
+from .stats import rebuild_daily_stats, rebuild_rollups
+from .validators import ValidationError
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+EXPORT_COLUMNS = ('id', 'user_id', 'type', 'planned_duration_sec', 'start_at', 'planned_end_at', 'end_at', 'status')
+EXPORT_BATCH_ROWS = 1000
+IMPORT_CHUNK_ROWS = 1000
+
+# activeな行は一意部分インデックスと衝突し、スケジューラにも載らないため取り込まない
+IMPORT_STATUSES = ('completed', 'aborted')
+SESSION_TYPES = ('focus', 'break')
+
+
+def export_sessions(fmt: str = 'ndjson', user_id: int = DEFAULT_USER_ID) -> Iterator[str]:
+    """
+    Yield the user's sessions encoded as NDJSON lines or CSV text.
+
+    Rows are fetched ``EXPORT_BATCH_ROWS`` at a time with ``yield_per`` and
+    each batch is encoded into one chunk, so memory does not grow with the
+    size of the history.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValidationError(f"Format must be one of {', '.join(EXPORT_FORMATS)}")
+    query = (
+        PomodoroSession.query
+        .filter(PomodoroSession.user_id == user_id)
+        .order_by(PomodoroSession.id)
+        .yield_per(EXPORT_BATCH_ROWS)
+    )
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, lineterminator='\n')
+    if fmt == 'csv':
+        writer.writeheader()
+    for index, session in enumerate(query, 1):
+        if fmt == 'csv':
+            writer.writerow(session.to_dict())
+        else:
+            buffer.write(json.dumps(session.to_dict()))
+            buffer.write('\n')
+        if index % EXPORT_BATCH_ROWS == 0:
+            yield _drain(buffer)
+    if buffer.tell():
+        yield _drain(buffer)
+
+
+def _drain(buffer: io.StringIO) -> str:
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
+
+
+def _parse_datetime(value, field: str, line: int, required: bool = True) -> Optional[datetime]:
+    if value in (None, ''):
+        if required:
+            raise ValidationError(f'Line {line}: {field} is required')
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f'Line {line}: {field} must be an ISO 8601 datetime')
+    # タイムゾーン無しの値はUTCとして扱う
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+
+
+def _parse_row(record: dict, line: int, user_id: int) -> Optional[dict]:
+    """Validate one exported row; returns None for rows that are skipped (active sessions)."""
+    if not isinstance(record, dict):
+        raise ValidationError(f'Line {line}: expected an object')
+    status = record.get('status')
+    if status == 'active':
+        return None
+    if status not in IMPORT_STATUSES:
+        raise ValidationError(f"Line {line}: status must be one of {', '.join(IMPORT_STATUSES)}")
+    if record.get('type') not in SESSION_TYPES:
+        raise ValidationError(f"Line {line}: type must be one of {', '.join(SESSION_TYPES)}")
+    try:
+        duration = int(record.get('planned_duration_sec'))
+    except (TypeError, ValueError):
+        raise ValidationError(f'Line {line}: planned_duration_sec must be an integer')
+    if duration <= 0:
+        raise ValidationError(f'Line {line}: planned_duration_sec must be positive')
+    # idとuser_idは取り込み先で採番・決定する
+    return {
+        'user_id': user_id,
+        'type': record['type'],
+        'planned_duration_sec': duration,
+        'start_at': _parse_datetime(record.get('start_at'), 'start_at', line),
+        'planned_end_at': _parse_datetime(record.get('planned_end_at'), 'planned_end_at', line),
+        'end_at': _parse_datetime(record.get('end_at'), 'end_at', line, required=status == 'completed'),
+        'status': status,
+    }
+
+
+def _read_records(lines: Iterable[str], fmt: str) -> Iterator[Tuple[int, dict]]:
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line, text in enumerate(lines, 1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except ValueError:
+            raise ValidationError(f'Line {line}: invalid JSON')
+
+
+def import_sessions(lines: Iterable[str], fmt: str = 'ndjson', user_id: int = DEFAULT_USER_ID) -> Dict[str, int]:
+    """
+    Bulk-insert exported sessions for ``user_id`` and rebuild the affected DailyStat rows.
+
+    Rows are inserted ``IMPORT_CHUNK_ROWS`` at a time with executemany inside
+    one transaction, so a bad row leaves the database untouched. DailyStat and
+    the rollups of the imported days are then recomputed with one aggregate
+    query instead of one update per session.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValidationError(f"Format must be one of {', '.join(EXPORT_FORMATS)}")
+    from .services import get_state_cache
+
+    state = get_state_cache(user_id)
+    with state.lock:
+        imported = skipped = 0
+        first_day: Optional[date] = None
+        last_day: Optional[date] = None
+        chunk: List[dict] = []
+        try:
+            for line, record in _read_records(lines, fmt):
+                row = _parse_row(record, line, user_id)
+                if row is None:
+                    skipped += 1
+                    continue
+                if row['status'] == 'completed' and row['type'] == 'focus':
+                    day = row['end_at'].date()
+                    first_day = day if first_day is None else min(first_day, day)
+                    last_day = day if last_day is None else max(last_day, day)
+                chunk.append(row)
+                if len(chunk) >= IMPORT_CHUNK_ROWS:
+                    db.session.execute(insert(PomodoroSession), chunk)
+                    imported += len(chunk)
+                    chunk = []
+            if chunk:
+                db.session.execute(insert(PomodoroSession), chunk)
+                imported += len(chunk)
+            if first_day is not None:
+                rebuild_daily_stats(first_day, last_day, user_id=user_id)
+                rebuild_rollups(first_day, last_day)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        # 今日の統計が変わり得るので次回読み込み時にDBから取り直す
+        state.invalidate()
+    return {'imported': imported, 'skipped': skipped}
+
@@ -0,0 +1,21 @@
+"""Resolve the user a request acts for."""
+from flask import current_app, request, session
+from .models import DEFAULT_USER_ID
+
+
+def current_user_id() -> int:
+    """
+    Return the id of the requesting user.
+
+    A reverse proxy that authenticates users can pass the id in the header
+    named by ``TRUSTED_USER_HEADER``; otherwise ``session['user_id']`` is used.
+    Without either, requests act for ``DEFAULT_USER_ID`` (single-user mode).
+    """
+    header = current_app.config.get('TRUSTED_USER_HEADER')
+    value = request.headers.get(header) if header else None
+    if value is None:
+        value = session.get('user_id', DEFAULT_USER_ID)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_USER_ID
@@ -27,3 +27,29 @@ def validate_duration(duration_minutes: int) -> None:
     
     if duration_minutes > MAX_DURATION_MINUTES:
         raise ValidationError(f"Duration must be at most {MAX_DURATION_MINUTES} minutes")
+
+
+def validate_started_seconds_ago(seconds, duration_minutes) -> None:
+    """
+    Validate the age of a start queued while offline.
+    
+    The session must still be running when the request arrives: a start
+    backdated past its planned end could be completed at once and credit
+    focus time that never ran on the server.
+    
+    Args:
+        seconds: Seconds between the user's click and the request
+        duration_minutes: Planned duration of the session being started
+        
+    Raises:
+        ValidationError: If it is not a number from 0 up to (excluding) the planned duration
+    """
+    if isinstance(seconds, bool) or not isinstance(seconds, (int, float)):
+        raise ValidationError("started_seconds_ago must be a number")
+    
+    # 不正な duration はこの後の validate_duration で弾かれるので、ここでは上限で比べる
+    if isinstance(duration_minutes, bool) or not isinstance(duration_minutes, (int, float)):
+        duration_minutes = MAX_DURATION_MINUTES
+    limit = duration_minutes * 60
+    if not 0 <= seconds < limit:
+        raise ValidationError(f"started_seconds_ago must be at least 0 and less than the planned duration ({limit:g} seconds)")
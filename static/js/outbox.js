@@ -0,0 +1,106 @@
+// 送信キュー (IndexedDB): オフライン中の操作を保存し、オンラインに戻ったら順番に送信する
+// 各操作は Idempotency-Key 付きで送るので、応答を受け取る前に切断されて再送しても二重に実行されない
+const Outbox = (() => {
+    const DB_NAME = 'pomodoro';
+    const STORE_NAME = 'outbox';
+    let dbPromise = null;
+    let flushing = null;
+    let pendingCount = 0;
+
+    function openDb() {
+        if (!dbPromise) {
+            dbPromise = new Promise((resolve, reject) => {
+                const request = indexedDB.open(DB_NAME, 1);
+                request.onupgradeneeded = () => {
+                    request.result.createObjectStore(STORE_NAME, { keyPath: 'seq', autoIncrement: true });
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        }
+        return dbPromise;
+    }
+
+    // 1操作を1トランザクションで実行し、完了後にリクエストの結果を返す
+    async function run(mode, operate) {
+        const db = await openDb();
+        return new Promise((resolve, reject) => {
+            const transaction = db.transaction(STORE_NAME, mode);
+            const request = operate(transaction.objectStore(STORE_NAME));
+            transaction.oncomplete = () => resolve(request.result);
+            transaction.onerror = () => reject(transaction.error);
+        });
+    }
+
+    function newKey() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    }
+
+    // 開始系の操作は押された時刻まで遡って開始させる (端末の時計ではなく経過秒数を送る)
+    function requestBody(entry) {
+        if (!entry.backdate) {
+            return entry.body;
+        }
+        const startedSecondsAgo = Math.max(0, Math.round((Date.now() - entry.queuedAt) / 100) / 10);
+        return { ...entry.body, started_seconds_ago: startedSecondsAgo };
+    }
+
+    // 古い順に送信する。ネットワークエラーか 5xx で中断し、残りは次回に再送する
+    async function sendAll() {
+        const outcomes = new Map();
+        const entries = await run('readonly', (store) => store.getAll());
+        pendingCount = entries.length;
+        for (const entry of entries) {
+            let response;
+            try {
+                response = await fetch(entry.path, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json', 'Idempotency-Key': entry.key },
+                    body: JSON.stringify(requestBody(entry))
+                });
+            } catch (error) {
+                break;
+            }
+            if (response.status >= 500) {
+                break;
+            }
+            // 4xx はサーバーが拒否した操作なので再送しない
+            const data = await response.json().catch(() => ({}));
+            await run('readwrite', (store) => store.delete(entry.seq));
+            pendingCount--;
+            outcomes.set(entry.key, { ok: response.ok, status: response.status, data });
+        }
+        return outcomes;
+    }
+
+    // 同時に呼ばれても送信は1本にまとめる
+    function flush() {
+        if (!flushing) {
+            flushing = sendAll().finally(() => {
+                flushing = null;
+            });
+        }
+        return flushing;
+    }
+
+    // 操作を保存してから送信する。送信できなければ null (キューに残っている)
+    async function enqueue(path, body = {}, { backdate = false } = {}) {
+        const entry = { key: newKey(), path, body, backdate, queuedAt: Date.now() };
+        await run('readwrite', (store) => store.add(entry));
+        pendingCount++;
+        if (flushing) {
+            await flushing;
+        }
+        const outcomes = await flush();
+        return outcomes.get(entry.key) || null;
+    }
+
+    return {
+        enqueue,
+        flush,
+        hasPending: () => pendingCount > 0
+    };
+})();
@@ -1,8 +1,26 @@
 // グローバル状態
 let currentMode = 'idle';
 let remainingSeconds = 0;
+let endTime = null; // ローカル時計での終了予定時刻 (ms)
+let stateEtag = null; // 直近に受け取った /state の ETag
+let currentState = null; // 画面に表示中の状態 (オフライン中はローカルで遷移させる)
 let timerInterval = null;
+let pollInterval = null;
 const CIRCLE_CIRCUMFERENCE = 754; // 2 * π * 120
+const POLL_INTERVAL_MS = 60000;
+// サーバーからpushされるイベント名 (pomodoro/services.py の _publish と対応)
+const STATE_EVENTS = ['state', 'session_start', 'session_stop', 'session_complete', 'long_break_start', 'long_break_decline'];
+const ACTION_PATHS = {
+    start: '/api/pomodoro/start',
+    break: '/api/pomodoro/break',
+    stop: '/api/pomodoro/stop',
+    complete: '/api/pomodoro/complete',
+    longBreak: '/api/pomodoro/long-break',
+    declineLongBreak: '/api/pomodoro/decline-long-break'
+};
+const FOCUS_MINUTES = 25;
+const LONG_BREAK_MINUTES = 15;
+const SESSIONS_BEFORE_LONG_BREAK = 4;
 
 // DOM要素
 const timerText = document.getElementById('timerText');
@@ -19,33 +37,140 @@ const declineLongBreakBtn = document.getElementById('declineLongBreakBtn');
 
 // 初期化
 document.addEventListener('DOMContentLoaded', () => {
-    fetchState();
-    setInterval(fetchState, 60000); // 1分毎に再同期
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register('/sw.js').catch((error) => console.error('Service Worker登録エラー:', error));
+    }
+    syncOutbox();
+    connectEvents();
 });
 
+// オンライン復帰時に未送信の操作を送り、最新状態を取り直す
+window.addEventListener('online', syncOutbox);
+
+async function syncOutbox() {
+    try {
+        await Outbox.flush();
+    } catch (error) {
+        console.error('送信キューエラー:', error);
+    }
+    await fetchState();
+}
+
+// SSEで状態変化を受信 (利用できない間だけポーリング)
+function connectEvents() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    const source = new EventSource('/api/pomodoro/events');
+    source.addEventListener('open', () => {
+        stopPolling();
+    });
+    source.addEventListener('error', () => {
+        // EventSourceは自動で再接続する。その間はポーリングで補う
+        startPolling();
+    });
+    STATE_EVENTS.forEach((name) => {
+        source.addEventListener(name, (event) => applyServerState(JSON.parse(event.data)));
+    });
+}
+
+function startPolling() {
+    if (pollInterval) return;
+    pollInterval = setInterval(syncOutbox, POLL_INTERVAL_MS); // 1分毎に再送・再同期
+}
+
+function stopPolling() {
+    if (pollInterval) {
+        clearInterval(pollInterval);
+        pollInterval = null;
+    }
+}
+
 // API呼び出し
+// 前回のETagで条件付き取得し、変化が無ければ (304) ローカルのカウントダウンを続ける
 async function fetchState() {
     try {
-        const response = await fetch('/api/pomodoro/state');
+        const headers = stateEtag ? { 'If-None-Match': stateEtag } : {};
+        const response = await fetch('/api/pomodoro/state', { headers, cache: 'no-store' });
+        if (response.status === 304) {
+            return;
+        }
+        stateEtag = response.headers.get('ETag');
         const data = await response.json();
-        updateUI(data);
+        applyServerState(data);
     } catch (error) {
         console.error('状態取得エラー:', error);
     }
 }
 
+// 未送信の操作がある間はサーバーの状態 (操作前) で上書きしない
+function applyServerState(state) {
+    if (!Outbox.hasPending()) {
+        updateUI(state);
+    }
+}
+
+// 操作は送信キュー経由で送る。操作APIは操作後の状態を返すので /state を取り直さない。
+// 送信できなければキューに残し、ローカルで状態を遷移させてタイマーを続ける
+async function performAction(action, body = {}) {
+    const backdate = action === 'start' || action === 'break';
+    const outcome = await Outbox.enqueue(ACTION_PATHS[action], body, { backdate });
+    if (outcome === null) {
+        updateUI(localTransition(currentState, action, body));
+        return { ok: true, data: {} };
+    }
+    if (outcome.ok) {
+        updateUI(outcome.data.state);
+    }
+    return outcome;
+}
+
+// ローカルのタイマーエンジン: サーバーと同じ規則で状態を遷移させる
+function localTransition(state, action, body) {
+    const next = { ...(state || { completed_focus_count: 0, total_focus_seconds: 0, cycle_count: 0 }) };
+    const begin = (mode, minutes) => {
+        next.mode = mode;
+        next.remaining_seconds = minutes * 60;
+        next.planned_end_at = new Date(Date.now() + minutes * 60000).toISOString();
+        next.planned_duration_sec = minutes * 60;
+        next.suggest_long_break = false;
+    };
+    const finish = () => {
+        next.mode = 'idle';
+        next.remaining_seconds = 0;
+        next.planned_end_at = null;
+    };
+    if (action === 'start') {
+        begin('focus', body.duration_minutes);
+    } else if (action === 'break') {
+        begin('break', body.duration_minutes);
+    } else if (action === 'longBreak') {
+        begin('break', LONG_BREAK_MINUTES);
+        next.cycle_count = 0;
+    } else if (action === 'stop') {
+        finish();
+    } else if (action === 'declineLongBreak') {
+        next.cycle_count = 0;
+        next.suggest_long_break = false;
+    } else if (action === 'complete') {
+        if (next.mode === 'focus') {
+            next.completed_focus_count += 1;
+            // サーバーの状態には予定時間が無いので、UIから開始する既定の25分とみなす (同期後に補正される)
+            next.total_focus_seconds += next.planned_duration_sec || FOCUS_MINUTES * 60;
+            next.cycle_count += 1;
+        }
+        finish();
+        next.suggest_long_break = next.cycle_count >= SESSIONS_BEFORE_LONG_BREAK;
+    }
+    return next;
+}
+
 async function startFocus() {
     try {
-        const response = await fetch('/api/pomodoro/start', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ duration_minutes: 25 })
-        });
-        if (response.ok) {
-            await fetchState();
-        } else {
-            const error = await response.json();
-            alert(error.error || '開始に失敗しました');
+        const { ok, data } = await performAction('start', { duration_minutes: 25 });
+        if (!ok) {
+            alert(data.error || '開始に失敗しました');
         }
     } catch (error) {
         console.error('開始エラー:', error);
@@ -55,16 +180,9 @@ async function startFocus() {
 
 async function startBreak() {
     try {
-        const response = await fetch('/api/pomodoro/break', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ duration_minutes: 5 })
-        });
-        if (response.ok) {
-            await fetchState();
-        } else {
-            const error = await response.json();
-            alert(error.error || '休憩開始に失敗しました');
+        const { ok, data } = await performAction('break', { duration_minutes: 5 });
+        if (!ok) {
+            alert(data.error || '休憩開始に失敗しました');
         }
     } catch (error) {
         console.error('休憩開始エラー:', error);
@@ -74,12 +192,7 @@ async function startBreak() {
 
 async function stopSession() {
     try {
-        const response = await fetch('/api/pomodoro/stop', {
-            method: 'POST'
-        });
-        if (response.ok) {
-            await fetchState();
-        }
+        await performAction('stop');
     } catch (error) {
         console.error('停止エラー:', error);
     }
@@ -87,16 +200,11 @@ async function stopSession() {
 
 async function startLongBreak() {
     try {
-        const response = await fetch('/api/pomodoro/long-break', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' }
-        });
-        if (response.ok) {
+        const { ok, data } = await performAction('longBreak');
+        if (ok) {
             hideModal();
-            await fetchState();
         } else {
-            const error = await response.json();
-            alert(error.error || '長い休憩の開始に失敗しました');
+            alert(data.error || '長い休憩の開始に失敗しました');
         }
     } catch (error) {
         console.error('長い休憩開始エラー:', error);
@@ -106,12 +214,9 @@ async function startLongBreak() {
 
 async function declineLongBreak() {
     try {
-        const response = await fetch('/api/pomodoro/decline-long-break', {
-            method: 'POST'
-        });
-        if (response.ok) {
+        const { ok } = await performAction('declineLongBreak');
+        if (ok) {
             hideModal();
-            await fetchState();
         }
     } catch (error) {
         console.error('長い休憩辞退エラー:', error);
@@ -120,8 +225,11 @@ async function declineLongBreak() {
 
 // UI更新
 function updateUI(state) {
+    currentState = state;
     currentMode = state.mode;
     remainingSeconds = state.remaining_seconds;
+    // サーバーとの時計のずれの影響を受けないよう、残り秒数から終了時刻を求める
+    endTime = state.planned_end_at ? Date.now() + state.remaining_seconds * 1000 : null;
     
     // ステータステキスト
     if (currentMode === 'focus') {
@@ -170,13 +278,14 @@ function updateUI(state) {
 function startCountdown() {
     if (timerInterval) return;
     
+    // 経過秒数を数えずに終了時刻から計算する (タブが間引かれてもずれない)
     timerInterval = setInterval(() => {
+        remainingSeconds = endTime ? Math.max(0, Math.round((endTime - Date.now()) / 1000)) : 0;
         if (remainingSeconds > 0) {
-            remainingSeconds--;
             updateTimerDisplay(remainingSeconds);
         } else {
             stopCountdown();
-            fetchState(); // 終了時に再取得
+            completeSession();
         }
     }, 1000);
 }
@@ -200,6 +309,18 @@ function updateTimerDisplay(seconds) {
     progressCircle.style.strokeDashoffset = offset;
 }
 
+// ローカルタイマーの終了を報告する (サーバーのスケジューラが先に完了させていれば何もしない)
+async function completeSession() {
+    try {
+        const { ok } = await performAction('complete');
+        if (!ok) {
+            await fetchState();
+        }
+    } catch (error) {
+        console.error('完了報告エラー:', error);
+    }
+}
+
 // Modal functions
 function showModal() {
     longBreakModal.classList.add('show');
@@ -0,0 +1,89 @@
+// Service Worker: アプリのシェル (トップページと静的ファイル) をキャッシュし、オフラインでも起動できるようにする
+// API はキャッシュしない (オフライン中の操作は timer.js のローカルタイマーと送信キューで扱う)
+const CACHE_NAME = 'pomodoro-shell-v1';
+const SHELL_URL = '/';
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(precacheShell().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil(
+        caches.keys()
+            .then((names) => Promise.all(names.filter((name) => name !== CACHE_NAME).map((name) => caches.delete(name))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+    if (request.mode === 'navigate' && url.pathname === SHELL_URL) {
+        event.respondWith(networkFirst(request));
+    } else if (url.pathname.startsWith('/static/')) {
+        event.respondWith(cacheFirst(request));
+    }
+});
+
+// トップページと、そこから参照される静的ファイル (ハッシュ付きURL) をキャッシュする
+async function precacheShell() {
+    const cache = await caches.open(CACHE_NAME);
+    const response = await fetch(SHELL_URL, { cache: 'no-cache' });
+    if (!response.ok) {
+        return;
+    }
+    const html = await response.clone().text();
+    await cache.put(SHELL_URL, response);
+    const assets = [...html.matchAll(/(?:src|href)="(\/static\/[^"]+)"/g)]
+        .map((match) => new URL(match[1].replace(/&amp;/g, '&'), self.location.origin).href);
+    await Promise.all(assets.map(async (url) => {
+        const asset = await fetch(url);
+        if (asset.ok) {
+            await storeStatic(cache, url, asset);
+        }
+    }));
+}
+
+// トップページは常に最新を取りに行き、オフライン時だけキャッシュを返す
+async function networkFirst(request) {
+    const cache = await caches.open(CACHE_NAME);
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            await cache.put(SHELL_URL, response.clone());
+        }
+        return response;
+    } catch (error) {
+        return (await cache.match(SHELL_URL)) || Response.error();
+    }
+}
+
+// 静的ファイルのURLは内容のハッシュ (?v=...) を含み変化しないので、キャッシュを優先する
+async function cacheFirst(request) {
+    const cache = await caches.open(CACHE_NAME);
+    const cached = await cache.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        await storeStatic(cache, request.url, response.clone());
+    }
+    return response;
+}
+
+// 同じファイルの古いハッシュのエントリを消してから保存する
+async function storeStatic(cache, url, response) {
+    const pathname = new URL(url).pathname;
+    const keys = await cache.keys();
+    await Promise.all(keys
+        .filter((key) => key.url !== url && new URL(key.url).pathname === pathname)
+        .map((key) => cache.delete(key)));
+    await cache.put(url, response);
+}
@@ -0,0 +1,32 @@
+"""Shared fixtures: every test gets its own app on a private in-memory database."""
+import pytest
+from app import create_app
+from pomodoro.models import db
+
+
+@pytest.fixture
+def app_config():
+    """Extra config for the ``app`` fixture (override in a module to add settings)."""
+    return {}
+
+
+@pytest.fixture
+def app(app_config):
+    # URI は create_app() に渡す: 作成後に書き換えてもエンジンは既定のDBのまま
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'TESTING': True, **app_config})
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        yield app.test_client()
+        db.session.rollback()
@@ -0,0 +1,141 @@
+"""Tests for the ASGI front end (driven directly through the ASGI interface)."""
+import asyncio
+import io
+import json
+import pytest
+from pomodoro.asgi import PomodoroASGI, build_environ
+
+
+@pytest.fixture
+def asgi(app):
+    asgi = PomodoroASGI(app, threads=4)
+    yield asgi
+    asgi.executor.shutdown()
+
+
+def _scope(method, target, headers=()):
+    path, _, query = target.partition('?')
+    return {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'root_path': '',
+        'query_string': query.encode(),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in headers],
+        'client': ('127.0.0.1', 50000),
+        'server': ('127.0.0.1', 5000),
+    }
+
+
+async def _request(asgi, method, path, headers=(), body=b'', chunks=None):
+    messages = []
+    pending = list(chunks if chunks is not None else [body])
+
+    async def receive():
+        chunk = pending.pop(0)
+        return {'type': 'http.request', 'body': chunk, 'more_body': bool(pending)}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi(_scope(method, path, headers), receive, send)
+    start = messages[0]
+    return start['status'], dict(start['headers']), b''.join(m.get('body', b'') for m in messages[1:])
+
+
+def test_state_matches_flask_and_revalidates(app, asgi):
+    """Test that /state over ASGI returns the Flask response and honours If-None-Match."""
+    status, headers, body = asyncio.run(_request(asgi, 'GET', '/api/pomodoro/state'))
+    assert status == 200
+    assert json.loads(body) == app.test_client().get('/api/pomodoro/state').get_json()
+
+    etag = headers[b'etag'].decode()
+    status, _, body = asyncio.run(_request(asgi, 'GET', '/api/pomodoro/state', [('If-None-Match', etag)]))
+    assert status == 304
+    assert body == b''
+
+
+def test_other_routes_run_flask_on_the_pool(asgi):
+    """Test that mutations go through the Flask app, including validation errors."""
+    payload = json.dumps({'duration_minutes': 25}).encode()
+    status, _, body = asyncio.run(_request(asgi, 'POST', '/api/pomodoro/start',
+                                           [('Content-Type', 'application/json')], payload))
+    assert status == 201
+    assert json.loads(body)['type'] == 'focus'
+
+    status, _, body = asyncio.run(_request(asgi, 'GET', '/api/pomodoro/state'))
+    assert json.loads(body)['mode'] == 'focus'
+
+    status, _, _ = asyncio.run(_request(asgi, 'GET', '/api/pomodoro/stats?range=bogus'))
+    assert status == 400
+
+
+def test_request_body_streams_in_chunks(asgi):
+    """Test that a body sent as several http.request messages reaches the app whole, line by line for /import."""
+    rows = [{'type': 'focus', 'planned_duration_sec': 1500, 'start_at': f'2026-03-0{day}T09:00:00',
+             'planned_end_at': f'2026-03-0{day}T09:25:00', 'end_at': f'2026-03-0{day}T09:25:00',
+             'status': 'completed'} for day in range(1, 4)]
+    chunks = [(json.dumps(row) + '\n').encode() for row in rows]
+    chunks[1:2] = [chunks[1][:10], chunks[1][10:]]
+    status, _, body = asyncio.run(_request(asgi, 'POST', '/api/pomodoro/import',
+                                           [('Content-Type', 'application/x-ndjson')], chunks=chunks))
+    assert status == 200
+    assert json.loads(body) == {'imported': 3, 'skipped': 0}
+
+    payload = json.dumps({'duration_minutes': 25}).encode()
+    status, _, _ = asyncio.run(_request(asgi, 'POST', '/api/pomodoro/start', [('Content-Type', 'application/json')],
+                                        chunks=[payload[:5], b'', payload[5:]]))
+    assert status == 201
+
+
+def test_events_stream_until_disconnect(asgi):
+    """Test that /events sends the state, pushes changes and unsubscribes on disconnect."""
+    async def scenario():
+        received = asyncio.Queue()
+        disconnected = asyncio.Event()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            await received.put(message)
+
+        stream = asyncio.ensure_future(asgi(_scope('GET', '/api/pomodoro/events'), receive, send))
+        start = await asyncio.wait_for(received.get(), 5)
+        first = await asyncio.wait_for(received.get(), 5)
+        assert start['status'] == 200
+        assert dict(start['headers'])[b'content-type'].startswith(b'text/event-stream')
+        assert first['body'].startswith(b'event: state\n')
+        assert asgi.broker.has_subscribers(1)
+
+        await _request(asgi, 'POST', '/api/pomodoro/start', [('Content-Type', 'application/json')],
+                       json.dumps({'duration_minutes': 25}).encode())
+        pushed = await asyncio.wait_for(received.get(), 5)
+        assert pushed['body'].startswith(b'event: session_start\n')
+
+        disconnected.set()
+        await asyncio.wait_for(stream, 5)
+        assert not asgi.broker.has_subscribers(1)
+
+    asyncio.run(scenario())
+
+
+def test_build_environ_maps_headers():
+    """Test the ASGI scope to WSGI environ translation."""
+    scope = _scope('POST', '/api/pomodoro/start?range=7d', [('Content-Type', 'application/json'),
+                                                   ('Cookie', 'a=1'), ('Cookie', 'b=2'), ('X-User', '7')])
+    environ = build_environ(scope, io.BytesIO(b'{}'))
+    assert environ['PATH_INFO'] == '/api/pomodoro/start'
+    assert environ['QUERY_STRING'] == 'range=7d'
+    assert environ['CONTENT_TYPE'] == 'application/json'
+    assert environ['HTTP_COOKIE'] == 'a=1; b=2'
+    assert environ['HTTP_X_USER'] == '7'
+    assert environ['wsgi.input'].read() == b'{}'
@@ -0,0 +1,52 @@
+"""Tests for hashed static URLs and the cached index page."""
+import gzip
+import re
+
+
+def asset_urls(html):
+    return re.findall(r'(?:href|src)="(/static/[^"]+)"', html)
+
+
+def test_index_links_hashed_assets_served_immutable(client):
+    """Test that the page references ?v=<hash> URLs and those are cached for a year."""
+    urls = asset_urls(client.get('/').get_data(as_text=True))
+    assert len(urls) == 5
+    for url in urls:
+        assert re.search(r'\?v=[0-9a-f]{12}$', url)
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    
+    stale = client.get(urls[0].split('?')[0] + '?v=000000000000')
+    assert 'immutable' not in stale.headers.get('Cache-Control', '')
+
+
+def test_index_is_rendered_once_and_revalidated_by_etag(client, monkeypatch):
+    """Test that the index is served pre-compressed from the cache and a matching ETag gets 304."""
+    import pomodoro.assets
+    
+    first = client.get('/')
+    renders = []
+    monkeypatch.setattr(pomodoro.assets, 'render_template', lambda *a, **k: renders.append(a) or '')
+    
+    compressed = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(compressed.data) == first.data
+    
+    revalidated = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert renders == []
+
+
+def test_service_worker_served_from_root_without_long_cache(client):
+    """Test that /sw.js is served at the root scope and always revalidated."""
+    response = client.get('/sw.js')
+    assert response.status_code == 200
+    assert 'javascript' in response.mimetype
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert b'pomodoro-shell' in response.data
+    
+    manifest = client.get('/static/manifest.json').get_json()
+    assert manifest['start_url'] == '/'
@@ -0,0 +1,179 @@
+"""Tests for the NumPy batch tick engine of DeliveryManager."""
+import gc
+import weakref
+import pytest
+from deliverManager import DeliveryManager, KitchenGameManager, KitchenObjectSO, KitchenWorld, PlateKitchenObject, RecipeListSO, RecipeSO, SimulationClock
+
+pytest.importorskip('numpy')
+from deliverBatch import BatchTickEngine
+
+TOMATO = KitchenObjectSO("Tomato", 1)
+LETTUCE = KitchenObjectSO("Lettuce", 2)
+BREAD = KitchenObjectSO("Bread", 3)
+RECIPES = RecipeListSO([RecipeSO("Sandwich", [BREAD, LETTUCE, TOMATO]), RecipeSO("Salad", [LETTUCE, TOMATO])])
+
+
+def make_world(kitchens):
+    world = KitchenWorld(RECIPES)
+    for _ in range(kitchens):
+        world.create_kitchen()
+    return world
+
+
+def waiting_counts(world):
+    return [len(world.get_delivery_manager(k).get_waiting_recipe_so_list()) for k in world.kitchen_ids()]
+
+
+def test_batch_tick_spawns_like_per_kitchen_update():
+    """Test that the engine spawns as many recipes per kitchen as KitchenWorld.tick."""
+    reference, batched = make_world(50), make_world(50)
+    for world in (reference, batched):
+        world.get_kitchen_game_manager(3).stop_game()
+        world.get_delivery_manager(7).set_waiting_recipes_max(1)
+    engine = BatchTickEngine.from_world(batched, seed=1)
+    
+    for _ in range(200):
+        reference.tick(0.5)
+        engine.tick(0.5)
+    assert waiting_counts(batched) == waiting_counts(reference)
+    assert waiting_counts(batched)[3] == 0
+    assert waiting_counts(batched)[7] == 1
+    assert engine.waiting_counts.tolist() == waiting_counts(batched)
+
+
+def test_spawn_events_fire_only_for_spawning_kitchens():
+    """Test that on_recipe_spawned fires once per spawned recipe and playing flags follow the game."""
+    world = make_world(10)
+    world.get_kitchen_game_manager(0).stop_game()
+    engine = BatchTickEngine.from_world(world, seed=1)
+    spawned = []
+    for kitchen_id in world.kitchen_ids():
+        world.get_delivery_manager(kitchen_id).on_recipe_spawned.add_handler(
+            lambda sender, args, kitchen_id=kitchen_id: spawned.append(kitchen_id))
+    
+    assert engine.tick(0.0).tolist() == list(range(1, 10))
+    assert spawned == list(range(1, 10))
+    assert engine.tick(1.0).size == 0
+    
+    world.get_kitchen_game_manager(0).start_game()
+    assert engine.tick(3.0).tolist() == list(range(10))
+
+
+def test_deliveries_free_queue_slots():
+    """Test that a delivery lowers the engine's waiting count so the kitchen spawns again."""
+    world = make_world(1)
+    manager = world.get_delivery_manager(0)
+    manager.set_waiting_recipes_max(1)
+    engine = BatchTickEngine.from_world(world, seed=2)
+    
+    engine.tick(0.0)
+    assert engine.tick(4.0).size == 0  # 上限
+    recipe = manager.get_waiting_recipe_so_list()[0]
+    plate = PlateKitchenObject()
+    for kitchen_object_so in recipe.kitchen_object_so_list:
+        plate.add_kitchen_object(kitchen_object_so)
+    manager.deliver_recipe(plate)
+    assert engine.waiting_counts[0] == 0
+    assert engine.tick(4.0).tolist() == [0]
+
+
+def test_same_seed_draws_same_recipes():
+    """Test that the engine's recipe draws are reproducible from the seed."""
+    def run(seed):
+        world = make_world(20)
+        engine = BatchTickEngine.from_world(world, seed=seed)
+        for _ in range(10):
+            engine.tick(4.0)
+        return [[r.name for r in world.get_delivery_manager(k).get_waiting_recipe_so_list()] for k in world.kitchen_ids()]
+    
+    assert run(5) == run(5)
+    assert run(5) != run(6)
+
+
+def test_seeded_fixed_step_world_matches_kitchen_world_tick():
+    """Test that without an engine seed, fixed steps and each kitchen's seeded rng give KitchenWorld.tick's orders."""
+    def make_seeded():
+        world = KitchenWorld(RECIPES, clock=SimulationClock(), seed=11, fixed_step=0.1)
+        for _ in range(20):
+            world.create_kitchen()
+        return world
+    
+    def orders(world):
+        return [[r.name for r in world.get_delivery_manager(k).get_waiting_recipe_so_list()] for k in world.kitchen_ids()]
+    
+    reference, batched = make_seeded(), make_seeded()
+    engine = BatchTickEngine.from_world(batched)
+    for delta in [0.25, 0.05, 0.05, 4.0, 0.3] * 4:
+        reference.tick(delta)
+        engine.tick(delta)
+    assert orders(batched) == orders(reference)
+    assert len(set(map(tuple, orders(batched)))) > 1
+    
+    # 書き戻せば update() でそのまま続きを進められる
+    engine.sync_timers()
+    for kitchen_id in reference.kitchen_ids():
+        expected, actual = reference.get_delivery_manager(kitchen_id), batched.get_delivery_manager(kitchen_id)
+        assert actual.get_spawn_recipe_timer() == pytest.approx(expected.get_spawn_recipe_timer())
+        assert actual.get_accumulated_time() == pytest.approx(expected.get_accumulated_time())
+
+
+def test_fixed_step_tick_can_run_several_steps():
+    """Test that one long tick runs every fixed step, spawning once per due step."""
+    world = KitchenWorld(RECIPES, fixed_step=0.5)
+    world.create_kitchen()
+    world.get_delivery_manager(0).set_waiting_recipes_max(10)
+    engine = BatchTickEngine.from_world(world)
+    
+    assert engine.tick(0.2).size == 0  # 1ステップに満たない
+    assert engine.tick(8.8).tolist() == [0, 0, 0]  # 0.5秒目 / 4.5秒目 / 8.5秒目
+    assert engine.accumulated_times[0] == pytest.approx(0.0)
+
+
+def deliver_first_waiting(manager):
+    plate = PlateKitchenObject()
+    for kitchen_object_so in manager.get_waiting_recipe_so_list()[0].kitchen_object_so_list:
+        plate.add_kitchen_object(kitchen_object_so)
+    manager.deliver_recipe(plate)
+
+
+def test_dropped_engine_is_collected_and_unsubscribed():
+    """Test that managers do not keep a discarded engine alive or keep calling into it."""
+    world = make_world(3)
+    engine = BatchTickEngine.from_world(world)
+    engine.tick(0.0)
+    counts, playing = engine.waiting_counts, engine.playing
+    collected = weakref.ref(engine)
+    del engine
+    gc.collect()
+    
+    assert collected() is None
+    manager = world.get_delivery_manager(0)
+    assert len(manager.on_recipe_completed) == 0
+    assert len(manager.get_kitchen_game_manager().on_state_changed) == 0
+    deliver_first_waiting(manager)
+    manager.get_kitchen_game_manager().stop_game()
+    assert counts.tolist() == [1, 1, 1]
+    assert playing.tolist() == [True, True, True]
+
+
+def test_close_removes_handlers_from_a_shared_game_manager():
+    """Test that engines rebuilt over kitchens sharing one KitchenGameManager do not pile up handlers."""
+    game_manager = KitchenGameManager()
+    game_manager.start_game()
+    managers = [DeliveryManager(RECIPES, game_manager) for _ in range(4)]
+    
+    for _ in range(3):
+        with BatchTickEngine(managers) as engine:
+            assert len(game_manager.on_state_changed) == 1
+            game_manager.stop_game()
+            assert engine.playing.tolist() == [False] * 4
+            game_manager.start_game()
+        assert len(game_manager.on_state_changed) == 0
+        assert all(len(manager.on_recipe_completed) == 0 for manager in managers)
+    
+    with BatchTickEngine(managers) as engine:
+        engine.tick(0.0)
+        deliver_first_waiting(managers[2])
+        assert engine.waiting_counts.tolist() == [1, 1, 0, 1]
+    deliver_first_waiting(managers[0])  # close() 後は追従しない
+    assert engine.waiting_counts.tolist() == [1, 1, 0, 1]
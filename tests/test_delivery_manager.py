@@ -0,0 +1,254 @@
+"""Tests for DeliveryManager recipe matching, simulation and events."""
+import gc
+import random
+import pytest
+from deliverManager import (
+    DeliveryManager,
+    Event,
+    EventArgs,
+    KitchenGameManager,
+    KitchenWorld,
+    KitchenObjectSO,
+    PlateKitchenObject,
+    RecipeListSO,
+    RecipeSO,
+    SimulationClock,
+)
+
+TOMATO = KitchenObjectSO("Tomato", 1)
+LETTUCE = KitchenObjectSO("Lettuce", 2)
+BREAD = KitchenObjectSO("Bread", 3)
+
+SANDWICH = RecipeSO("Sandwich", [BREAD, LETTUCE, TOMATO])
+SALAD = RecipeSO("Salad", [LETTUCE, TOMATO])
+DOUBLE_BREAD = RecipeSO("DoubleBread", [BREAD, BREAD, TOMATO])
+
+
+def plate_of(*kitchen_object_sos):
+    plate = PlateKitchenObject()
+    for kitchen_object_so in kitchen_object_sos:
+        plate.add_kitchen_object(kitchen_object_so)
+    return plate
+
+
+@pytest.fixture
+def manager():
+    """A manager that spawns one random recipe per update() while the game is playing."""
+    game_manager = KitchenGameManager.get_instance()
+    game_manager.start_game()
+    random.seed(7)
+    manager = DeliveryManager(RecipeListSO([SANDWICH, SALAD, DOUBLE_BREAD]))
+    manager._spawn_recipe_timer_max = 0.0
+    manager._waiting_recipes_max = 100
+    events = []
+    manager.on_recipe_success.add_handler(lambda sender, args: events.append('success'))
+    manager.on_recipe_failed.add_handler(lambda sender, args: events.append('failed'))
+    manager.events = events
+    yield manager
+    game_manager.stop_game()
+
+
+def fill(manager, count):
+    for _ in range(count):
+        manager.update()
+    return manager.get_waiting_recipe_so_list()
+
+
+def test_delivery_completes_oldest_matching_order(manager):
+    """Test that a plate in any ingredient order completes the oldest order of that recipe."""
+    waiting = fill(manager, 20)
+    assert len(waiting) == 20
+    
+    manager.deliver_recipe(plate_of(TOMATO, BREAD, LETTUCE))
+    
+    expected = list(waiting)
+    expected.remove(SANDWICH)  # 最初に見つかる (最も古い) サンドイッチだけが消える
+    assert manager.get_waiting_recipe_so_list() == expected
+    assert manager.get_successful_recipes_amount() == 1
+    assert manager.events == ['success']
+
+
+def test_ingredient_counts_must_match(manager):
+    """Test that duplicate ingredients are compared as a multiset."""
+    waiting = fill(manager, 20)
+    assert DOUBLE_BREAD in waiting and SALAD in waiting
+    
+    manager.deliver_recipe(plate_of(BREAD, TOMATO, TOMATO))
+    manager.deliver_recipe(plate_of(LETTUCE, TOMATO, TOMATO))
+    assert manager.events == ['failed', 'failed']
+    
+    manager.deliver_recipe(plate_of(TOMATO, BREAD, BREAD))
+    assert manager.events[-1] == 'success'
+    assert manager.get_waiting_recipe_so_list().count(DOUBLE_BREAD) == waiting.count(DOUBLE_BREAD) - 1
+
+
+def test_delivering_every_order_empties_the_queue(manager):
+    """Test that each waiting order can be delivered exactly once."""
+    waiting = fill(manager, 50)
+    for recipe_so in reversed(waiting):
+        manager.deliver_recipe(plate_of(*reversed(recipe_so.kitchen_object_so_list)))
+    
+    assert manager.get_waiting_recipe_so_list() == []
+    assert manager.get_successful_recipes_amount() == 50
+    manager.deliver_recipe(plate_of(LETTUCE, TOMATO))
+    assert manager.events[-1] == 'failed'
+
+
+def test_world_kitchens_are_independent():
+    """Test that KitchenWorld kitchens have their own game state, queues and timers."""
+    world = KitchenWorld(RecipeListSO([SANDWICH, SALAD]))
+    playing = world.create_kitchen()
+    paused = world.create_kitchen(start=False)
+    assert len(world) == 2
+    assert world.get_kitchen_game_manager(playing) is not world.get_kitchen_game_manager(paused)
+    assert not KitchenGameManager.get_instance().is_game_playing()
+    
+    world.tick(0.0)  # タイマー初期値0なので最初の tick で生成される
+    world.tick(1.0)
+    world.tick(3.0)  # 合計4秒で2件目
+    assert len(world.get_delivery_manager(playing).get_waiting_recipe_so_list()) == 2
+    assert world.get_delivery_manager(paused).get_waiting_recipe_so_list() == []
+    
+    world.get_kitchen_game_manager(paused).start_game()
+    world.tick(4.0)
+    assert len(world.get_delivery_manager(paused).get_waiting_recipe_so_list()) == 1
+    
+    world.remove_kitchen(paused)
+    assert world.kitchen_ids() == [playing]
+
+
+def test_fixed_step_simulates_a_five_minute_session():
+    """Test that update(300) runs the session in fixed steps, identically for the same seed."""
+    def run(seed):
+        manager = DeliveryManager(RecipeListSO([SANDWICH, SALAD, DOUBLE_BREAD]), KitchenGameManager(),
+                                  rng=random.Random(seed), fixed_step=0.125)
+        manager.get_kitchen_game_manager().start_game()
+        spawned = []
+        
+        def deliver_at_once(sender, args):
+            # すぐ配達して待機数の上限に当たらないようにする
+            recipe_so = sender.get_waiting_recipe_so_list()[-1]
+            spawned.append(recipe_so.name)
+            sender.deliver_recipe(plate_of(*recipe_so.kitchen_object_so_list))
+        
+        manager.on_recipe_spawned.add_handler(deliver_at_once)
+        manager.update(300.0)
+        return spawned, manager.get_successful_recipes_amount()
+    
+    random.seed(1)
+    spawned, delivered = run(seed=3)
+    assert len(spawned) == delivered == 75  # 最初のステップと以後4秒毎
+    random.seed(2)  # グローバルの乱数には依存しない
+    assert run(seed=3) == (spawned, delivered)
+    assert run(seed=4)[0] != spawned
+
+
+def test_fixed_step_carries_over_partial_steps():
+    """Test that clock time shorter than a step is kept for the next update()."""
+    clock = SimulationClock()
+    game_manager = KitchenGameManager()
+    game_manager.start_game()
+    manager = DeliveryManager(RecipeListSO([SALAD]), game_manager, clock=clock, fixed_step=0.5)
+    
+    clock.advance(0.3)
+    manager.update()
+    assert manager.get_waiting_recipe_so_list() == []
+    clock.advance(0.3)
+    manager.update()  # 0.6秒で1ステップ目
+    assert manager.get_waiting_recipe_so_list() == [SALAD]
+    
+    with pytest.raises(ValueError):
+        DeliveryManager(RecipeListSO([SALAD]), game_manager, fixed_step=0.0)
+
+
+def test_seeded_world_is_reproducible():
+    """Test that worlds with the same seed, clock and ticks spawn the same orders."""
+    def run():
+        clock = SimulationClock()
+        world = KitchenWorld(RecipeListSO([SANDWICH, SALAD, DOUBLE_BREAD]), clock=clock, seed=11, fixed_step=0.1)
+        for _ in range(5):
+            world.create_kitchen()
+        world.tick()
+        for _ in range(60):
+            clock.advance(0.25)
+            world.tick()
+        return [[recipe_so.name for recipe_so in world.get_delivery_manager(k).get_waiting_recipe_so_list()]
+                for k in world.kitchen_ids()]
+    
+    orders = run()
+    assert all(len(waiting) == 4 for waiting in orders)
+    assert len(set(map(tuple, orders))) > 1  # キッチン毎に別の乱数列
+    assert run() == orders
+
+
+class Listener:
+    def __init__(self, calls):
+        self.calls = calls
+    
+    def handle(self, sender, args):
+        self.calls.append(self)
+
+
+def test_event_handlers_are_deduplicated_and_removed_by_equality():
+    """Test that re-adding the same function or bound method is ignored and remove works with a new reference."""
+    calls = []
+    listener = Listener(calls)
+    event = Event()
+    event.add_handler(listener.handle)
+    event.add_handler(listener.handle)  # 別のバウンドメソッドオブジェクトでも同じハンドラー
+    event.invoke(None)
+    assert calls == [listener]
+    
+    event.remove_handler(listener.handle)
+    event.remove_handler(listener.handle)  # 未登録の削除は無視
+    event.invoke(None)
+    assert calls == [listener] and len(event) == 0
+
+
+def test_event_passes_shared_empty_args():
+    """Test that invoke without args passes the immutable EventArgs.EMPTY singleton."""
+    received = []
+    event = Event()
+    event.add_handler(lambda sender, args: received.append(args))
+    event.invoke(None)
+    event.invoke(None)
+    assert received[0] is received[1] is EventArgs.EMPTY
+    with pytest.raises(AttributeError):
+        EventArgs.EMPTY.value = 1
+
+
+def test_event_changes_during_dispatch_apply_from_next_invoke():
+    """Test that handlers can unsubscribe themselves and others while the event is dispatching."""
+    calls = []
+    event = Event()
+    
+    def once(sender, args):
+        calls.append('once')
+        event.remove_handler(once)
+        event.add_handler(late)
+    
+    def late(sender, args):
+        calls.append('late')
+    
+    event.add_handler(once)
+    event.add_handler(lambda sender, args: calls.append('always'))
+    event.invoke(None)
+    event.invoke(None)
+    assert calls == ['once', 'always', 'always', 'late']
+
+
+def test_weak_handlers_are_dropped_with_their_owner():
+    """Test that weak bound-method handlers do not keep their instance alive."""
+    calls = []
+    kept, dropped = Listener(calls), Listener(calls)
+    event = Event()
+    event.add_handler(kept.handle, weak=True)
+    event.add_handler(dropped.handle, weak=True)
+    event.invoke(None)
+    assert calls == [kept, dropped]
+    
+    del dropped
+    calls.clear()
+    gc.collect()
+    event.invoke(None)
+    assert calls == [kept] and len(event) == 1
@@ -0,0 +1,61 @@
+"""Tests for the Server-Sent Events channel."""
+import json
+from pomodoro.events import EventBroker, format_sse
+
+
+def parse_sse(chunk):
+    """Parse one encoded SSE message into (event, data)."""
+    if isinstance(chunk, bytes):
+        chunk = chunk.decode()
+    fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+    return fields['event'], json.loads(fields['data'])
+
+
+def test_format_sse():
+    """Test SSE message encoding."""
+    assert format_sse('state', {'mode': 'idle'}) == 'event: state\ndata: {"mode": "idle"}\n\n'
+
+
+def test_broker_fans_out_to_all_subscribers():
+    """Test that every subscriber of a user receives a published event until it unsubscribes."""
+    broker = EventBroker()
+    first = broker.subscribe(1)
+    second = broker.subscribe(1)
+    other = broker.subscribe(2)
+    
+    broker.publish(1, 'session_start', {'mode': 'focus'})
+    assert first.get_nowait() == second.get_nowait()
+    assert other.empty()
+    
+    broker.unsubscribe(1, first)
+    broker.publish(1, 'session_stop', {'mode': 'idle'})
+    assert first.empty()
+    assert parse_sse(second.get_nowait()) == ('session_stop', {'mode': 'idle'})
+    
+    broker.unsubscribe(1, second)
+    assert not broker.has_subscribers(1)
+    assert broker.has_subscribers(2)
+
+
+def test_events_stream_pushes_state_changes(client):
+    """Test that /events sends the current state, then start/stop events."""
+    response = client.get('/api/pomodoro/events', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    stream = iter(response.response)
+    
+    event, data = parse_sse(next(stream))
+    assert event == 'state'
+    assert data['mode'] == 'idle'
+    
+    client.post('/api/pomodoro/start', json={'duration_minutes': 25})
+    event, data = parse_sse(next(stream))
+    assert event == 'session_start'
+    assert data['mode'] == 'focus'
+    
+    client.post('/api/pomodoro/stop')
+    event, data = parse_sse(next(stream))
+    assert event == 'session_stop'
+    assert data['mode'] == 'idle'
+    
+    response.close()
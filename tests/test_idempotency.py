@@ -0,0 +1,135 @@
+"""Tests for Idempotency-Key replay of action requests and offline (backdated) actions."""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from pomodoro.idempotency import PENDING_STATUS
+from pomodoro.models import db, IdempotencyKey, PomodoroSession, DailyStat
+
+
+def test_replayed_start_runs_once(client):
+    """Test that a retried start with the same key returns the first response without a 409."""
+    headers = {'Idempotency-Key': 'start-1'}
+    first = client.post('/api/pomodoro/start', json={'duration_minutes': 25}, headers=headers)
+    retry = client.post('/api/pomodoro/start', json={'duration_minutes': 25}, headers=headers)
+    
+    assert first.status_code == retry.status_code == 201
+    assert retry.get_json()['id'] == first.get_json()['id']
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert PomodoroSession.query.filter_by(status='active').count() == 1
+    
+    # 別のキーは新しい操作として扱われる
+    other = client.post('/api/pomodoro/start', json={'duration_minutes': 25}, headers={'Idempotency-Key': 'start-2'})
+    assert other.status_code == 409
+
+
+def test_replay_returns_current_state(client):
+    """Test that a replayed response carries the state at replay time."""
+    client.post('/api/pomodoro/start', json={'duration_minutes': 25}, headers={'Idempotency-Key': 'a'})
+    client.post('/api/pomodoro/stop', headers={'Idempotency-Key': 'b'})
+    
+    retry = client.post('/api/pomodoro/start', json={'duration_minutes': 25}, headers={'Idempotency-Key': 'a'})
+    assert retry.status_code == 201
+    assert retry.get_json()['state']['mode'] == 'idle'
+
+
+def test_keys_are_per_user_and_validated(client):
+    """Test that keys are scoped to the user and malformed keys are rejected."""
+    client.application.config['TRUSTED_USER_HEADER'] = 'X-User-Id'
+    first = client.post('/api/pomodoro/start', headers={'Idempotency-Key': 'k', 'X-User-Id': '2'})
+    second = client.post('/api/pomodoro/start', headers={'Idempotency-Key': 'k', 'X-User-Id': '3'})
+    assert first.get_json()['id'] != second.get_json()['id']
+    assert 'Idempotent-Replayed' not in second.headers
+    client.post('/api/pomodoro/stop', headers={'X-User-Id': '2'})
+    client.post('/api/pomodoro/stop', headers={'X-User-Id': '3'})
+    
+    response = client.post('/api/pomodoro/stop', headers={'Idempotency-Key': 'x' * 129})
+    assert response.status_code == 400
+    assert response.get_json()['field'] == 'Idempotency-Key'
+
+
+def test_expired_keys_are_purged(client):
+    """Test that keys older than IDEMPOTENCY_TTL_HOURS are deleted when a new key is stored."""
+    db.session.add(IdempotencyKey(user_id=1, key='old', status_code=200, response='{}',
+                                  created_at=datetime.now(timezone.utc) - timedelta(hours=25)))
+    db.session.commit()
+    client.post('/api/pomodoro/stop', headers={'Idempotency-Key': 'new'})
+    assert [row.key for row in IdempotencyKey.query.all()] == ['new']
+
+
+def test_offline_start_is_backdated_and_completed(client):
+    """Test started_seconds_ago and /complete for a session queued offline."""
+    started = client.post('/api/pomodoro/start', json={'duration_minutes': 1, 'started_seconds_ago': 57})
+    assert started.status_code == 201
+    session = db.session.get(PomodoroSession, started.get_json()['id'])
+    assert session.start_at <= datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=56)
+    assert started.get_json()['state']['mode'] == 'focus'
+    
+    # 残り数秒なので、ローカルタイマーの終了報告は時計のずれの許容範囲内
+    completed = client.post('/api/pomodoro/complete')
+    assert completed.status_code == 200
+    assert completed.get_json()['status'] in ('completed', 'idle')
+    db.session.refresh(session)
+    assert session.status == 'completed'
+    today = DailyStat.query.filter_by(user_id=1, date=datetime.now(timezone.utc).date()).one()
+    assert today.completed_focus_count >= 1
+    
+    # 完了済み (スケジューラが先に完了させた場合も) の再報告は idle
+    assert client.post('/api/pomodoro/complete').get_json()['status'] == 'idle'
+
+
+def test_backdate_cannot_reach_past_planned_end(client):
+    """Test that a start backdated to its planned end or earlier is rejected instead of credited at once."""
+    response = client.post('/api/pomodoro/start', json={'duration_minutes': 240, 'started_seconds_ago': 240 * 60})
+    assert response.status_code == 400
+    assert response.get_json()['field'] == 'started_seconds_ago'
+    assert PomodoroSession.query.count() == 0
+
+
+def test_retry_with_new_elapsed_time_replays(client):
+    """Test that a retry only differing in started_seconds_ago (recomputed per send) is the same request."""
+    headers = {'Idempotency-Key': 'queued'}
+    first = client.post('/api/pomodoro/start', json={'duration_minutes': 25, 'started_seconds_ago': 3}, headers=headers)
+    retry = client.post('/api/pomodoro/start', json={'duration_minutes': 25, 'started_seconds_ago': 9}, headers=headers)
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json()['id'] == first.get_json()['id']
+
+
+def test_key_reused_for_different_request_is_rejected(client):
+    """Test that a key is bound to the method, path and body of its first request."""
+    headers = {'Idempotency-Key': 'k'}
+    client.post('/api/pomodoro/start', json={'duration_minutes': 25}, headers=headers)
+    
+    other_body = client.post('/api/pomodoro/start', json={'duration_minutes': 50}, headers=headers)
+    assert other_body.status_code == 422
+    assert other_body.get_json()['field'] == 'Idempotency-Key'
+    assert client.post('/api/pomodoro/stop', headers=headers).status_code == 422
+    assert PomodoroSession.query.filter_by(status='active').count() == 1
+
+
+def test_key_is_reserved_before_the_action_runs(client):
+    """Test that a key held by a request still running (e.g. in another process) is not run again."""
+    db.session.add(IdempotencyKey(user_id=1, key='busy', request_method='POST', request_path='/api/pomodoro/start',
+                                  request_hash=hashlib.sha256(b'{"duration_minutes":25}').hexdigest(),
+                                  status_code=PENDING_STATUS, response='', created_at=datetime.now(timezone.utc)))
+    db.session.commit()
+    
+    response = client.post('/api/pomodoro/start', json={'duration_minutes': 25}, headers={'Idempotency-Key': 'busy'})
+    assert response.status_code == 409
+    assert PomodoroSession.query.count() == 0
+    
+    # 5xx 以外の応答は予約した行に保存される
+    client.post('/api/pomodoro/stop', headers={'Idempotency-Key': 'done'})
+    stored = IdempotencyKey.query.filter_by(key='done').one()
+    assert (stored.status_code, stored.request_path) == (200, '/api/pomodoro/stop')
+
+
+def test_complete_rejects_running_session(client):
+    """Test that /complete does not end a session before its planned end."""
+    client.post('/api/pomodoro/start', json={'duration_minutes': 25})
+    response = client.post('/api/pomodoro/complete')
+    assert response.status_code == 409
+    
+    bad = client.post('/api/pomodoro/break', json={'duration_minutes': 5, 'started_seconds_ago': -1})
+    assert bad.status_code == 400
+    assert bad.get_json()['field'] == 'started_seconds_ago'
@@ -129,3 +129,50 @@ def test_log_level_configuration(app):
     """Test that LOG_LEVEL configuration is respected."""
     # Default is INFO
     assert app.config['LOG_LEVEL'] == 'INFO'
+
+
+def test_json_formatter_uses_record_created():
+    """Test that the timestamp comes from record.created, not from a new clock read."""
+    from app import JsonFormatter
+    record = logging.LogRecord('test', logging.INFO, __file__, 1, 'hello', None, None)
+    record.created = 1700000000.25
+    record.event = 'session_start'
+    record.session_type = 'focus'
+    
+    log_entry = json.loads(JsonFormatter().format(record))
+    assert log_entry['timestamp'] == '2023-11-14T22:13:20.250000Z'
+    assert log_entry['message'] == 'hello'
+    assert log_entry['event'] == 'session_start'
+    assert log_entry['type'] == 'focus'
+    assert 'session_id' not in log_entry
+
+
+def test_bounded_queue_handler_drops_when_full():
+    """Test the drop policy: a full queue never blocks and counts dropped records."""
+    import queue
+    from app import BoundedQueueHandler
+    handler = BoundedQueueHandler(queue.Queue(maxsize=1), policy='drop')
+    record = logging.LogRecord('test', logging.INFO, __file__, 1, 'hello', None, None)
+    
+    handler.handle(record)
+    handler.handle(record)
+    handler.handle(record)
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 2
+
+
+def test_async_logging_writes_from_listener_thread(app):
+    """Test that records logged on the request thread reach the stream via the listener."""
+    import app as app_module
+    assert app.config['LOG_ASYNC'] is True
+    
+    stream = StringIO()
+    listener = app_module._log_listener
+    listener.handlers[0].setStream(stream)
+    logging.getLogger('pomodoro.services').info('queued', extra={'event': 'session_start'})
+    listener.stop()
+    app_module._log_listener = None
+    
+    log_entry = json.loads(stream.getvalue().strip().split('\n')[-1])
+    assert log_entry['message'] == 'queued'
+    assert log_entry['event'] == 'session_start'
@@ -0,0 +1,94 @@
+"""Tests for the /metrics endpoint."""
+import gc
+import threading
+from pomodoro.metrics import Metrics
+from pomodoro.models import db
+
+
+def metric_value(body, line_prefix):
+    for line in body.splitlines():
+        if line.startswith(line_prefix + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    raise AssertionError(f'{line_prefix} not found')
+
+
+def test_metrics_counts_requests_and_latency(client):
+    """Test per-route request counters and latency histograms."""
+    for _ in range(3):
+        client.get('/api/pomodoro/state')
+    
+    body = client.get('/metrics').get_data(as_text=True)
+    assert metric_value(body, 'pomodoro_http_requests_total{route="/api/pomodoro/state",method="GET",status="200"}') == 3
+    assert metric_value(body, 'pomodoro_http_request_duration_seconds_count{route="/api/pomodoro/state"}') == 3
+    assert metric_value(body, 'pomodoro_http_request_duration_seconds_bucket{route="/api/pomodoro/state",le="+Inf"}') == 3
+
+
+def test_metrics_counts_sql_per_request(client):
+    """Test that SQL statements are attributed to the request that ran them."""
+    client.post('/api/pomodoro/start', json={'duration_minutes': 25})
+    client.get('/api/pomodoro/state')
+    
+    body = client.get('/metrics').get_data(as_text=True)
+    assert metric_value(body, 'pomodoro_sql_queries_per_request_sum{route="/api/pomodoro/start"}') >= 1
+    assert metric_value(body, 'pomodoro_sql_queries_per_request_sum{route="/api/pomodoro/state"}') == 1
+    client.post('/api/pomodoro/stop')
+
+
+def test_metrics_gauges_reflect_state(client):
+    """Test active-session and DailyStat gauges."""
+    client.post('/api/pomodoro/start', json={'duration_minutes': 25})
+    body = client.get('/metrics').get_data(as_text=True)
+    assert metric_value(body, 'pomodoro_active_sessions') == 1
+    assert metric_value(body, 'pomodoro_today_completed_focus_count') == 0
+    client.post('/api/pomodoro/stop')
+    
+    body = client.get('/metrics').get_data(as_text=True)
+    assert metric_value(body, 'pomodoro_active_sessions') == 0
+
+
+def test_metrics_shards_sum_across_threads():
+    """Test that per-thread shards are merged at scrape time."""
+    metrics = Metrics()
+    
+    def worker():
+        for _ in range(100):
+            metrics.observe_request('/x', 'GET', 200, 0.001, 1, 0.0001)
+    
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    body = metrics.render({})
+    assert metric_value(body, 'pomodoro_http_requests_total{route="/x",method="GET",status="200"}') == 400
+    assert metric_value(body, 'pomodoro_sql_queries_per_request_count{route="/x"}') == 400
+
+
+def test_metrics_folds_finished_threads_into_one_shard():
+    """Test that a thread-per-request server does not grow one shard per request."""
+    metrics = Metrics()
+    
+    def worker():
+        metrics.observe_request('/x', 'GET', 200, 0.001, 1, 0.0001)
+    
+    for _ in range(50):
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+    gc.collect()
+    
+    assert len(metrics._shards) <= 2
+    body = metrics.render({})
+    assert metric_value(body, 'pomodoro_http_requests_total{route="/x",method="GET",status="200"}') == 50
+    assert metric_value(body, 'pomodoro_http_request_duration_seconds_count{route="/x"}') == 50
+
+
+def test_metrics_failed_statement_does_not_leak_start_time(client):
+    """Test that a statement that raises (the 409 on a second start) pops its start time."""
+    client.post('/api/pomodoro/start', json={'duration_minutes': 25})
+    assert client.post('/api/pomodoro/start', json={'duration_minutes': 25}).status_code == 409
+    
+    with db.engine.connect() as conn:
+        assert not conn.info.get('_metrics_query_start')
+    client.post('/api/pomodoro/stop')
@@ -131,3 +131,127 @@ def test_start_break_default_duration(client):
     """Test /break endpoint uses default duration when not provided."""
     response = client.post('/api/pomodoro/break', json={})
     assert response.status_code == 201
+
+
+def test_start_with_active_session_returns_409_without_select(client):
+    """Test that /start relies on the DB constraint: 409 on conflict, no session SELECT on the hot path."""
+    from sqlalchemy import event
+    
+    assert client.post('/api/pomodoro/start', json={'duration_minutes': 25}).status_code == 201
+    
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.post('/api/pomodoro/start', json={'duration_minutes': 25})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    
+    assert response.status_code == 409
+    assert 'error' in response.get_json()
+    selects = [s for s in statements if s.lstrip().upper().startswith('SELECT')]
+    assert len(selects) == 1 and 'FROM state_versions' in selects[0]  # 状態キャッシュの版数確認だけ
+    client.post('/api/pomodoro/stop')
+
+
+def test_workers_sharing_a_database_agree_on_the_active_session(tmp_path):
+    """Test that a 409 from one worker matches the state it reports for a session started by another."""
+    uri = f"sqlite:///{tmp_path / 'workers.db'}"
+    first, second = (create_app({'SQLALCHEMY_DATABASE_URI': uri, 'TESTING': True}).test_client() for _ in range(2))
+    assert second.get('/api/pomodoro/state').get_json()['mode'] == 'idle'
+    
+    assert first.post('/api/pomodoro/start', json={'duration_minutes': 25}).status_code == 201
+    assert second.post('/api/pomodoro/start', json={'duration_minutes': 25}).status_code == 409
+    assert second.get('/api/pomodoro/state').get_json()['mode'] == 'focus'
+    
+    assert second.post('/api/pomodoro/stop').get_json()['state']['mode'] == 'idle'
+    assert first.get('/api/pomodoro/state').get_json()['mode'] == 'idle'
+    assert first.post('/api/pomodoro/break', json={'duration_minutes': 5}).status_code == 201
+
+
+def test_trusted_user_header_scopes_sessions(app, client):
+    """Test that the trusted header selects the user every route acts for."""
+    app.config['TRUSTED_USER_HEADER'] = 'X-User-Id'
+    
+    for user_id in ('2', '3'):
+        response = client.post('/api/pomodoro/start', json={'duration_minutes': 25},
+                               headers={'X-User-Id': user_id})
+        assert response.status_code == 201
+    
+    assert client.get('/api/pomodoro/state', headers={'X-User-Id': '2'}).get_json()['mode'] == 'focus'
+    assert client.get('/api/pomodoro/state').get_json()['mode'] == 'idle'
+    
+    client.post('/api/pomodoro/stop', headers={'X-User-Id': '2'})
+    assert client.get('/api/pomodoro/state', headers={'X-User-Id': '2'}).get_json()['mode'] == 'idle'
+    assert client.get('/api/pomodoro/state', headers={'X-User-Id': '3'}).get_json()['mode'] == 'focus'
+    client.post('/api/pomodoro/stop', headers={'X-User-Id': '3'})
+
+
+def test_state_conditional_get_returns_304_with_one_version_query(client):
+    """Test that /state revalidation by ETag is answered from the state cache after a version check."""
+    from sqlalchemy import event
+    
+    first = client.get('/api/pomodoro/state')
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+    assert first.get_json()['planned_end_at'] is None
+    
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        revalidated = client.get('/api/pomodoro/state', headers={'If-None-Match': etag})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    assert revalidated.status_code == 304
+    assert len(statements) == 1 and 'FROM state_versions' in statements[0]
+    
+    client.post('/api/pomodoro/start', json={'duration_minutes': 25})
+    changed = client.get('/api/pomodoro/state', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['planned_end_at'] is not None
+    assert client.get('/api/pomodoro/state', headers={'If-None-Match': changed.headers['ETag']}).status_code == 304
+    client.post('/api/pomodoro/stop')
+
+
+def test_actions_return_state(client):
+    """Test that mutation endpoints include the state after the action."""
+    started = client.post('/api/pomodoro/start', json={'duration_minutes': 25}).get_json()
+    assert started['state']['mode'] == 'focus'
+    assert started['state']['planned_end_at'] is not None
+    
+    stopped = client.post('/api/pomodoro/stop').get_json()
+    assert stopped['status'] == 'stopped'
+    assert stopped['state']['mode'] == 'idle'
+    
+    rejected = client.post('/api/pomodoro/break', json={'duration_minutes': 0}).get_json()
+    assert 'state' not in rejected
+
+
+def test_batch_runs_operations_in_order(client):
+    """Test /batch runs operations in order and stops at the first failure."""
+    response = client.post('/api/pomodoro/batch', json={'operations': [
+        {'op': 'start', 'duration_minutes': 25},
+        {'op': 'stop'},
+        {'op': 'break', 'duration_minutes': 5},
+        {'op': 'start'},
+        {'op': 'stop'},
+    ]})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [(r['op'], r['status']) for r in data['results']] == [('start', 201), ('stop', 200), ('break', 201), ('start', 409)]
+    assert data['results'][2]['result']['type'] == 'break'
+    assert data['state']['mode'] == 'break'
+    client.post('/api/pomodoro/stop')
+
+
+def test_batch_rejects_invalid_operations(client):
+    """Test /batch validates every operation before running any."""
+    for body in ({}, {'operations': []}, {'operations': [{'op': 'stop'}, {'op': 'reset'}]},
+                 {'operations': [{'op': 'stop'}] * 21}):
+        response = client.post('/api/pomodoro/batch', json=body)
+        assert response.status_code == 400
+        assert response.get_json()['field'] == 'operations'
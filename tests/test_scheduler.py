@@ -0,0 +1,72 @@
+"""Tests for the background completion scheduler."""
+import time
+import pytest
+from datetime import datetime, timedelta, timezone
+from pomodoro.models import db, PomodoroSession, DailyStat
+from pomodoro.scheduler import CompletionScheduler, init_scheduler
+from pomodoro.services import start_focus, get_state, stop_active_session
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    # :memory: は全スレッドで1接続を共有し、スケジューラの未コミットの変更が見えてしまう
+    return {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'scheduler.db'}"}
+
+
+def wait_for_status(session_id, status, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        db.session.expire_all()
+        if db.session.get(PomodoroSession, session_id).status == status:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_start_focus_schedules_completion(app, app_context):
+    """Test that starting a session puts it on the scheduler heap."""
+    scheduler = app.extensions['pomodoro_scheduler']
+    before = scheduler.pending()
+    start_focus(1)
+    assert scheduler.pending() == before + 1
+    stop_active_session()
+
+
+def test_scheduler_completes_due_session(app, app_context):
+    """Test that a due session is completed without any get_state call."""
+    session = start_focus(1)
+    app.extensions['pomodoro_scheduler'].schedule(session.id, datetime.now(timezone.utc))
+    
+    assert wait_for_status(session.id, 'completed')
+    today = datetime.now(timezone.utc).date()
+    assert DailyStat.query.filter_by(date=today).first().completed_focus_count == 1
+    assert get_state()['completed_focus_count'] == 1
+
+
+def test_get_state_does_not_complete_overdue_session(app_context):
+    """Test that get_state is a pure read even for an overdue session."""
+    session = start_focus(1)
+    overdue = datetime.now(timezone.utc) - timedelta(seconds=1)
+    session.planned_end_at = overdue
+    db.session.commit()
+    from pomodoro.services import get_state_cache
+    get_state_cache().invalidate()
+    
+    state = get_state()
+    assert state['mode'] == 'idle'
+    assert state['remaining_seconds'] == 0
+    db.session.expire_all()
+    assert db.session.get(PomodoroSession, session.id).status == 'active'
+    stop_active_session()
+
+
+def test_rebuild_reschedules_active_sessions(app, app_context):
+    """Test that a restart rebuilds the heap from active rows and completes overdue ones."""
+    session = start_focus(1)
+    session.planned_end_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.session.commit()
+    
+    scheduler = init_scheduler(app)
+    assert isinstance(scheduler, CompletionScheduler)
+    assert wait_for_status(session.id, 'completed')
+    scheduler.stop()
@@ -0,0 +1,149 @@
+"""Tests for schema creation and upgrades."""
+import pytest
+from sqlalchemy import inspect, text
+from app import create_app
+from pomodoro.models import db, PomodoroSession
+from pomodoro.schema import upgrade_schema
+
+
+def test_active_session_lookup_uses_user_index(app_context):
+    """Test that a user's active-session lookup searches a per-user index instead of scanning."""
+    query = PomodoroSession.query.filter(PomodoroSession.user_id == 1, PomodoroSession.active_filter())
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    plan = db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')).fetchall()
+    details = ' '.join(row[-1] for row in plan)
+    assert details.startswith('SEARCH')
+    assert 'user_id=?' in details
+
+
+def test_upgrade_schema_adds_missing_index(app_context):
+    """Test that an existing database without the index gets it on upgrade."""
+    db.session.execute(text('DROP INDEX uq_pomodoro_sessions_user_active'))
+    db.session.commit()
+    assert 'uq_pomodoro_sessions_user_active' not in {
+        index['name'] for index in inspect(db.engine).get_indexes('pomodoro_sessions')
+    }
+    
+    upgrade_schema()
+    
+    assert 'uq_pomodoro_sessions_user_active' in {
+        index['name'] for index in inspect(db.engine).get_indexes('pomodoro_sessions')
+    }
+
+
+def test_second_active_session_violates_constraint(app_context):
+    """Test that the database itself rejects a second active session of the same user."""
+    from datetime import datetime, timezone
+    from sqlalchemy.exc import IntegrityError
+    
+    now = datetime.now(timezone.utc)
+    for _ in range(2):
+        db.session.add(PomodoroSession(type='focus', planned_duration_sec=60, start_at=now,
+                                       planned_end_at=now, status='active'))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+    
+    for user_id in (1, 2):
+        db.session.add(PomodoroSession(user_id=user_id, type='focus', planned_duration_sec=60,
+                                       start_at=now, planned_end_at=now, status='active'))
+    db.session.commit()
+
+
+def test_upgrade_schema_replaces_old_index_and_aborts_duplicates(app_context):
+    """Test upgrading a database that has the old non-unique index and two active rows."""
+    from datetime import datetime, timezone
+    
+    db.session.execute(text('DROP INDEX uq_pomodoro_sessions_user_active'))
+    db.session.execute(text(
+        "CREATE INDEX ix_pomodoro_sessions_active ON pomodoro_sessions (status) WHERE status = 'active'"
+    ))
+    now = datetime.now(timezone.utc)
+    older = PomodoroSession(type='focus', planned_duration_sec=60, start_at=now, planned_end_at=now, status='active')
+    newer = PomodoroSession(type='break', planned_duration_sec=60, start_at=now, planned_end_at=now, status='active')
+    db.session.add_all([older, newer])
+    db.session.commit()
+    
+    upgrade_schema()
+    
+    indexes = {index['name'] for index in inspect(db.engine).get_indexes('pomodoro_sessions')}
+    assert 'ix_pomodoro_sessions_active' not in indexes
+    assert 'uq_pomodoro_sessions_user_active' in indexes
+    db.session.expire_all()
+    assert older.status == 'aborted'
+    assert newer.status == 'active'
+
+
+def test_upgrade_schema_migrates_single_user_database(app_context):
+    """Test that tables created before multi-user support get user_id and per-user indexes."""
+    db.drop_all()
+    for statement in (
+        "CREATE TABLE pomodoro_sessions (id INTEGER PRIMARY KEY, type VARCHAR(10) NOT NULL, "
+        "planned_duration_sec INTEGER NOT NULL, start_at DATETIME NOT NULL, planned_end_at DATETIME NOT NULL, "
+        "end_at DATETIME, status VARCHAR(20) NOT NULL)",
+        "CREATE UNIQUE INDEX uq_pomodoro_sessions_single_active ON pomodoro_sessions (status) "
+        "WHERE status = 'active'",
+        "CREATE TABLE daily_stats (id INTEGER PRIMARY KEY, date DATE NOT NULL, total_focus_seconds INTEGER NOT NULL, "
+        "completed_focus_count INTEGER NOT NULL, cycle_count INTEGER NOT NULL)",
+        "CREATE UNIQUE INDEX ix_daily_stats_date ON daily_stats (date)",
+        "CREATE TABLE period_stats (id INTEGER PRIMARY KEY, period VARCHAR(5) NOT NULL, start_date DATE NOT NULL, "
+        "total_focus_seconds INTEGER NOT NULL, completed_focus_count INTEGER NOT NULL, "
+        "CONSTRAINT uq_period_stats_period_start_date UNIQUE (period, start_date))",
+        "INSERT INTO daily_stats (date, total_focus_seconds, completed_focus_count, cycle_count) "
+        "VALUES ('2025-03-05', 1500, 1, 1)",
+    ):
+        db.session.execute(text(statement))
+    db.session.commit()
+    
+    upgrade_schema()
+    
+    inspector = inspect(db.engine)
+    assert {'uq_pomodoro_sessions_user_active', 'ix_pomodoro_sessions_user_status'} <= {
+        index['name'] for index in inspector.get_indexes('pomodoro_sessions')
+    }
+    assert 'uq_pomodoro_sessions_single_active' not in {
+        index['name'] for index in inspector.get_indexes('pomodoro_sessions')
+    }
+    assert {index['name'] for index in inspector.get_indexes('daily_stats')} == {'uq_daily_stats_user_date'}
+    assert db.session.execute(text('SELECT user_id FROM daily_stats')).scalar() == 1
+    rollups = db.session.execute(text(
+        'SELECT user_id, period, total_focus_seconds FROM period_stats ORDER BY period'
+    )).fetchall()
+    assert [tuple(row) for row in rollups] == [(1, 'month', 1500), (1, 'week', 1500)]
+
+
+def test_warm_boot_skips_schema_reflection(tmp_path):
+    """Test that create_app only checks the stored version when the schema is current."""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    
+    config = {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'warm.db'}", 'TESTING': True}
+    create_app(config)  # 初回起動でスキーマを作成してバージョンを保存する
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        create_app(config)
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+    
+    assert not [s for s in statements if 'sqlite_master' in s or s.startswith('PRAGMA main.')]
+    assert any('schema_version' in s for s in statements)
+
+
+def test_ensure_schema_upgrades_when_version_differs(app_context):
+    """Test that a changed stored version triggers the full upgrade again."""
+    from pomodoro.models import SchemaVersion
+    from pomodoro.schema import ensure_schema, schema_fingerprint
+    
+    assert ensure_schema() is False
+    db.session.execute(text('DROP INDEX uq_pomodoro_sessions_user_active'))
+    db.session.get(SchemaVersion, 1).version = 'outdated'
+    db.session.commit()
+    
+    assert ensure_schema() is True
+    assert 'uq_pomodoro_sessions_user_active' in {
+        index['name'] for index in inspect(db.engine).get_indexes('pomodoro_sessions')
+    }
+    assert db.session.get(SchemaVersion, 1).version == schema_fingerprint()
@@ -1,4 +1,5 @@
 import pytest
+from datetime import datetime, timezone
 from app import create_app
 from pomodoro.models import db
 from pomodoro.services import start_focus, start_break, stop_active_session, get_state
@@ -95,3 +96,265 @@ def test_start_break_valid_duration_boundaries(app_context):
     assert session2.id is not None
     stop_active_session()
 
+
+def test_get_state_served_from_cache_with_one_version_query(app_context):
+    """Test that get_state answers from the in-process cache once it is loaded (one version read)."""
+    from sqlalchemy import event
+    
+    start_focus(1)
+    get_state()
+    
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        state = get_state()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    
+    assert state['mode'] == 'focus'
+    assert 0 < state['remaining_seconds'] <= 60
+    assert len(statements) == 1 and 'FROM state_versions' in statements[0]
+    stop_active_session()
+
+
+def test_user_state_publishes_version_and_state_together():
+    """Test that apply() replaces version and snapshot at once, and drops the cache after a foreign write."""
+    from pomodoro.cache import ActiveSnapshot, UserState
+    
+    state = UserState()
+    state.apply(1, active=None)  # 未読み込みのキャッシュには適用しない
+    assert not state.loaded
+    
+    active = ActiveSnapshot(id=1, user_id=1, type='focus', planned_duration_sec=60,
+                            planned_end_at=datetime.now(timezone.utc))
+    state.load(None, 'stat', 1)
+    state.apply(2, active=active)
+    assert state.is_current(2)
+    assert state.snapshot() == (active, 'stat')
+    assert state._snapshot == (2, active, 'stat')
+    
+    state.apply(4, active=None)  # 版数3は別プロセスの書き込み
+    assert not state.loaded
+    assert not state.is_current(4)
+    assert state.snapshot() == (None, None)
+
+
+def test_state_cache_write_through_on_stop_and_complete(app_context):
+    """Test that stop and completion update the cached state immediately."""
+    from pomodoro.services import complete_session, get_state_cache
+    
+    session = start_focus(1)
+    assert get_state_cache().snapshot()[0].id == session.id
+    
+    complete_session(session.id)
+    active, stat = get_state_cache().snapshot()
+    assert active is None
+    assert stat.completed_focus_count == 1
+    
+    start_break(1)
+    stop_active_session()
+    assert get_state_cache().snapshot()[0] is None
+    assert get_state()['mode'] == 'idle'
+
+
+def test_state_cache_consistent_under_threads(app):
+    """Test that concurrent starts through the cache leave exactly one active session."""
+    import threading
+    from pomodoro.models import PomodoroSession
+    from pomodoro.services import get_state_cache
+    
+    results = []
+    def worker():
+        with app.app_context():
+            try:
+                results.append(start_focus(1).id)
+            except ValueError:
+                results.append(None)
+    
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    started = [r for r in results if r is not None]
+    assert len(started) == 1
+    with app.app_context():
+        assert PomodoroSession.query.filter_by(status='active').count() == 1
+        assert get_state_cache().snapshot()[0].id == started[0]
+        stop_active_session()
+
+
+def shared_file_apps(tmp_path, count):
+    """Several app instances on one temporary SQLite file (like several workers)."""
+    uri = f"sqlite:///{tmp_path / 'shared.db'}"
+    return [create_app({'SQLALCHEMY_DATABASE_URI': uri, 'TESTING': True}) for _ in range(count)]
+
+
+def test_concurrent_focus_completions_are_not_lost(tmp_path):
+    """Test that DailyStat upserts from many threads and several apps add up exactly."""
+    import threading
+    from pomodoro.models import DailyStat
+    from pomodoro.services import record_focus_completion
+    
+    # 複数ワーカー相当: 同じDBを共有する別アプリインスタンス
+    apps = shared_file_apps(tmp_path, 3)
+    app = apps[0]
+    threads_per_app, completions_per_thread = 4, 25
+    errors = []
+    
+    def worker(worker_app):
+        with worker_app.app_context():
+            try:
+                for _ in range(completions_per_thread):
+                    record_focus_completion(60)
+                    db.session.commit()
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+    
+    threads = [threading.Thread(target=worker, args=(a,)) for a in apps for _ in range(threads_per_app)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert errors == []
+    total = len(threads) * completions_per_thread
+    with app.app_context():
+        stat = DailyStat.query.filter_by(date=datetime.now(timezone.utc).date()).one()
+        assert stat.completed_focus_count == total
+        assert stat.total_focus_seconds == total * 60
+        assert stat.cycle_count == total
+
+
+def test_concurrent_complete_session_counts_once(tmp_path):
+    """Test that completing the same session from many threads is counted once."""
+    import threading
+    from pomodoro.services import complete_session
+    
+    apps = shared_file_apps(tmp_path, 2)
+    app = apps[0]
+    with app.app_context():
+        session_id = start_focus(1).id
+    
+    def worker(worker_app):
+        with worker_app.app_context():
+            complete_session(session_id)
+    
+    threads = [threading.Thread(target=worker, args=(apps[i % 2],)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    with app.app_context():
+        state = get_state()
+        assert state['completed_focus_count'] == 1
+        assert state['total_focus_seconds'] == 60
+
+
+def test_state_cache_follows_writes_from_other_apps(tmp_path):
+    """Test that an app sharing the database sees another app's writes on its next read."""
+    from pomodoro.services import complete_session
+    from pomodoro.stats import rebuild_history
+    
+    first, second = shared_file_apps(tmp_path, 2)
+    with second.app_context():
+        assert get_state()['mode'] == 'idle'  # キャッシュを読み込んでおく
+    with first.app_context():
+        session_id = start_focus(1).id
+    with second.app_context():
+        assert get_state()['mode'] == 'focus'
+        with pytest.raises(ValueError):
+            start_focus(1)
+        stop_active_session()
+    with first.app_context():
+        assert get_state()['mode'] == 'idle'
+        session_id = start_focus(1).id
+    with second.app_context():
+        complete_session(session_id)
+        assert get_state()['completed_focus_count'] == 1
+    with first.app_context():
+        assert get_state()['completed_focus_count'] == 1
+        db.session.execute(db.text('DELETE FROM pomodoro_sessions'))
+        db.session.commit()
+        list(rebuild_history(*[datetime.now(timezone.utc).date()] * 2))
+    with second.app_context():
+        assert get_state()['completed_focus_count'] == 0
+
+
+def test_stop_racing_another_workers_completion_keeps_row_and_stats_consistent(tmp_path):
+    """Test that a completion landing while another worker stops the session is never overwritten."""
+    from sqlalchemy import event
+    from pomodoro.models import PomodoroSession
+    from pomodoro.services import complete_session
+    
+    first, second = shared_file_apps(tmp_path, 2)
+    with first.app_context():
+        session_id = start_focus(1).id
+        get_state()
+        
+        # 停止側がセッションを読んだ直後に、別ワーカーのスケジューラが完了させる
+        completed_elsewhere = []
+        def complete_elsewhere(conn, cursor, statement, parameters, context, executemany):
+            if (not completed_elsewhere and statement.lstrip().startswith('SELECT')
+                    and 'FROM pomodoro_sessions' in statement):
+                completed_elsewhere.append(True)
+                with second.app_context():
+                    complete_session(session_id)
+        event.listen(db.engine, 'after_cursor_execute', complete_elsewhere)
+        try:
+            stop_active_session()
+        finally:
+            event.remove(db.engine, 'after_cursor_execute', complete_elsewhere)
+        
+        session = db.session.get(PomodoroSession, session_id)
+        assert session.status in ('completed', 'aborted')
+        assert get_state()['completed_focus_count'] == (1 if session.status == 'completed' else 0)
+        assert get_state()['mode'] == 'idle'
+
+
+def test_users_have_independent_sessions_and_stats(app_context):
+    """Test that each user has their own active session, stats and cached state."""
+    from pomodoro.services import complete_session
+    
+    first = start_focus(1, user_id=2)
+    second = start_focus(1, user_id=3)
+    with pytest.raises(ValueError):
+        start_break(1, user_id=2)
+    
+    complete_session(second.id)
+    assert get_state(2)['mode'] == 'focus'
+    assert get_state(2)['completed_focus_count'] == 0
+    assert get_state(3)['mode'] == 'idle'
+    assert get_state(3)['completed_focus_count'] == 1
+    assert get_state()['mode'] == 'idle'
+    
+    stop_active_session(user_id=2)
+    assert get_state(2)['mode'] == 'idle'
+    assert first.id != second.id
+
+
+def test_loading_user_state_only_reads_own_rows(app_context):
+    """Test that the first get_state of a user filters by user_id and later calls only check the version."""
+    from sqlalchemy import event
+    
+    start_focus(1, user_id=2)
+    
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        get_state(3)
+        cold = list(statements)
+        get_state(3)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    
+    assert len(cold) == 3  # 版数 + active セッション + 今日の統計
+    assert all('user_id = ?' in statement for statement in cold)
+    assert statements[len(cold):] == cold[:1]
+    stop_active_session(user_id=2)
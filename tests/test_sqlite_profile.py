@@ -0,0 +1,47 @@
+"""Tests for the SQLite connection profile."""
+import pytest
+from sqlalchemy import text
+from app import create_app
+from pomodoro.models import db
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    apps = []
+    
+    def factory(**overrides):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'profile.db'}",
+                          'METRICS_ENABLED': False, **overrides})
+        apps.append(app)
+        return app
+    
+    yield factory
+    for app in apps:
+        with app.app_context():
+            db.engine.dispose()
+
+
+def pragma(name):
+    return db.session.execute(text(f'PRAGMA {name}')).scalar()
+
+
+def test_profile_sets_pragmas_and_pool(make_app):
+    """Test that every pooled connection gets the WAL profile and the pool is sized from config."""
+    app = make_app(SQLITE_BUSY_TIMEOUT_MS=1234, SQLITE_POOL_SIZE=3, SQLITE_MAX_OVERFLOW=2)
+    with app.app_context():
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('busy_timeout') == 1234
+        assert pragma('cache_size') == -app.config['SQLITE_CACHE_SIZE_KIB']
+        assert pragma('mmap_size') == app.config['SQLITE_MMAP_SIZE']
+        assert db.engine.pool.size() == 3
+        assert db.engine.pool._max_overflow == 2
+
+
+def test_profile_can_be_disabled(make_app):
+    """Test that SQLITE_TUNING=False keeps SQLite and SQLAlchemy defaults."""
+    app = make_app(SQLITE_TUNING=False)
+    with app.app_context():
+        assert pragma('journal_mode') == 'delete'
+        assert pragma('synchronous') == 2  # FULL
+        assert db.engine.pool.size() == 5
@@ -0,0 +1,160 @@
+"""Tests for rollup statistics and the range stats API."""
+from datetime import date, datetime, timedelta, timezone
+from pomodoro.models import db, DailyStat, PeriodStat, PomodoroSession
+from pomodoro.services import start_focus, complete_session
+from pomodoro.stats import get_range_stats, rebuild_rollups, split_range
+
+
+def add_daily(day, seconds, count=1):
+    db.session.add(DailyStat(date=day, total_focus_seconds=seconds, completed_focus_count=count, cycle_count=0))
+
+
+def test_completion_updates_week_and_month_rollups(app_context):
+    """Test that completing a focus session increments both rollup rows."""
+    for _ in range(2):
+        session = start_focus(1)
+        complete_session(session.id)
+    
+    rows = {row.period: row for row in PeriodStat.query.all()}
+    assert set(rows) == {'week', 'month'}
+    for row in rows.values():
+        assert row.total_focus_seconds == 120
+        assert row.completed_focus_count == 2
+
+
+def test_split_range_reads_few_rows_for_a_year():
+    """Test that a 365-day range is covered by a few dozen rows without gaps or overlaps."""
+    end = date(2026, 10, 17)
+    start = end - timedelta(days=364)
+    days, weeks, months = split_range(start, end)
+    
+    assert len(days) + len(weeks) + len(months) <= 30
+    covered = set(days)
+    for week in weeks:
+        covered.update(week + timedelta(days=i) for i in range(7))
+    for month in months:
+        current = month
+        while current.month == month.month:
+            covered.add(current)
+            current += timedelta(days=1)
+    assert covered == {start + timedelta(days=i) for i in range(365)}
+
+
+def test_range_stats_totals_match_daily_history(app_context):
+    """Test that range totals from rollups equal the sum of the daily rows."""
+    today = date(2026, 10, 17)
+    for offset in range(400):
+        add_daily(today - timedelta(days=offset), 60 * (offset % 7 + 1))
+    db.session.commit()
+    rebuild_rollups()
+    db.session.commit()
+    
+    for range_key, days in (('7d', 7), ('30d', 30), ('365d', 365)):
+        stats = get_range_stats(range_key, today=today)
+        expected = sum(60 * (offset % 7 + 1) for offset in range(days))
+        assert stats['total_focus_seconds'] == expected
+        assert stats['completed_focus_count'] == days
+        assert stats['start_date'] == (today - timedelta(days=days - 1)).isoformat()
+        assert len(stats['buckets']) <= 30
+
+
+def test_partial_rebuild_keeps_periods_outside_range(app_context):
+    """Test that rebuilding one day leaves unrelated rollups intact."""
+    add_daily(date(2026, 9, 30), 100)
+    add_daily(date(2026, 10, 1), 200)
+    db.session.commit()
+    rebuild_rollups()
+    db.session.commit()
+    
+    rebuild_rollups(date(2026, 10, 1), date(2026, 10, 1))
+    db.session.commit()
+    
+    week = PeriodStat.query.filter_by(period='week', start_date=date(2026, 9, 28)).one()
+    september = PeriodStat.query.filter_by(period='month', start_date=date(2026, 9, 1)).one()
+    assert week.total_focus_seconds == 300
+    assert september.total_focus_seconds == 100
+
+
+def test_rollups_are_kept_per_user(app_context):
+    """Test that rebuilds and range stats never mix users."""
+    today = date(2026, 10, 17)
+    db.session.add(DailyStat(user_id=1, date=today, total_focus_seconds=100,
+                             completed_focus_count=1, cycle_count=1))
+    db.session.add(DailyStat(user_id=2, date=today, total_focus_seconds=700,
+                             completed_focus_count=7, cycle_count=3))
+    db.session.commit()
+    rebuild_rollups()
+    rebuild_rollups(today, today)
+    db.session.commit()
+    
+    assert get_range_stats('30d', today=today)['total_focus_seconds'] == 100
+    assert get_range_stats('30d', today=today, user_id=2)['total_focus_seconds'] == 700
+    assert get_range_stats('30d', today=today, user_id=3)['total_focus_seconds'] == 0
+    assert PeriodStat.query.filter_by(period='month').count() == 2
+
+
+def test_stats_api_etag_returns_304_when_unchanged(client):
+    """Test that /stats carries an ETag and honours If-None-Match."""
+    response = client.get('/api/pomodoro/stats?range=30d')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['range'] == '30d'
+    etag = response.headers['ETag']
+    
+    response = client.get('/api/pomodoro/stats?range=30d', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    
+    session_id = client.post('/api/pomodoro/start', json={'duration_minutes': 1}).get_json()['id']
+    complete_session(session_id)
+    response = client.get('/api/pomodoro/stats?range=30d', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['completed_focus_count'] == 1
+
+
+def test_stats_api_is_private_per_user(client):
+    """Test that /stats, like /state, is kept out of shared caches and varies by user."""
+    client.application.config['TRUSTED_USER_HEADER'] = 'X-User-Id'
+    response = client.get('/api/pomodoro/stats?range=7d')
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert {'Cookie', 'X-User-Id'} <= {value.strip() for value in response.headers['Vary'].split(',')}
+    
+    not_modified = client.get('/api/pomodoro/stats?range=7d', headers={'If-None-Match': response.headers['ETag']})
+    assert not_modified.status_code == 304
+    assert not_modified.headers['Cache-Control'] == 'private, no-cache'
+
+
+def test_stats_api_rejects_unknown_range(client):
+    """Test that an unsupported range returns 400."""
+    response = client.get('/api/pomodoro/stats?range=2d')
+    assert response.status_code == 400
+    assert response.get_json()['field'] == 'range'
+
+
+def test_rebuild_stats_command_recomputes_from_sessions(app, app_context):
+    """Test that the CLI rebuild fixes drifted and stale DailyStat rows chunk by chunk."""
+    for user_id, day, status in ((1, 1, 'completed'), (1, 1, 'completed'), (1, 3, 'completed'),
+                                 (1, 4, 'aborted'), (2, 3, 'completed')):
+        end = datetime(2026, 3, day, 10, 0, tzinfo=timezone.utc)
+        db.session.add(PomodoroSession(user_id=user_id, type='focus', planned_duration_sec=600, start_at=end,
+                                       planned_end_at=end, end_at=end, status=status))
+    add_daily(date(2026, 3, 1), 5)
+    add_daily(date(2026, 3, 2), 900)
+    db.session.add(DailyStat(user_id=1, date=date(2026, 3, 3), total_focus_seconds=0,
+                             completed_focus_count=0, cycle_count=2))
+    db.session.commit()
+    
+    result = app.test_cli_runner().invoke(args=['rebuild-stats', '--chunk-days', '2'])
+    assert result.exit_code == 0, result.output
+    assert result.output.count('daily rows\n') == 2
+    
+    db.session.expire_all()
+    rows = {(s.user_id, s.date.day): (s.total_focus_seconds, s.completed_focus_count, s.cycle_count)
+            for s in DailyStat.query.all()}
+    assert rows == {
+        (1, 1): (1200, 2, 0),
+        (1, 2): (0, 0, 0),
+        (1, 3): (600, 1, 2),
+        (2, 3): (600, 1, 0),
+    }
+    month = PeriodStat.query.filter_by(user_id=1, period='month', start_date=date(2026, 3, 1)).one()
+    assert month.total_focus_seconds == 1800
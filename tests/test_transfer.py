@@ -0,0 +1,79 @@
+"""Tests for session export and import."""
+import json
+import pytest
+from datetime import date
+from pomodoro.models import PomodoroSession, DailyStat, PeriodStat
+from pomodoro.services import get_state
+
+
+@pytest.fixture
+def app_config():
+    return {'TRUSTED_USER_HEADER': 'X-User-Id'}
+
+
+def history(days=3):
+    """Exported-looking rows: one completed focus and one break per day, plus an active session."""
+    rows = []
+    for day in range(1, days + 1):
+        rows.append({'id': 100 + day, 'user_id': 9, 'type': 'focus', 'planned_duration_sec': 1500,
+                     'start_at': f'2026-03-0{day}T09:00:00', 'planned_end_at': f'2026-03-0{day}T09:25:00',
+                     'end_at': f'2026-03-0{day}T09:25:00', 'status': 'completed'})
+        rows.append({'id': 200 + day, 'user_id': 9, 'type': 'break', 'planned_duration_sec': 300,
+                     'start_at': f'2026-03-0{day}T09:25:00', 'planned_end_at': f'2026-03-0{day}T09:30:00',
+                     'end_at': f'2026-03-0{day}T09:27:00', 'status': 'aborted'})
+    rows.append({'id': 300, 'user_id': 9, 'type': 'focus', 'planned_duration_sec': 1500,
+                 'start_at': '2026-03-04T09:00:00', 'planned_end_at': '2026-03-04T09:25:00',
+                 'end_at': None, 'status': 'active'})
+    return '\n'.join(json.dumps(row) for row in rows) + '\n'
+
+
+def test_import_bulk_inserts_and_rebuilds_daily_stats(client):
+    """Test that import skips active rows, assigns the current user and rebuilds stats."""
+    response = client.post('/api/pomodoro/import', data=history(), headers={'X-User-Id': '2'},
+                           content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert response.get_json() == {'imported': 6, 'skipped': 1}
+    
+    assert PomodoroSession.query.filter_by(user_id=2).count() == 6
+    assert PomodoroSession.query.filter_by(user_id=9).count() == 0
+    assert get_state(2)['mode'] == 'idle'
+    stats = DailyStat.query.filter_by(user_id=2).order_by(DailyStat.date).all()
+    assert [(s.date, s.total_focus_seconds, s.completed_focus_count) for s in stats] == [
+        (date(2026, 3, day), 1500, 1) for day in (1, 2, 3)
+    ]
+    month = PeriodStat.query.filter_by(user_id=2, period='month', start_date=date(2026, 3, 1)).one()
+    assert month.total_focus_seconds == 4500
+
+
+def test_import_rejects_bad_row_without_partial_insert(client):
+    """Test that one invalid row rolls back the whole import."""
+    body = history() + json.dumps({'type': 'nap', 'status': 'completed'}) + '\n'
+    response = client.post('/api/pomodoro/import', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert response.get_json()['field'] == 'file'
+    assert 'Line 8' in response.get_json()['error']
+    assert PomodoroSession.query.count() == 0
+    assert DailyStat.query.count() == 0
+
+
+def test_export_round_trips_through_csv_and_ndjson(client):
+    """Test that both export formats stream the user's rows and can be imported again."""
+    client.post('/api/pomodoro/import', data=history(), content_type='application/x-ndjson')
+    
+    response = client.get('/api/pomodoro/export')
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(rows) == 6
+    assert {row['user_id'] for row in rows} == {1}
+    
+    response = client.get('/api/pomodoro/export?format=csv')
+    assert response.mimetype == 'text/csv'
+    csv_body = response.get_data(as_text=True)
+    assert csv_body.splitlines()[0] == 'id,user_id,type,planned_duration_sec,start_at,planned_end_at,end_at,status'
+    
+    response = client.post('/api/pomodoro/import', data=csv_body, headers={'X-User-Id': '3'}, content_type='text/csv')
+    assert response.get_json() == {'imported': 6, 'skipped': 0}
+    assert get_state(3)['completed_focus_count'] == 0
+    assert DailyStat.query.filter_by(user_id=3).count() == 3
+    
+    assert client.get('/api/pomodoro/export?format=xml').status_code == 400